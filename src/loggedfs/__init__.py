@@ -29,16 +29,52 @@ specific language governing rights and limitations under the License.
 # IMPORT
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-from ._core.cli import cli_entry
-from ._core.filter import (
-	filter_field_class,
-	filter_item_class,
-	filter_pipeline_class
-	)
-from ._core.fs import (
-	_loggedfs,
-	loggedfs_factory
-	)
-from ._core.ipc import end_of_transmission
-from ._core.notify import notify_class as loggedfs_notify
-from ._core.out import decode_buffer
+import importlib
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# LAZY ATTRIBUTES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+_LAZY_ATTRIBUTES = { # name: (module, attribute), imported on first access (PEP 562)
+	'cli_entry': ('._core.cli', 'cli_entry'),
+	'column_chunk_class': ('._core.columnar', 'column_chunk_class'),
+	'columnar_writer_class': ('._core.columnar', 'columnar_writer_class'),
+	'export_columnar': ('._core.columnar', 'export_columnar'),
+	'read_columnar': ('._core.columnar', 'read_columnar'),
+	'read_columnar_chunk': ('._core.columnar', 'read_columnar_chunk'),
+	'filter_field_class': ('._core.filter', 'filter_field_class'),
+	'filter_item_class': ('._core.filter', 'filter_item_class'),
+	'filter_path_trie_class': ('._core.filter', 'filter_path_trie_class'),
+	'filter_pipeline_class': ('._core.filter', 'filter_pipeline_class'),
+	'_loggedfs': ('._core.fs', '_loggedfs'),
+	'loggedfs_factory': ('._core.fs', 'loggedfs_factory'),
+	'loggedfs_multi_factory': ('._core.fs', 'loggedfs_multi_factory'),
+	'end_of_transmission': ('._core.ipc', 'end_of_transmission'),
+	'mount_ready': ('._core.ipc', 'mount_ready'),
+	'loggedfs_notify': ('._core.notify', 'notify_class'),
+	'loggedfs_notify_async': ('._core.notify_async', 'notify_async_class'),
+	'loggedfs_notify_pool': ('._core.notify_pool', 'notify_pool_class'),
+	'decode_buffer': ('._core.buffers', 'decode_buffer'),
+	'read_events': ('._core.reader', 'read_events'),
+	'read_json_log': ('._core.reader', 'read_json_log'),
+	'read_lib_frames': ('._core.reader', 'read_lib_frames'),
+	}
+
+__all__ = sorted(_LAZY_ATTRIBUTES.keys())
+
+
+def __getattr__(name):
+
+	try:
+		module_name, attr_name = _LAZY_ATTRIBUTES[name]
+	except KeyError:
+		raise AttributeError('module %r has no attribute %r' % (__name__, name))
+	value = getattr(importlib.import_module(module_name, __name__), attr_name)
+	globals()[name] = value # subsequent lookups bypass __getattr__
+	return value
+
+
+def __dir__():
+
+	return sorted(set(globals().keys()) | set(_LAZY_ATTRIBUTES.keys()))
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/analyze.py: Summaries of large logs, parsed in parallel
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import heapq
+import multiprocessing
+import os
+
+from .defaults import (
+	ANALYZE_CHUNK_BYTES_DEFAULT,
+	ANALYZE_MAX_ITEMS_DEFAULT
+	)
+from .reader import (
+	COMPRESSIONS,
+	_timestamp_parser_class,
+	open_log,
+	parse_json_line,
+	parse_text_line,
+	read_log
+	)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+COLUMNS = ('events', 'failed', 'bytes_read', 'bytes_written')
+PATH_KEYS = ( # first present one is counted, symlinks by content as their location is relative to mount
+	'param_path', 'param_old_path', 'param_target_path', 'param_source_path'
+	)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: BOUNDED TABLE
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _table_class:
+	"""Rows of counters (COLUMNS) by key. Holds at most max_items rows (None: unbounded):
+	once twice as many are held, the max_items rows with most events are kept and the
+	others are added to the "dropped" row. Counts of keys dropped once and seen again
+	are incomplete, the table is then approximate.
+	"""
+
+
+	def __init__(self, max_items = None):
+
+		self._max_items = max_items
+		self._rows = {}
+		self._dropped = [0] * len(COLUMNS)
+		self._approximate = False
+
+
+	def add(self, key, events, failed, bytes_read, bytes_written):
+
+		row = self._rows.get(key, None)
+		if row is None:
+			self._rows[key] = [events, failed, bytes_read, bytes_written]
+			if self._max_items is not None and len(self._rows) > 2 * self._max_items:
+				self._prune()
+			return
+		row[0] += events
+		row[1] += failed
+		row[2] += bytes_read
+		row[3] += bytes_written
+
+
+	def merge(self, other):
+
+		for key, row in other._rows.items():
+			self.add(key, *row)
+		for index, value in enumerate(other._dropped):
+			self._dropped[index] += value
+		self._approximate |= other._approximate
+
+
+	def _prune(self):
+
+		keep = heapq.nlargest(self._max_items, self._rows.items(), key = lambda item: item[1][0])
+		for key, row in self._rows.items():
+			for index, value in enumerate(row):
+				self._dropped[index] += value
+		self._rows = dict(keep)
+		for row in self._rows.values():
+			for index, value in enumerate(row):
+				self._dropped[index] -= value
+		self._approximate = True
+
+
+	def to_dict(self, top = None):
+		"""Rows (with most events first if top is given, top rows at most) and the dropped row.
+		"""
+
+		if top is None:
+			items = sorted(self._rows.items())
+		else:
+			items = heapq.nlargest(top, self._rows.items(), key = lambda item: item[1][0])
+		return {
+			'rows': [dict(zip(('key',) + COLUMNS, (key,) + tuple(row))) for key, row in items],
+			'items': len(self._rows),
+			'dropped': dict(zip(COLUMNS, self._dropped)),
+			'approximate': self._approximate,
+			}
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: SUMMARY
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class summary_class:
+	"""Summary of events by action, path and process (pid and command) with bounded memory,
+	see _table_class. Summaries of parts of logs can be merged in any order.
+	"""
+
+
+	def __init__(self, max_items = ANALYZE_MAX_ITEMS_DEFAULT):
+
+		if max_items is not None and not isinstance(max_items, int):
+			raise TypeError('max_items must be of type int or None')
+		if max_items is not None and max_items < 1:
+			raise ValueError('max_items must be positive')
+
+		self.lines = 0
+		self.events = 0
+		self.first_ns = None
+		self.last_ns = None
+		self._actions = _table_class() # few
+		self._paths = _table_class(max_items)
+		self._processes = _table_class(max_items)
+
+
+	def add(self, event):
+
+		self.events += 1
+		timestamp = event.get('time', None)
+		if isinstance(timestamp, int):
+			if self.first_ns is None or timestamp < self.first_ns:
+				self.first_ns = timestamp
+			if self.last_ns is None or timestamp > self.last_ns:
+				self.last_ns = timestamp
+
+		action = event.get('action', '')
+		status = event.get('status', False)
+		bytes_read, bytes_written = 0, 0
+		if status and action == 'read':
+			bytes_read = event.get('return_len', event.get('param_length', 0))
+		elif status and action == 'write':
+			ret = event.get('return', None)
+			if isinstance(ret, str) and ret.isdigit():
+				ret = int(ret)
+			bytes_written = ret if isinstance(ret, int) else event.get('param_buf_len', 0)
+		row = (1, 0 if status else 1, bytes_read, bytes_written)
+
+		self._actions.add(action, *row)
+		for key in PATH_KEYS:
+			if key in event:
+				self._paths.add(event[key], *row)
+				break
+		self._processes.add((event.get('proc_pid', -1), event.get('proc_cmd', '')), *row)
+
+
+	def merge(self, other):
+
+		self.lines += other.lines
+		self.events += other.events
+		for attr, func in (('first_ns', min), ('last_ns', max)):
+			values = [value for value in (getattr(self, attr), getattr(other, attr)) if value is not None]
+			setattr(self, attr, func(values) if len(values) > 0 else None)
+		self._actions.merge(other._actions)
+		self._paths.merge(other._paths)
+		self._processes.merge(other._processes)
+
+
+	def to_dict(self, top = None):
+
+		processes = self._processes.to_dict(top)
+		for row in processes['rows']:
+			pid, cmd = row.pop('key')
+			row['pid'], row['cmd'] = pid, cmd
+		paths = self._paths.to_dict(top)
+		for row in paths['rows']:
+			row['path'] = row.pop('key')
+		actions = self._actions.to_dict()
+		for row in actions['rows']:
+			row['action'] = row.pop('key')
+
+		return {
+			'lines': self.lines,
+			'events': self.events,
+			'first_ns': self.first_ns,
+			'last_ns': self.last_ns,
+			'actions': actions['rows'],
+			'paths': paths,
+			'processes': processes,
+			}
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _is_compressed(path):
+
+	return any(path.endswith(suffix) for suffix, _ in COMPRESSIONS.values())
+
+
+def split_log(path, chunk_bytes = ANALYZE_CHUNK_BYTES_DEFAULT):
+	"""Byte ranges (path, start, end) of a log for parallel parsing. Each range holds the
+	lines starting within it. Compressed logs are not seekable and form one range.
+	"""
+
+	if _is_compressed(path):
+		return [(path, 0, None)]
+	size = os.path.getsize(path)
+	return [(path, start, min(start + chunk_bytes, size)) for start in range(0, max(size, 1), chunk_bytes)]
+
+
+def _read_range(f, start, end):
+
+	if start > 0:
+		f.seek(start - 1)
+		position = start - 1 + len(f.readline()) # rest of line started in previous range
+	else:
+		position = 0
+	while end is None or position < end:
+		line = f.readline()
+		if len(line) == 0:
+			break
+		position += len(line)
+		yield line
+
+
+def summarize_range(path, start = 0, end = None, max_items = ANALYZE_MAX_ITEMS_DEFAULT):
+	"""Summary of the events logged in lines starting within a byte range of a log
+	in traditional or JSON format, see split_log.
+	"""
+
+	summary = summary_class(max_items)
+	parse_time = _timestamp_parser_class()
+	with open_log(path) as f:
+		for line in _read_range(f, start, end):
+			summary.lines += 1
+			line = line.decode('utf-8', errors = 'replace')
+			if line.startswith('{'):
+				event = parse_json_line(line, parse_time)
+			else:
+				event = parse_text_line(line, parse_time)
+			if event is not None:
+				summary.add(event)
+	return summary
+
+
+def _summarize_task(task):
+
+	return summarize_range(*task)
+
+
+def analyze_logs(
+	paths,
+	jobs = None,
+	chunk_bytes = ANALYZE_CHUNK_BYTES_DEFAULT,
+	max_items = ANALYZE_MAX_ITEMS_DEFAULT
+	):
+	"""Summarizes logs in traditional or JSON format (plain or compressed segments),
+	parsing byte ranges of chunk_bytes in a pool of jobs processes (default: one per CPU).
+	Returns a summary_class object.
+	"""
+
+	if not isinstance(chunk_bytes, int) or chunk_bytes < 1:
+		raise ValueError('chunk_bytes must be a positive int')
+	if jobs is not None and (not isinstance(jobs, int) or jobs < 1):
+		raise ValueError('jobs must be a positive int or None')
+
+	tasks = [task + (max_items,) for path in paths for task in split_log(path, chunk_bytes)]
+	summary = summary_class(max_items)
+
+	if jobs == 1 or len(tasks) == 1:
+		for task in tasks:
+			summary.merge(_summarize_task(task))
+		return summary
+
+	with multiprocessing.Pool(min(jobs or os.cpu_count() or 1, len(tasks))) as pool:
+		for partial in pool.imap_unordered(_summarize_task, tasks):
+			summary.merge(partial)
+	return summary
+
+
+def _read_log_file(path):
+
+	with open_log(path) as f:
+		yield from read_log(f)
+
+
+def merge_logs(paths):
+	"""Yields the events of several logs (traditional or JSON format) in the order of time,
+	streaming. Each log must be in time order, as written, e.g. a log per mount or rotated segments.
+	"""
+
+	return heapq.merge(*(_read_log_file(path) for path in paths), key = lambda event: event['time'])
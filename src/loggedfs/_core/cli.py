@@ -29,18 +29,256 @@ specific language governing rights and limitations under the License.
 # IMPORT
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+import json
+import os
+import pickle
+import sys
+
 import click
 
-from .defaults import LOG_ENABLED_DEFAULT, LOG_PRINTPROCESSNAME_DEFAULT
-from .fs import loggedfs_factory
-from .filter import filter_pipeline_class
+from .defaults import (
+	ANALYZE_CHUNK_BYTES_DEFAULT,
+	ANALYZE_MAX_ITEMS_DEFAULT,
+	ANALYZE_TOP_DEFAULT,
+	FILTER_CACHE_SIZE_DEFAULT,
+	HOT_INTERVAL_DEFAULT,
+	HOT_TOP_DEFAULT,
+	IPC_CODEC_DEFAULT,
+	IPC_CODECS,
+	LOG_ENABLED_DEFAULT,
+	LOG_PRINTPROCESSNAME_DEFAULT,
+	REPLAY_SPEED_DEFAULT,
+	SINK_COMPRESSION_DEFAULT,
+	SINK_COMPRESSIONS,
+	SINK_ROTATE_BYTES_DEFAULT,
+	SINK_ROTATE_SECONDS_DEFAULT
+	)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+CLI_DEFAULT_COMMAND = 'mount'
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: COMMAND GROUP
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _cli_group_class(click.Group):
+	"""Runs the hidden default command (mount) unless the first argument names another command,
+	so "loggedfs [OPTIONS] DIRECTORY" keeps working. An existing directory named like a command
+	is mounted as before. "loggedfs mount [OPTIONS] DIRECTORY..." always mounts.
+	"""
+
+
+	def parse_args(self, ctx, args):
+
+		if len(args) == 0 or args[0] not in self.commands or (
+			args[0] != CLI_DEFAULT_COMMAND and os.path.isdir(args[0])
+			):
+			args = [CLI_DEFAULT_COMMAND] + list(args)
+		return super().parse_args(ctx, args)
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-# ROUTINE
+# ROUTINES
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-@click.command()
+@click.group(cls = _cli_group_class)
+def cli_entry():
+	"""LoggedFS-python: Mounts a directory by default, see "loggedfs --help".
+	Further commands: analyze, query, replay.
+	"""
+
+
+@cli_entry.command(name = 'analyze')
+@click.option(
+	'--jobs',
+	type = click.IntRange(min = 1),
+	help = 'Number of parallel parser processes. One per CPU by default.'
+	)
+@click.option(
+	'--chunk-size',
+	type = click.IntRange(min = 1),
+	default = ANALYZE_CHUNK_BYTES_DEFAULT,
+	help = 'Bytes of log parsed per parallel task.'
+	)
+@click.option(
+	'--top',
+	type = click.IntRange(min = 1),
+	default = ANALYZE_TOP_DEFAULT,
+	help = 'Number of paths and processes reported, most active first.'
+	)
+@click.option(
+	'--max-items',
+	type = click.IntRange(min = 1),
+	default = ANALYZE_MAX_ITEMS_DEFAULT,
+	help = 'Paths and processes tracked, bounds memory. Counts become approximate beyond.'
+	)
+@click.option(
+	'--json', 'json_out',
+	is_flag = True,
+	help = 'Print the summary as one JSON object.'
+	)
+@click.option(
+	'--merge',
+	is_flag = True,
+	help = 'Instead of summarizing, print the events of all logs as JSON lines in the order of time.'
+	)
+@click.argument(
+	'log_files',
+	nargs = -1,
+	required = True,
+	type = click.Path(exists = True, file_okay = True, dir_okay = False, resolve_path = True)
+	)
+def cli_analyze(jobs, chunk_size, top, max_items, json_out, merge, log_files):
+	"""Summarizes events of logs (traditional or JSON format, plain or compressed segments)
+	per action, path and process. Large logs are parsed in parallel.
+	"""
+
+	from .analyze import analyze_logs, merge_logs
+
+	if merge:
+		for event in merge_logs(log_files):
+			click.echo(json.dumps(event, sort_keys = True))
+		return
+
+	summary = analyze_logs(log_files, jobs = jobs, chunk_bytes = chunk_size, max_items = max_items).to_dict(top)
+	if json_out:
+		click.echo(json.dumps(summary, sort_keys = True))
+		return
+
+	seconds = (
+		(summary['last_ns'] - summary['first_ns']) / 1e9
+		if summary['first_ns'] is not None else 0.0
+		)
+	click.echo('%d events in %d lines over %0.3f seconds' % (summary['events'], summary['lines'], seconds))
+	line = '  %-40s %10s %10s %14s %14s'
+	click.echo(line % ('action', 'events', 'failed', 'bytes read', 'bytes written'))
+	for row in summary['actions']:
+		click.echo(line % (row['action'], row['events'], row['failed'], row['bytes_read'], row['bytes_written']))
+	for name, table, label in (
+		('paths', summary['paths'], lambda row: row['path']),
+		('processes', summary['processes'], lambda row: '%d %s' % (row['pid'], row['cmd'])),
+		):
+		click.echo('%s (%d%s):' % (name, table['items'], ', approximate' if table['approximate'] else ''))
+		for row in table['rows']:
+			click.echo(line % (label(row)[-40:], row['events'], row['failed'], row['bytes_read'], row['bytes_written']))
+
+
+@cli_entry.command(name = 'query')
+@click.option(
+	'--path',
+	multiple = True,
+	help = 'Only show events involving this absolute path. Can be repeated.'
+	)
+@click.option(
+	'--prefix',
+	multiple = True,
+	help = 'Only show events involving paths starting with this prefix. Can be repeated.'
+	)
+@click.option(
+	'--since',
+	help = 'Only show events logged at or after this local time ("2020-07-11 10:00[:00]") or nanoseconds since epoch.'
+	)
+@click.option(
+	'--until',
+	help = 'Only show events logged at or before this local time ("2020-07-11 10:05[:00]") or nanoseconds since epoch.'
+	)
+@click.argument(
+	'log_file',
+	type = click.Path(exists = True, file_okay = True, dir_okay = False, resolve_path = True)
+	)
+def cli_query(path, prefix, since, until, log_file):
+	"""Prints lines of a log file (traditional or JSON format) matching paths and a time range.
+	Seeks directly to relevant parts of the log file if it was written with --index.
+	"""
+
+	from .index import parse_query_time, query_log
+
+	try:
+		since = parse_query_time(since) if since is not None else None
+		until = parse_query_time(until) if until is not None else None
+	except ValueError as e:
+		raise click.BadParameter(str(e))
+
+	for line in query_log(log_file, paths = path, prefixes = prefix, since = since, until = until):
+		click.echo(line, nl = False)
+
+
+@cli_entry.command(name = 'replay')
+@click.option(
+	'--root',
+	help = 'Directory the log was recorded at. Read from the startup messages of JSON logs by default.'
+	)
+@click.option(
+	'--speed',
+	type = click.FloatRange(min = 0),
+	default = REPLAY_SPEED_DEFAULT,
+	help = 'Timing: 0 replays as fast as possible, 1 in real time, 2 twice as fast etc.'
+	)
+@click.option(
+	'--serial',
+	is_flag = True,
+	help = 'Replay all events in logged order in one thread instead of one thread per process.'
+	)
+@click.option(
+	'--lib-codec',
+	type = click.Choice(IPC_CODECS),
+	default = IPC_CODEC_DEFAULT,
+	help = 'Codec of a recorded library mode stream.'
+	)
+@click.argument(
+	'log_file',
+	type = click.Path(exists = True, file_okay = True, dir_okay = False, resolve_path = True)
+	)
+@click.argument(
+	'target',
+	type = click.Path(exists = True, file_okay = False, dir_okay = True, writable = True, resolve_path = True)
+	)
+def cli_replay(root, speed, serial, lib_codec, log_file, target):
+	"""Replays the operations of a JSON log (-j) or a recorded library mode stream against
+	the target directory, per process in logged order. Writes use logged buffers (-b) if present.
+	"""
+
+	from .replay import replay_log
+
+	try:
+		stats = replay_log(
+			log_file, target, root = root, codec = lib_codec, speed = speed, parallel = not serial
+			)
+	except ValueError as e:
+		raise click.UsageError(str(e))
+
+	click.echo('%d events from %d processes in %0.3f seconds: %d replayed, %d skipped, %d failed' % (
+		stats['events'], stats['processes'], stats['seconds'], stats['replayed'], stats['skipped'], stats['failed']
+		))
+	for action in sorted(set(stats['actions']) | set(stats['errors'])):
+		click.echo('  %-10s %10d replayed %10d failed' % (
+			action, stats['actions'].get(action, 0), stats['errors'].get(action, 0)
+			))
+
+
+@cli_entry.command(name = 'lib-pool', hidden = True)
+@click.option(
+	'--lib-codec',
+	type = click.Choice(IPC_CODECS),
+	default = IPC_CODEC_DEFAULT,
+	help = 'Encode events with this codec. DO NOT USE THIS FROM THE COMMAND LINE!',
+	)
+def cli_lib_pool(lib_codec):
+	"""Hosts filesystems in library mode as requested through stdin by loggedfs_notify_pool.
+	DO NOT USE THIS FROM THE COMMAND LINE!
+	"""
+
+	from .pool import serve_pool
+
+	serve_pool(sys.stdin.buffer, sys.stdout.buffer, lib_codec)
+
+
+@cli_entry.command(name = CLI_DEFAULT_COMMAND, hidden = True)
 @click.option(
 	'-f',
 	is_flag = True,
@@ -54,7 +292,8 @@ from .filter import filter_pipeline_class
 @click.option(
 	'-c',
 	type = click.File(mode = 'r'),
-	help = 'Use the "config-file" to filter what you want to log.'
+	multiple = True,
+	help = 'Use the "config-file" to filter what you want to log. Give it once per DIRECTORY (in order) for a filter per directory.'
 	)
 @click.option(
 	'-s',
@@ -66,82 +305,227 @@ from .filter import filter_pipeline_class
 	type = click.Path(file_okay = True, dir_okay = False, resolve_path = True),
 	help = ('Use the "log-file" to write logs to.')
 	)
+@click.option(
+	'--index',
+	is_flag = True,
+	help = 'Maintain a sidecar index next to the "log-file" for "loggedfs query".'
+	)
+@click.option(
+	'--rotate-size',
+	type = click.IntRange(min = 0),
+	default = SINK_ROTATE_BYTES_DEFAULT,
+	help = 'Rotate the "log-file" once it exceeds this many bytes. 0 deactivates rotation by size.'
+	)
+@click.option(
+	'--rotate-time',
+	type = click.FloatRange(min = 0),
+	default = SINK_ROTATE_SECONDS_DEFAULT,
+	help = 'Rotate the "log-file" after this many seconds. 0 deactivates rotation by time.'
+	)
+@click.option(
+	'--compress',
+	type = click.Choice(SINK_COMPRESSIONS),
+	default = SINK_COMPRESSION_DEFAULT,
+	help = 'Compress rotated segments of the "log-file" in the background.'
+	)
 @click.option(
 	'-j', '--json',
 	is_flag = True,
 	help = 'Format output as JSON instead of traditional loggedfs format.'
 	)
+@click.option(
+	'--time-ns',
+	is_flag = True,
+	help = 'Write timestamps as nanoseconds since the epoch instead of local time.'
+	)
 @click.option(
 	'-b', '--buffers',
 	is_flag = True,
 	help = 'Include read/write-buffers (compressed, BASE64) in log.'
 	)
+@click.option(
+	'--profile-access',
+	is_flag = True,
+	help = 'Log a summary of the access pattern of each file handle when it is released.'
+	)
+@click.option(
+	'--hot-interval',
+	type = click.FloatRange(min = 0),
+	default = HOT_INTERVAL_DEFAULT,
+	help = 'Track the most active paths, processes and users in fixed memory and log them every this many seconds. 0 deactivates tracking.'
+	)
+@click.option(
+	'--hot-top',
+	type = click.IntRange(min = 1),
+	default = HOT_TOP_DEFAULT,
+	help = 'Number of paths, processes and users in logged summaries of --hot-interval.'
+	)
+@click.option(
+	'--columnar',
+	type = click.Path(exists = True, file_okay = False, dir_okay = True, writable = True, resolve_path = True),
+	help = 'Also write events to columnar chunk files in this directory, for analytics.'
+	)
 @click.option(
 	'--lib',
 	is_flag = True,
 	help = 'Run in library mode. DO NOT USE THIS FROM THE COMMAND LINE!',
 	hidden = True
 	)
+@click.option(
+	'--lib-codec',
+	type = click.Choice(IPC_CODECS),
+	default = IPC_CODEC_DEFAULT,
+	help = 'Encode events with this codec in library mode. DO NOT USE THIS FROM THE COMMAND LINE!',
+	hidden = True
+	)
+@click.option(
+	'--lib-filter',
+	is_flag = True,
+	help = 'Read a pickled filter pipeline from stdin in library mode. DO NOT USE THIS FROM THE COMMAND LINE!',
+	hidden = True
+	)
+@click.option(
+	'--lib-ring',
+	type = click.Path(exists = True, file_okay = True, dir_okay = False, resolve_path = True),
+	help = 'Send events through this shared memory ring buffer file in library mode. DO NOT USE THIS FROM THE COMMAND LINE!',
+	hidden = True
+	)
 @click.option(
 	'-m', '--only-modify-operations',
 	is_flag = True,
 	help = 'Exclude logging of all operations that can not cause changes in the filesystem. Convenience flag for accelerated logging.'
 	)
+@click.option(
+	'--filter-cache',
+	type = click.IntRange(min = 0),
+	default = FILTER_CACHE_SIZE_DEFAULT,
+	help = 'Memoise up to this many filter decisions, keyed by the event fields the filter reads. 0 deactivates the cache.'
+	)
 @click.argument(
 	'directory',
+	nargs = -1,
+	required = True,
 	type = click.Path(exists = True, file_okay = False, dir_okay = True, resolve_path = True)
 	)
-def cli_entry(f, p, c, s, l, json, buffers, lib, only_modify_operations, directory):
+def cli_mount(
+	f, p, c, s, l, index, rotate_size, rotate_time, compress, json, time_ns, buffers, profile_access, hot_interval, hot_top, columnar,
+	lib, lib_codec, lib_filter, lib_ring, only_modify_operations, filter_cache, directory
+	):
 	"""LoggedFS-python is a transparent fuse-filesystem which allows to log
 	every operation that happens in the backend filesystem. Logs can be written
 	to syslog, to a file, or to the standard output. LoggedFS-python allows to specify an XML
 	configuration file in which you can choose exactly what you want to log and
 	what you don't want to log. You can add filters on users, operations (open,
 	read, write, chown, chmod, etc.), filenames, commands and return code.
+	Several directories are served by one process (requires -f), their events
+	are tagged with mount IDs, i.e. their positions in the list of directories.
 	"""
 
-	loggedfs_factory(
-		directory,
-		**__process_config__(c, l, s, f, p, json, buffers, lib, only_modify_operations)
+	from .fs import loggedfs_factory, loggedfs_multi_factory # deferred, other commands do not need refuse
+
+	if len(c) > 1 and len(c) != len(directory):
+		raise click.UsageError('-c must be given once or once per DIRECTORY')
+	if len(directory) > 1 and not f:
+		raise click.UsageError('several directories require -f')
+
+	config = __process_config__(
+		c, l, index, rotate_size, rotate_time, compress, s, f, p, json, time_ns, buffers, profile_access, hot_interval, hot_top, columnar,
+		lib, lib_codec, lib_filter, lib_ring, only_modify_operations, filter_cache
 		)
+	log_filters = config.pop('log_filters')
+	if len(directory) == 1:
+		loggedfs_factory(directory[0], log_filter = log_filters[0], **config)
+	elif len(log_filters) > 1:
+		loggedfs_multi_factory(list(directory), log_filters = log_filters, **config)
+	else:
+		loggedfs_multi_factory(list(directory), log_filter = log_filters[0], **config)
 
 
 def __process_config__(
-	config_fh,
+	config_fhs,
 	log_file,
+	log_index,
+	log_rotate_bytes,
+	log_rotate_seconds,
+	log_compression,
 	log_syslog_off,
 	fuse_foreground,
 	fuse_allowother,
 	log_json,
+	log_time_ns,
 	log_buffers,
+	log_access_profile,
+	log_hot_interval,
+	log_hot_top,
+	log_columnar,
 	lib_mode,
-	log_only_modify_operations
+	lib_codec,
+	lib_filter,
+	lib_ring,
+	log_only_modify_operations,
+	filter_cache_size
 	):
 
-	if config_fh is not None:
+	from .filter import filter_pipeline_class
+
+	filter_objs = []
+	for config_fh in config_fhs: # global settings are taken from the first one
 		config_data = config_fh.read()
 		config_fh.close()
 		(
-			log_enabled, log_printprocessname, filter_obj
-			) = filter_pipeline_class.from_xmlstring(config_data)
-		config_file = config_fh.name
+			config_enabled, config_printprocessname, filter_obj
+			) = filter_pipeline_class.from_xmlstring(config_data, cache_size = filter_cache_size)
+		if len(filter_objs) == 0:
+			log_enabled, log_printprocessname = config_enabled, config_printprocessname
+		filter_objs.append(filter_obj)
+	if len(filter_objs) > 0:
+		config_file = ', '.join(config_fh.name for config_fh in config_fhs)
 	else:
 		log_enabled = LOG_ENABLED_DEFAULT
 		log_printprocessname = LOG_PRINTPROCESSNAME_DEFAULT
-		filter_obj = filter_pipeline_class()
+		filter_objs.append(filter_pipeline_class(cache_size = filter_cache_size))
 		config_file = None
 
+	if log_index and log_file is None:
+		raise click.UsageError('--index requires -l')
+
+	if lib_filter:
+		if not lib_mode:
+			raise ValueError('filter pipelines can only be read from stdin in library mode')
+		try:
+			filter_obj = pickle.loads(sys.stdin.buffer.read())
+			if not isinstance(filter_obj, filter_pipeline_class):
+				raise TypeError('stdin did not provide an instance of filter_pipeline_class')
+		except Exception as e: # mount anyway, mount_ready tells the consumer to filter
+			sys.stderr.write('Filter pipeline from stdin not applied, events are not filtered: %r\n' % e)
+			sys.stderr.flush()
+			lib_filter = False
+		else:
+			filter_objs = [filter_obj]
+
 	return {
 		'fuse_foreground': fuse_foreground,
 		'fuse_allowother': fuse_allowother,
+		'lib_codec': lib_codec,
+		'_lib_filter': lib_filter,
 		'lib_mode': lib_mode,
+		'lib_ring': lib_ring,
+		'log_access_profile': log_access_profile,
 		'log_buffers': log_buffers,
+		'log_columnar': log_columnar,
+		'log_compression': log_compression,
 		'_log_configfile' : config_file,
 		'log_enabled': log_enabled,
 		'log_file': log_file,
-		'log_filter': filter_obj,
+		'log_filters': filter_objs, # one per configuration file
+		'log_hot_interval': log_hot_interval,
+		'log_hot_top': log_hot_top,
+		'log_index': log_index,
 		'log_json': log_json,
 		'log_only_modify_operations': log_only_modify_operations,
 		'log_printprocessname': log_printprocessname,
-		'log_syslog': not log_syslog_off
+		'log_rotate_bytes': log_rotate_bytes,
+		'log_rotate_seconds': log_rotate_seconds,
+		'log_syslog': not log_syslog_off,
+		'log_time_ns': log_time_ns
 		}
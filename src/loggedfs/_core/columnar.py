@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/columnar.py: Columnar chunk files for analytics
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import array
+import json
+import os
+import struct
+import sys
+
+from .defaults import (
+	COLUMNAR_CHUNK_ROWS_DEFAULT,
+	IPC_CODEC_DEFAULT
+	)
+from .reader import read_events
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+COLUMNS = ( # name, array typecode, dictionary encoded
+	('time', 'q', False),
+	('action', 'i', True),
+	('status', 'b', False),
+	('proc_pid', 'q', False),
+	('proc_uid', 'q', False),
+	('proc_gid', 'q', False),
+	('proc_cmd', 'i', True),
+	('param_path', 'i', True),
+	('param_offset', 'q', False),
+	('param_length', 'q', False),
+	('param_buf_len', 'q', False),
+	('return_len', 'q', False),
+	('return_errno', 'q', False),
+	)
+NULL = -1 # missing values and dictionary codes
+
+CHUNK_MAGIC = b'LFSCOL01'
+CHUNK_HEADER_LEN_DTYPE = 'Q' # uint64
+CHUNK_ALIGN = 8 # bytes, every column buffer starts aligned
+CHUNK_PREFIX = 'chunk_'
+CHUNK_SUFFIX = '.lfc'
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: WRITER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class columnar_writer_class:
+	"""Accumulates events column by column and writes them to numbered chunk files
+	of up to chunk_rows events. Strings (action, command, path) are dictionary encoded
+	per chunk. Memory use is bounded by chunk_rows.
+
+	Chunk file layout: magic, uint64 header length, JSON header, column buffers.
+	The header lists rows, byte order and, per column, name, array typecode, offset and
+	length of its buffer (relative to the first buffer) and its dictionary if any.
+	Buffers are native arrays, i.e. Arrow-compatible values or dictionary indices.
+	"""
+
+
+	def __init__(self, directory, chunk_rows = COLUMNAR_CHUNK_ROWS_DEFAULT):
+
+		if not isinstance(directory, str):
+			raise TypeError('directory must be of type string')
+		if not os.path.isdir(directory):
+			raise ValueError('directory must be a path to an existing directory')
+		if not os.access(directory, os.W_OK):
+			raise ValueError('directory is not writeable')
+		if not isinstance(chunk_rows, int):
+			raise TypeError('chunk_rows must be of type int')
+		if chunk_rows <= 0:
+			raise ValueError('chunk_rows must be positive')
+
+		self._directory = directory
+		self._chunk_rows = chunk_rows
+		self._chunk_index = len(_list_chunks(directory)) # continue numbering
+		self._reset()
+
+
+	def _reset(self):
+
+		self._rows = 0
+		self._columns = {name: array.array(typecode) for name, typecode, _ in COLUMNS}
+		self._dictionaries = {name: {} for name, _, encoded in COLUMNS if encoded}
+		self._int_appends = tuple(
+			(name, self._columns[name].append) for name, typecode, encoded in COLUMNS
+			if not encoded and typecode == 'q' and name != 'time'
+			)
+		self._code_appends = tuple(
+			(name, self._columns[name].append, self._dictionaries[name]) for name, _, encoded in COLUMNS
+			if encoded
+			)
+
+
+	@property
+	def rows(self):
+		return self._rows
+
+
+	def append(self, event, time_ns = None):
+		"""Adds one event (dict). time_ns replaces the event's "time" if given.
+		"""
+
+		self._columns['time'].append(event.get('time', NULL) if time_ns is None else time_ns)
+		status = event.get('status', None)
+		self._columns['status'].append(NULL if status is None else int(bool(status)))
+		for name, append in self._int_appends:
+			value = event.get(name, None)
+			append(value if type(value) is int else NULL)
+		for name, append, dictionary in self._code_appends:
+			value = event.get(name, None)
+			if value is None:
+				append(NULL)
+				continue
+			try:
+				append(dictionary[value])
+			except KeyError:
+				append(dictionary.setdefault(value, len(dictionary)))
+
+		self._rows += 1
+		if self._rows >= self._chunk_rows:
+			self.flush()
+
+
+	def flush(self):
+		"""Writes accumulated events to a new chunk file, if there are any.
+		"""
+
+		if self._rows == 0:
+			return
+
+		columns_meta = []
+		buffers = []
+		offset = 0
+		for name, typecode, encoded in COLUMNS:
+			data = self._columns[name].tobytes()
+			meta = {
+				'name': name,
+				'type': typecode,
+				'offset': offset,
+				'length': len(data),
+				}
+			if encoded:
+				meta['dictionary'] = list(self._dictionaries[name].keys()) # insertion order equals codes
+			columns_meta.append(meta)
+			buffers.append(data)
+			buffers.append(_padding(len(data)))
+			offset += len(data) + len(buffers[-1])
+
+		header = json.dumps({
+			'rows': self._rows,
+			'byteorder': sys.byteorder,
+			'columns': columns_meta,
+			}).encode('utf-8')
+		header += b' ' * len(_padding(len(CHUNK_MAGIC) + 8 + len(header)))
+
+		path = os.path.join(self._directory, '%s%08d%s' % (CHUNK_PREFIX, self._chunk_index, CHUNK_SUFFIX))
+		with open(path + '.tmp', 'wb') as f: # readers never see partial chunks
+			f.write(CHUNK_MAGIC)
+			f.write(struct.pack(CHUNK_HEADER_LEN_DTYPE, len(header)))
+			f.write(header)
+			for data in buffers:
+				f.write(data)
+		os.replace(path + '.tmp', path)
+
+		self._chunk_index += 1
+		self._reset()
+
+
+	def close(self):
+
+		self.flush()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: CHUNK
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class column_chunk_class:
+	"""One chunk file in memory. columns maps names to arrays (dictionary indices
+	for encoded columns), dictionaries maps names of encoded columns to lists of values.
+	"""
+
+
+	def __init__(self, rows, columns, dictionaries):
+
+		self._rows = rows
+		self._columns = columns
+		self._dictionaries = dictionaries
+
+
+	def __len__(self):
+
+		return self._rows
+
+
+	def __repr__(self):
+
+		return '<column_chunk rows={ROWS:d} columns={COLUMNS:s}>'.format(
+			ROWS = self._rows, COLUMNS = ','.join(self._columns.keys())
+			)
+
+
+	@property
+	def columns(self):
+		return self._columns
+
+
+	@property
+	def dictionaries(self):
+		return self._dictionaries
+
+
+	def decode(self, name):
+		"""Returns the values of a column as a list, resolving dictionary indices and missing values to None.
+		"""
+
+		dictionary = self._dictionaries.get(name, None)
+		if dictionary is None:
+			return [None if value == NULL else value for value in self._columns[name]]
+		return [None if code == NULL else dictionary[code] for code in self._columns[name]]
+
+
+	def to_numpy(self):
+		"""Returns a dict of NumPy arrays (requires numpy). Encoded columns hold dictionary indices,
+		e.g. for pandas.Categorical.from_codes(codes, chunk.dictionaries[name]).
+		"""
+
+		try:
+			import numpy as np # deferred, heavy and only needed for analysis
+		except ImportError:
+			raise ImportError('numpy is not available (pip install numpy)')
+		return {
+			name: np.frombuffer(column, dtype = column.typecode) if len(column) > 0 else np.array([], dtype = column.typecode)
+			for name, column in self._columns.items()
+			}
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _padding(length):
+
+	return b'\x00' * (-length % CHUNK_ALIGN)
+
+
+def _list_chunks(directory):
+
+	return sorted(
+		os.path.join(directory, name) for name in os.listdir(directory)
+		if name.startswith(CHUNK_PREFIX) and name.endswith(CHUNK_SUFFIX)
+		)
+
+
+def read_columnar_chunk(path):
+	"""Reads one chunk file, returns a column_chunk_class object.
+	"""
+
+	with open(path, 'rb') as f:
+		if f.read(len(CHUNK_MAGIC)) != CHUNK_MAGIC:
+			raise ValueError('not a columnar chunk file')
+		header_len = struct.unpack(CHUNK_HEADER_LEN_DTYPE, f.read(8))[0]
+		header = json.loads(f.read(header_len).decode('utf-8'))
+		data = f.read()
+
+	columns = {}
+	dictionaries = {}
+	for meta in header['columns']:
+		column = array.array(meta['type'])
+		column.frombytes(data[meta['offset']:meta['offset'] + meta['length']])
+		if header['byteorder'] != sys.byteorder:
+			column.byteswap()
+		columns[meta['name']] = column
+		if 'dictionary' in meta:
+			dictionaries[meta['name']] = meta['dictionary']
+
+	return column_chunk_class(header['rows'], columns, dictionaries)
+
+
+def read_columnar(directory):
+	"""Yields all chunks in a directory in the order they were written.
+	"""
+
+	for path in _list_chunks(directory):
+		yield read_columnar_chunk(path)
+
+
+def export_columnar(in_stream, directory, chunk_rows = COLUMNAR_CHUNK_ROWS_DEFAULT, codec = IPC_CODEC_DEFAULT):
+	"""Converts a JSON log (-j) or a recorded library mode stream, opened in binary mode,
+	into chunk files. Streams, i.e. memory use is bounded by chunk_rows. Returns the number of events.
+	"""
+
+	writer = columnar_writer_class(directory, chunk_rows)
+	count = 0
+	for event in read_events(in_stream, codec):
+		writer.append(event)
+		count += 1
+	writer.close()
+
+	return count
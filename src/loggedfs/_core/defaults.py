@@ -29,14 +29,67 @@ specific language governing rights and limitations under the License.
 # CONST
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+ANALYZE_CHUNK_BYTES_DEFAULT = 2**26 # bytes of log per parallel parse task
+ANALYZE_MAX_ITEMS_DEFAULT = 2**16 # paths and processes tracked per summary
+ANALYZE_TOP_DEFAULT = 10 # paths and processes reported
+
+COLUMNAR_CHUNK_ROWS_DEFAULT = 2**16 # events per chunk file
+
+FILTER_CACHE_SIZE_DEFAULT = 0
+
 FUSE_ALLOWOTHER_DEFAULT = False
 FUSE_FOREGROUND_DEFAULT = False
 
+HOT_CAPACITY_DEFAULT = 1024 # keys tracked per dimension (Space-Saving)
+HOT_INTERVAL_DEFAULT = 0.0 # seconds between logged summaries, 0 deactivates tracking
+HOT_SKETCH_DEPTH_DEFAULT = 4 # rows of Count-Min sketches
+HOT_SKETCH_WIDTH_DEFAULT = 2**12 # counters per row of Count-Min sketches
+HOT_TOP_DEFAULT = 10 # keys per dimension in summaries
+
+INDEX_BLOCK_EVENTS_DEFAULT = 1024 # log lines per index block
+INDEX_BLOCK_SECONDS_DEFAULT = 10.0 # maximum time span of index block
+
+IPC_BATCH_LATENCY_DEFAULT = 0.1 # seconds
+IPC_BATCH_SIZE_DEFAULT = 1000 # events
+IPC_CODEC_DEFAULT = 'pickle'
+IPC_CODECS = ('pickle', 'schema')
+IPC_QUEUE_MAX_BYTES_DEFAULT = 0 # unlimited
+IPC_QUEUE_MAX_ITEMS_DEFAULT = 0 # unlimited
+IPC_QUEUE_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+IPC_QUEUE_POLICY_DEFAULT = 'block'
+IPC_RING_SIZE_DEFAULT = 16 * 2**20 # bytes
+IPC_STREAM_LIMIT_DEFAULT = 2**18 # bytes, asyncio stream buffer
+IPC_TRANSPORT_DEFAULT = 'pipe'
+IPC_TRANSPORTS = ('pipe', 'ring')
+
 LIB_MODE_DEFAULT = False
 
+LOG_ACCESS_PROFILE_DEFAULT = False
 LOG_BUFFERS_DEFAULT = False
 LOG_ENABLED_DEFAULT = True
+LOG_INDEX_DEFAULT = False
 LOG_JSON_DEFAULT = False
 LOG_ONLYMODIFYOPERATIONS_DEFAULT = False
 LOG_PRINTPROCESSNAME_DEFAULT = True
 LOG_SYSLOG_DEFAULT = False
+LOG_TIME_NS_DEFAULT = False
+
+POOL_PROCESSES_DEFAULT = 1 # LoggedFS-python processes hosting the mounts of a notifier pool
+
+REPLAY_QUEUE_EVENTS_DEFAULT = 10000 # events per process waiting for replay
+REPLAY_SPEED_DEFAULT = 0.0 # as fast as possible
+
+SINK_BUFFER_SIZE_DEFAULT = 2**20 # bytes
+SINK_COMPRESSION_DEFAULT = 'none'
+SINK_COMPRESSIONS = ('none', 'gzip', 'xz', 'zstd')
+SINK_FSYNC_INTERVAL_DEFAULT = 1.0 # seconds, 0 leaves it to the OS
+SINK_ROTATE_BYTES_DEFAULT = 0 # never
+SINK_ROTATE_SECONDS_DEFAULT = 0 # never
+
+SYSLOG_APP_NAME_DEFAULT = 'loggedfs'
+SYSLOG_BATCH_BYTES_DEFAULT = 2**16 # bytes of messages per send on stream sockets
+SYSLOG_QUEUE_MAX_ITEMS_DEFAULT = 2**16 # messages, further messages are dropped
+SYSLOG_RETRY_INTERVAL_DEFAULT = 1.0 # seconds between reconnects
+SYSLOG_SEND_TIMEOUT_DEFAULT = 1.0 # seconds
+
+WRITER_FLUSH_INTERVAL_DEFAULT = 1.0 # seconds, events are flushed no later than this after being written
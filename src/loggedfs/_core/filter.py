@@ -30,11 +30,32 @@ specific language governing rights and limitations under the License.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 from collections import OrderedDict
+from functools import lru_cache, partial
+import operator
 import re
 
-import xmltodict
+from .defaults import (
+	FILTER_CACHE_SIZE_DEFAULT,
+	LOG_ENABLED_DEFAULT,
+	LOG_PRINTPROCESSNAME_DEFAULT
+	)
 
-from .defaults import LOG_ENABLED_DEFAULT, LOG_PRINTPROCESSNAME_DEFAULT
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+_TRIE_PATH_END = 0 # key in trie node: a "path" rule ends here
+_TRIE_PARTIALS = 1 # key in trie node: partial last segments of "prefix" rules
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _is_path_key_(key):
+
+	return key.endswith('path')
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -83,6 +104,117 @@ class filter_field_class:
 		return self._value
 
 
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# FILTER PATH TRIE CLASS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class filter_path_trie_class:
+	"""Matches a path against any number of path rules in one pass.
+	The trie is organized by path segment, so the cost of a match depends on the
+	depth of the path rather than on the number of rules.
+
+	- "path" rules match the path itself and everything below it
+	- "prefix" rules match every path starting with the given string
+	"""
+
+
+	def __init__(self, path_list = None, prefix_list = None):
+
+		if path_list is None:
+			path_list = []
+		if prefix_list is None:
+			prefix_list = []
+
+		if not isinstance(path_list, list):
+			raise TypeError('path_list must be of type list')
+		if not isinstance(prefix_list, list):
+			raise TypeError('prefix_list must be of type list')
+
+		self._root = {}
+		self._path_list = []
+		self._prefix_list = []
+
+		for path in path_list:
+			self.add_path(path)
+		for prefix in prefix_list:
+			self.add_prefix(prefix)
+
+
+	def __call__(self, value):
+
+		node = self._root
+		for segment in value.split('/'):
+			partials = node.get(_TRIE_PARTIALS, None)
+			if partials is not None and segment.startswith(partials):
+				return True
+			node = node.get(segment, None)
+			if node is None:
+				return False
+			if _TRIE_PATH_END in node:
+				return True
+		return False
+
+
+	def __len__(self):
+
+		return len(self._path_list) + len(self._prefix_list)
+
+
+	def __repr__(self):
+
+		return '<filter_path_trie paths="%d" prefixes="%d"/>' % (len(self._path_list), len(self._prefix_list))
+
+
+	def add_path(self, path):
+
+		if not isinstance(path, str):
+			raise TypeError('path must be of type str')
+		if len(path) == 0:
+			raise ValueError('path must not be empty')
+
+		node = self._root
+		for segment in path.rstrip('/').split('/'):
+			node = node.setdefault(segment, {})
+		node[_TRIE_PATH_END] = True
+		self._path_list.append(path)
+
+
+	def add_prefix(self, prefix):
+
+		if not isinstance(prefix, str):
+			raise TypeError('prefix must be of type str')
+
+		node = self._root
+		*segments, partial = prefix.split('/')
+		for segment in segments:
+			node = node.setdefault(segment, {})
+		node[_TRIE_PARTIALS] = node.get(_TRIE_PARTIALS, tuple()) + (partial,)
+		self._prefix_list.append(prefix)
+
+
+	def update(self, other):
+
+		if not isinstance(other, filter_path_trie_class):
+			raise TypeError('other must be of type filter_path_trie_class')
+
+		for path in other.path_list:
+			self.add_path(path)
+		for prefix in other.prefix_list:
+			self.add_prefix(prefix)
+
+
+	@property
+	def path_list(self):
+
+		return self._path_list.copy()
+
+
+	@property
+	def prefix_list(self):
+
+		return self._prefix_list.copy()
+
+
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # FILTER ITEM CLASS
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -114,6 +246,35 @@ class filter_item_class:
 			)
 
 
+	@property
+	def field_names(self):
+		"""Names of all fields which are addressed by a string.
+		"""
+
+		return frozenset(self._field_names)
+
+
+	@property
+	def field_name_funcs(self):
+		"""Callables of all fields which address event keys by a function.
+		"""
+
+		return tuple(field.name for field in self._field_funcs)
+
+
+	@property
+	def path_trie(self):
+		"""Path trie of this item if it is its one and only criterion, otherwise None.
+		"""
+
+		if len(self._fields_list) != 1:
+			return None
+		field = self._fields_list[0]
+		if field.name is not _is_path_key_ or not isinstance(field.value, filter_path_trie_class):
+			return None
+		return field.value
+
+
 	def match(self, event_dict):
 
 		if not isinstance(event_dict, dict):
@@ -153,9 +314,9 @@ class filter_item_class:
 
 		try:
 			if xml_dict['@retname'] == 'SUCCESS':
-				fields_list.append(filter_field_class('status', lambda x: x == True))
+				fields_list.append(filter_field_class('status', partial(operator.eq, True)))
 			elif xml_dict['@retname'] == 'FAILURE':
-				fields_list.append(filter_field_class('status', lambda x: x == False))
+				fields_list.append(filter_field_class('status', partial(operator.eq, False)))
 			elif xml_dict['@retname'] != '.*':
 				raise ValueError('unexpected value for "retname"')
 		except KeyError:
@@ -164,15 +325,29 @@ class filter_item_class:
 		try:
 			if xml_dict['@extension'] != '.*':
 				fields_list.append(filter_field_class(
-					lambda x: x.endswith('path'), re.compile(xml_dict['@extension']).match
+					_is_path_key_, re.compile(xml_dict['@extension']).match
 					))
 		except KeyError:
 			pass
 
+		try:
+			fields_list.append(filter_field_class(
+				_is_path_key_, filter_path_trie_class(path_list = [xml_dict['@path']])
+				))
+		except KeyError:
+			pass
+
+		try:
+			fields_list.append(filter_field_class(
+				_is_path_key_, filter_path_trie_class(prefix_list = [xml_dict['@prefix']])
+				))
+		except KeyError:
+			pass
+
 		try:
 			if xml_dict['@uid'].isdecimal():
 				fields_list.append(filter_field_class(
-					'proc_uid', lambda x: x == int(xml_dict['@uid'])
+					'proc_uid', partial(operator.eq, int(xml_dict['@uid']))
 					))
 			elif xml_dict['@uid'] != '*':
 				raise ValueError('unexpected value for "uid"')
@@ -211,7 +386,13 @@ class filter_pipeline_class:
 	VALID_XML_BLOCKS = ('@logEnabled', '@printProcessName', 'includes', 'excludes')
 
 
-	def __init__(self, include_list = None, exclude_list = None):
+	def __init__(self, include_list = None, exclude_list = None, cache_size = FILTER_CACHE_SIZE_DEFAULT):
+		"""Creates a filter pipeline.
+
+		- include_list: None or list of filter_item_class, events must match at least one item
+		- exclude_list: None or list of filter_item_class, events must not match any item
+		- cache_size: Integer, number of memoised decisions, 0 deactivates the cache
+		"""
 
 		if include_list is None:
 			include_list = []
@@ -226,10 +407,20 @@ class filter_pipeline_class:
 			raise TypeError('include_list must only contain type filter_item_class')
 		if any((not isinstance(item, filter_item_class) for item in exclude_list)):
 			raise TypeError('exclude_list must only contain type filter_item_class')
+		if not isinstance(cache_size, int) or isinstance(cache_size, bool):
+			raise TypeError('cache_size must be of type int')
+		if cache_size < 0:
+			raise ValueError('cache_size must not be negative')
 
 		self._include_list = include_list
 		self._exclude_list = exclude_list
 
+		self._include_compiled = self._compile_items(include_list)
+		self._exclude_compiled = self._compile_items(exclude_list)
+
+		self._cache_size = cache_size
+		self._init_cache()
+
 
 	def __repr__(self):
 
@@ -251,23 +442,123 @@ class filter_pipeline_class:
 			)
 
 
+	def __getstate__(self):
+		"""Pipelines built from XML configurations (or from other picklable callables)
+		can be pickled, e.g. for being handed to a LoggedFS-python process in library mode.
+		The decision cache is not part of the state.
+		"""
+
+		return {
+			'include_list': self._include_list,
+			'exclude_list': self._exclude_list,
+			'cache_size': self._cache_size,
+			}
+
+
+	def __setstate__(self, state):
+
+		self.__init__(**state)
+
+
+	def _init_cache(self):
+
+		self._cache_key_names = frozenset().union(*(
+			item.field_names for item in self._include_list + self._exclude_list
+			))
+		self._cache_key_funcs = tuple(
+			func for item in self._include_list + self._exclude_list for func in item.field_name_funcs
+			)
+		self._cache_key_relevance = {}
+		if self._cache_size > 0:
+			self._match_cached = lru_cache(maxsize = self._cache_size)(self._match_cache_key)
+
+
+	def cache_info(self):
+		"""Returns hits, misses, maxsize and currsize of the decision cache or None if it is deactivated.
+		"""
+
+		if self._cache_size == 0:
+			return None
+		return self._match_cached.cache_info()
+
+
 	def match(self, event_dict):
 
 		if not isinstance(event_dict, dict):
 			raise TypeError('event_dict must be of type dict')
 
-		if len(self._include_list) > 0:
-			if not any((item.match(event_dict) for item in self._include_list)):
+		if self._cache_size == 0:
+			return self._match(event_dict)
+
+		try:
+			return self._match_cached(self._cache_key(event_dict))
+		except TypeError: # unhashable value in a field which is read by the pipeline
+			return self._match(event_dict)
+
+
+	def _cache_key(self, event_dict):
+		"""Reduces an event to the fields which are actually read by the pipeline.
+		Key order is preserved, so field callables find the same keys as on the full event.
+		"""
+
+		relevance = self._cache_key_relevance
+		cache_key = []
+
+		for name, value in event_dict.items():
+			try:
+				relevant = relevance[name]
+			except KeyError:
+				relevant = relevance[name] = (
+					name in self._cache_key_names
+					or any((func(name) for func in self._cache_key_funcs))
+					)
+			if relevant:
+				cache_key.append((name, value))
+
+		return tuple(cache_key)
+
+
+	def _match_cache_key(self, cache_key):
+
+		return self._match(dict(cache_key))
+
+
+	def _match(self, event_dict):
+
+		if len(self._include_compiled) > 0:
+			if not any((item.match(event_dict) for item in self._include_compiled)):
 				return False
 
-		if any((item.match(event_dict) for item in self._exclude_list)):
+		if any((item.match(event_dict) for item in self._exclude_compiled)):
 			return False
 
 		return True
 
 
 	@staticmethod
-	def from_xmlstring(xml_str):
+	def _compile_items(item_list):
+		"""Merges all items which only consist of a path trie into a single item.
+		This way, path rules are evaluated in one pass no matter how many there are.
+		"""
+
+		path_trie = None
+		compiled_list = []
+
+		for item in item_list:
+			item_path_trie = item.path_trie
+			if item_path_trie is None:
+				compiled_list.append(item)
+				continue
+			if path_trie is None:
+				path_trie = filter_path_trie_class()
+				compiled_list.insert(0, filter_item_class([filter_field_class(_is_path_key_, path_trie)]))
+			path_trie.update(item_path_trie)
+
+		return compiled_list
+
+
+	@staticmethod
+	def from_xmlstring(xml_str, cache_size = FILTER_CACHE_SIZE_DEFAULT):
 		"""Parse XML configuration string and return instance of filter_pipeline_class.
 		Compatibility layer for original LoggedFS XML configuration file format.
 		"""
@@ -276,6 +567,9 @@ class filter_pipeline_class:
 			raise TypeError('xml_str must have type str')
 		if len(xml_str) == 0:
 			raise ValueError('xml_str must not be empty')
+
+		import xmltodict # deferred, pulls in xml.sax and urllib
+
 		try:
 			xml_dict = xmltodict.parse(xml_str)
 		except:
@@ -325,4 +619,4 @@ class filter_pipeline_class:
 				else:
 					group_list.append([])
 
-		return log_enabled, log_printprocessname, filter_pipeline_class(*group_list)
+		return log_enabled, log_printprocessname, filter_pipeline_class(*group_list, cache_size = cache_size)
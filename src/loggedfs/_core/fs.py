@@ -30,8 +30,13 @@ specific language governing rights and limitations under the License.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 import errno
+from functools import partial
 import os
+import signal
 import stat
+import subprocess
+import sys
+import threading
 
 from refuse.high import (
 	FUSE,
@@ -43,18 +48,41 @@ from refuse.high import (
 from .defaults import (
 	FUSE_ALLOWOTHER_DEFAULT,
 	FUSE_FOREGROUND_DEFAULT,
+	HOT_INTERVAL_DEFAULT,
+	HOT_TOP_DEFAULT,
+	IPC_CODEC_DEFAULT,
+	IPC_CODECS,
 	LIB_MODE_DEFAULT,
+	LOG_ACCESS_PROFILE_DEFAULT,
 	LOG_BUFFERS_DEFAULT,
 	LOG_ENABLED_DEFAULT,
+	LOG_INDEX_DEFAULT,
 	LOG_JSON_DEFAULT,
 	LOG_ONLYMODIFYOPERATIONS_DEFAULT,
 	LOG_PRINTPROCESSNAME_DEFAULT,
-	LOG_SYSLOG_DEFAULT
+	LOG_SYSLOG_DEFAULT,
+	LOG_TIME_NS_DEFAULT,
+	SINK_COMPRESSION_DEFAULT,
+	SINK_COMPRESSIONS,
+	SINK_ROTATE_BYTES_DEFAULT,
+	SINK_ROTATE_SECONDS_DEFAULT
 	)
 from .filter import filter_pipeline_class
+from .ipc import _locked_sender_class, _ring_writer_class, _sender_class, mount_ready, ring_supported
 from .log import get_logger, log_msg
 from .out import event
+from .profile import access_profile_msg, access_profiler_class
+from .sketch import hot_msg, hot_tracker_class
 from .timing import time
+from .writer import _event_writer_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+MULTI_SIGNALS = (signal.SIGHUP, signal.SIGINT, signal.SIGTERM) # libfuse's exit signals
+MULTI_JOIN_INTERVAL = 0.1 # seconds, main thread stays responsive to signals
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -73,11 +101,96 @@ def loggedfs_factory(directory, **kwargs):
 	if not isinstance(kwargs.get('fuse_allowother', FUSE_ALLOWOTHER_DEFAULT), bool):
 		raise TypeError('fuse_allowother must be of type bool')
 
+	return _mount(_loggedfs(directory, **kwargs), directory, kwargs)
+
+
+def loggedfs_multi_factory(directories, log_filters = None, **kwargs):
+	"""Mounts several directories from one process, each served by a thread, and returns
+	once all of them are unmounted. Mount IDs are the directories' indices. log_filters holds
+	a filter pipeline (or None) per directory, all other parameters apply to all directories
+	(see loggedfs_factory). Log handlers and, in library mode, the output stream are shared.
+	Events carry their mount ID: in the logger name, e.g. "LoggedFS-python:1", and in JSON
+	logs and library mode in the field "mount_id".
+	libfuse's signal handlers would only ever end one mount. If called from the main thread,
+	SIGHUP, SIGINT and SIGTERM instead unmount all directories (see MULTI_SIGNALS).
+	"""
+
+	if not isinstance(directories, (list, tuple)) or not all(isinstance(item, str) for item in directories):
+		raise TypeError('directories must be a list of strings')
+	if len(directories) == 0:
+		raise ValueError('directories must not be empty')
+	if not all(os.path.isdir(item) for item in directories):
+		raise ValueError('directories must be paths to existing directories')
+	if len({os.path.abspath(item) for item in directories}) != len(directories):
+		raise ValueError('directories must not be mounted twice')
+
+	if log_filters is None:
+		log_filters = [kwargs.pop('log_filter', None)] * len(directories)
+	elif 'log_filter' in kwargs:
+		raise ValueError('log_filter and log_filters are mutually exclusive')
+	if not isinstance(log_filters, (list, tuple)) or len(log_filters) != len(directories):
+		raise ValueError('log_filters must hold one filter pipeline or None per directory')
+
+	if not isinstance(kwargs.get('fuse_foreground', FUSE_FOREGROUND_DEFAULT), bool):
+		raise TypeError('fuse_foreground must be of type bool')
+	if not kwargs.get('fuse_foreground', FUSE_FOREGROUND_DEFAULT):
+		raise ValueError('several directories require fuse_foreground, threads can not be daemonized')
+	if not isinstance(kwargs.get('fuse_allowother', FUSE_ALLOWOTHER_DEFAULT), bool):
+		raise TypeError('fuse_allowother must be of type bool')
+	if kwargs.get('log_columnar', None) is not None:
+		raise ValueError('log_columnar is not supported with several directories')
+
+	if kwargs.get('lib_mode', LIB_MODE_DEFAULT) and kwargs.get('_lib_out_func', None) is None:
+		kwargs['_lib_out_func'] = _lib_sender(
+			kwargs.get('lib_ring', None), kwargs.get('lib_codec', IPC_CODEC_DEFAULT), _locked_sender_class
+			)
+
+	operations = [_loggedfs(directories[0], log_filter = log_filters[0], mount_id = 0, **kwargs)]
+	log_handlers = operations[0]._logger.handlers
+	operations.extend(
+		_loggedfs(directory, log_filter = log_filter, mount_id = mount_id, _log_handlers = log_handlers, **kwargs)
+		for mount_id, (directory, log_filter) in enumerate(zip(directories[1:], log_filters[1:]), start = 1)
+		)
+
+	threads = [
+		threading.Thread(target = _mount, args = (item, directory, kwargs), daemon = False)
+		for item, directory in zip(operations, directories)
+		]
+
+	# Installed before mounting: libfuse only installs its handlers where none are set
+	main = threading.current_thread() is threading.main_thread()
+	if main:
+		unmount_func = partial(_unmount_all, [os.path.abspath(directory) for directory in directories])
+		old_handlers = {signum: signal.signal(signum, unmount_func) for signum in MULTI_SIGNALS}
+	try:
+		for t in threads:
+			t.start()
+		for t in threads:
+			while t.is_alive():
+				t.join(MULTI_JOIN_INTERVAL)
+	finally:
+		if main:
+			for signum, old_handler in old_handlers.items():
+				signal.signal(signum, old_handler)
+
+
+def _lib_sender(lib_ring, lib_codec, sender_class = _sender_class):
+
+	if lib_ring is not None: # stdout only serves as doorbell
+		return sender_class(_ring_writer_class(lib_ring, sys.stdout.buffer), lib_codec).send
+	return sender_class(sys.stdout.buffer, lib_codec).send
+
+
+def _unmount_all(directories, signum, frame):
+
+	for directory in directories: # lazily, as libfuse does on exit signals
+		subprocess.run(['fusermount', '-u', '-z', directory], stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+
+
+def _mount(operations, directory, kwargs):
+
 	return FUSE(
-		_loggedfs(
-			directory,
-			**kwargs
-			),
+		operations,
 		directory,
 		raw_fi = True,
 		nothreads = True,
@@ -114,15 +227,27 @@ class _loggedfs(Operations):
 		directory,
 		fuse_foreground = FUSE_FOREGROUND_DEFAULT,
 		fuse_allowother = FUSE_ALLOWOTHER_DEFAULT,
+		lib_codec = IPC_CODEC_DEFAULT,
 		lib_mode = LIB_MODE_DEFAULT,
+		lib_ring = None,
+		log_access_profile = LOG_ACCESS_PROFILE_DEFAULT,
 		log_buffers = LOG_BUFFERS_DEFAULT,
+		log_columnar = None,
+		log_compression = SINK_COMPRESSION_DEFAULT,
 		log_enabled = LOG_ENABLED_DEFAULT,
 		log_file = None,
 		log_filter = None,
+		log_hot_interval = HOT_INTERVAL_DEFAULT,
+		log_hot_top = HOT_TOP_DEFAULT,
+		log_index = LOG_INDEX_DEFAULT,
 		log_json = LOG_JSON_DEFAULT,
 		log_only_modify_operations = LOG_ONLYMODIFYOPERATIONS_DEFAULT,
 		log_printprocessname = LOG_PRINTPROCESSNAME_DEFAULT,
+		log_rotate_bytes = SINK_ROTATE_BYTES_DEFAULT,
+		log_rotate_seconds = SINK_ROTATE_SECONDS_DEFAULT,
 		log_syslog = LOG_SYSLOG_DEFAULT,
+		log_time_ns = LOG_TIME_NS_DEFAULT,
+		mount_id = None,
 		**kwargs
 		):
 
@@ -155,12 +280,59 @@ class _loggedfs(Operations):
 			raise TypeError('log_printprocessname must be of type bool')
 		if not isinstance(log_json, bool):
 			raise TypeError('log_json must be of type bool')
+		if not isinstance(log_time_ns, bool):
+			raise TypeError('log_time_ns must be of type bool')
 		if not isinstance(log_buffers, bool):
 			raise TypeError('log_buffers must be of type bool')
+		if not isinstance(log_access_profile, bool):
+			raise TypeError('log_access_profile must be of type bool')
+		if not isinstance(log_hot_interval, (int, float)) or not isinstance(log_hot_top, int):
+			raise TypeError('log_hot_interval must be of type float, log_hot_top of type int')
+		if log_hot_interval < 0 or log_hot_top < 1:
+			raise ValueError('log_hot_interval must not be negative, log_hot_top must be positive')
 		if not isinstance(lib_mode, bool):
 			raise TypeError('lib_mode must be of type bool')
+		if mount_id is not None and not isinstance(mount_id, int):
+			raise TypeError('mount_id must either be None or of type int')
+		if lib_codec not in IPC_CODECS:
+			raise ValueError('lib_codec must be one of %s' % ', '.join(IPC_CODECS))
+		if lib_ring is not None:
+			if not isinstance(lib_ring, str):
+				raise TypeError('lib_ring must either be None or of type string')
+			if not os.path.isfile(lib_ring):
+				raise ValueError('lib_ring must be a path to an existing ring buffer file')
+			if not ring_supported():
+				raise ValueError('lib_ring requires an x86 CPU, see ring_supported')
+			if not lib_mode:
+				raise ValueError('lib_ring requires lib_mode')
 		if not isinstance(log_only_modify_operations, bool):
 			raise TypeError('log_only_modify_operations must be of type bool')
+		if not isinstance(log_index, bool):
+			raise TypeError('log_index must be of type bool')
+		if log_index and log_file is None:
+			raise ValueError('log_index requires log_file')
+		if not isinstance(log_rotate_bytes, int):
+			raise TypeError('log_rotate_bytes must be of type int')
+		if not isinstance(log_rotate_seconds, (int, float)):
+			raise TypeError('log_rotate_seconds must be of type float')
+		if log_rotate_bytes < 0 or log_rotate_seconds < 0:
+			raise ValueError('log_rotate_bytes and log_rotate_seconds must not be negative')
+		if log_compression not in SINK_COMPRESSIONS:
+			raise ValueError('log_compression must be one of %s' % ', '.join(SINK_COMPRESSIONS))
+		log_sink = None
+		if log_rotate_bytes > 0 or log_rotate_seconds > 0 or log_compression != SINK_COMPRESSION_DEFAULT:
+			if log_file is None:
+				raise ValueError('log rotation and compression require log_file')
+			log_sink = {
+				'rotate_bytes': log_rotate_bytes,
+				'rotate_seconds': log_rotate_seconds,
+				'compression': log_compression,
+				}
+		if log_columnar is not None:
+			if not isinstance(log_columnar, str):
+				raise TypeError('log_columnar must either be None or of type string')
+			if not os.path.isdir(log_columnar):
+				raise ValueError('log_columnar must be a path to an existing directory')
 
 		if not isinstance(fuse_foreground, bool):
 			raise TypeError('fuse_foreground must be of type bool')
@@ -174,8 +346,34 @@ class _loggedfs(Operations):
 		self._log_filter = log_filter
 		self._lib_mode = lib_mode
 		self._log_only_modify_operations = log_only_modify_operations
-
-		self._logger = get_logger('LoggedFS-python', log_enabled, log_file, log_syslog, self._log_json)
+		self._log_index = log_index
+		if log_columnar is not None:
+			from .columnar import columnar_writer_class # deferred, only needed for columnar logs
+			self._log_columnar = columnar_writer_class(log_columnar)
+		else:
+			self._log_columnar = None
+		self._mount_id = mount_id # tags events if several directories are served by this process
+		self._lib_send = kwargs.pop('_lib_out_func', None) # in-process library mode replaces pipe
+		self._lib_filter = kwargs.pop('_lib_filter', False) # log_filter was handed over by consumer
+		if self._lib_send is None and lib_mode: # not needed otherwise
+			self._lib_send = _lib_sender(lib_ring, lib_codec)
+
+		self._logger = get_logger(
+			'LoggedFS-python' if mount_id is None else 'LoggedFS-python:%d' % mount_id,
+			log_enabled, log_file, log_syslog, self._log_json,
+			log_stream = kwargs.pop('_log_stream', None), log_index = log_index, log_sink = log_sink,
+			log_time_ns = log_time_ns, log_handlers = kwargs.pop('_log_handlers', None)
+			)
+		self._log_writer = _event_writer_class(
+			self._logger, self._log_json, log_time_ns, shared = mount_id is not None
+			) # operation events only
+		self._access_profiler = access_profiler_class(
+			lambda summary: self._logger.info(access_profile_msg(self._log_json, summary))
+			) if log_access_profile else None
+		self._hot_tracker = hot_tracker_class() if log_hot_interval > 0 else None
+		self._hot_interval = log_hot_interval
+		self._hot_next = time.monotonic() + log_hot_interval
+		self._hot_top = log_hot_top
 
 		if fuse_foreground:
 			self._logger.info(log_msg(self._log_json, 'LoggedFS-python not running as a daemon'))
@@ -183,6 +381,8 @@ class _loggedfs(Operations):
 			self._logger.info(log_msg(self._log_json, 'LoggedFS-python running as a public filesystem'))
 		if log_file is not None:
 			self._logger.info(log_msg(self._log_json, 'LoggedFS-python log file: %s' % log_file))
+		if log_columnar is not None:
+			self._logger.info(log_msg(self._log_json, 'LoggedFS-python columnar directory: %s' % log_columnar))
 
 		self._logger.info(log_msg(self._log_json, 'LoggedFS-python starting at %s' % directory))
 
@@ -202,6 +402,17 @@ class _loggedfs(Operations):
 			raise ValueError('unknown keyword argument(s)')
 
 
+	@property
+	def hot_stats(self):
+		"""Most active paths, processes and users so far (see hot_tracker_class.stats),
+		None if not tracked (log_hot_interval 0).
+		"""
+
+		if self._hot_tracker is None:
+			return None
+		return self._hot_tracker.stats(self._hot_top)
+
+
 	def _full_path(self, partial_path):
 
 		if partial_path.startswith('/'):
@@ -278,12 +489,31 @@ class _loggedfs(Operations):
 		os.chown(self._rel_path(path), uid, gid, dir_fd = self._root_path_fd, follow_symlinks = False)
 
 
-	@event(format_pattern = '{param_path}')
+	@event(format_pattern = '{param_path}', finalize = True)
 	def destroy(self, path):
 
+		cache_info = self._log_filter.cache_info()
+		if cache_info is not None:
+			self._logger.info(log_msg(self._log_json,
+				'LoggedFS-python filter cache: %d hits, %d misses, %d of %d entries used' % cache_info
+				))
+		if self._access_profiler is not None: # handles still open
+			self._access_profiler.release_all()
+		if self._hot_tracker is not None:
+			self._logger.info(hot_msg(self._log_json, self.hot_stats))
+
 		os.close(self._root_path_fd)
 
 
+	def _finalize_outputs(self):
+		"""Called once the destroy event itself has been logged, see event.
+		"""
+
+		if self._log_columnar is not None:
+			self._log_columnar.close()
+		self._log_writer.close()
+
+
 	@event(format_pattern = '{param_path} (fh={param_fip})')
 	def getattr(self, path, fip):
 
@@ -306,7 +536,8 @@ class _loggedfs(Operations):
 	@event(format_pattern = '{param_path}')
 	def init(self, path):
 
-		pass
+		if self._lib_mode: # mounted, unblocks loggedfs_notify.wait_ready
+			self._lib_send(mount_ready(self._root_path, time.time_ns(), self._lib_filter))
 
 
 	@event(format_pattern = '{param_source_path} to {param_target_path}')
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/index.py: Sidecar index for log files and queries
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import json
+import logging
+import os
+import re
+
+from .defaults import (
+	INDEX_BLOCK_EVENTS_DEFAULT,
+	INDEX_BLOCK_SECONDS_DEFAULT
+	)
+from .reader import (
+	_timestamp_parser_class,
+	open_log,
+	parse_json_line,
+	strip_compression_suffix,
+	TEXT_LINE_RE,
+	TIME_FORMAT
+	)
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+INDEX_SUFFIX = '.idx'
+INDEX_PATHS_ATTR = 'lfs_paths' # attribute of log records holding the paths of an event
+
+LINE_TIME_RE = re.compile(r'^(?:\{"time": "?)?(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d+|\d+)')
+TEXT_PATH_END = r'(?=$| \(fh=| to | at offset | \d+$)' # what follows a path in traditional format, see fs.py
+QUERY_TIME_FORMATS = (TIME_FORMAT, '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: INDEX WRITER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _index_writer_class:
+	"""Maintains a sidecar index (log file name plus ".idx").
+	Records are grouped into blocks of consecutive lines. Once a block holds block_events
+	records or spans block_seconds, one JSON line is appended to the index: byte offsets
+	of the block, its time range (ns) and the set of paths its events touched.
+	"""
+
+
+	def __init__(self,
+		log_path,
+		block_events = INDEX_BLOCK_EVENTS_DEFAULT,
+		block_seconds = INDEX_BLOCK_SECONDS_DEFAULT
+		):
+
+		self._path = log_path + INDEX_SUFFIX
+		self._f = open(self._path, 'a', encoding = 'utf-8')
+		self._block_events_max = block_events
+		self._block_ns_max = int(block_seconds * 10**9)
+		self._block_reset()
+
+
+	def _block_reset(self):
+
+		self._block_offset = None
+		self._block_end = None
+		self._block_events = 0
+		self._block_time_min = None
+		self._block_time_max = None
+		self._block_paths = set()
+
+
+	def _block_write(self):
+
+		if self._block_offset is None:
+			return
+		self._f.write(json.dumps({
+			'offset': self._block_offset,
+			'end': self._block_end,
+			'events': self._block_events,
+			'time_min': self._block_time_min,
+			'time_max': self._block_time_max,
+			'paths': sorted(self._block_paths),
+			}) + '\n')
+		self._f.flush()
+		self._block_reset()
+
+
+	def add(self, record, offset, end):
+		"""Adds a log record written to the log file between offset and end (bytes).
+		"""
+
+		self.add_event(
+			offset, end,
+			getattr(record, 'created_ns', None) or int(record.created * 10**9),
+			getattr(record, INDEX_PATHS_ATTR, ())
+			)
+
+
+	def add_event(self, offset, end, created_ns, paths):
+
+		if self._block_offset is None:
+			self._block_offset = offset
+			self._block_time_min = created_ns
+		self._block_end = end
+		self._block_time_max = created_ns
+		self._block_events += 1
+		if paths is not None:
+			self._block_paths.update(paths)
+
+		if (
+			self._block_events >= self._block_events_max
+			or created_ns - self._block_time_min >= self._block_ns_max
+			):
+			self._block_write()
+
+
+	def rotate(self, segment_path):
+		"""The log file was renamed to segment_path, the index follows and starts over.
+		"""
+
+		self._block_write()
+		self._f.close()
+		os.rename(self._path, segment_path + INDEX_SUFFIX)
+		self._f = open(self._path, 'a', encoding = 'utf-8')
+
+
+	def close(self):
+
+		self._block_write()
+		self._f.close()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: INDEXED FILE HANDLER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _indexed_file_handler_class(logging.FileHandler):
+	"""Log file handler maintaining a sidecar index, see _index_writer_class.
+	Byte offsets are counted while writing (UTF-8), the text stream is never asked for its position.
+	"""
+
+
+	def __init__(self, filename, **kwargs):
+
+		self._offset = 0 # bytes, end of log file
+		super().__init__(filename, mode = 'a', encoding = 'utf-8')
+		self._index = _index_writer_class(filename, **kwargs)
+
+
+	def _open(self):
+
+		stream = super()._open()
+		self._offset = os.fstat(stream.fileno()).st_size # appending
+		return stream
+
+
+	def emit(self, record):
+
+		if self.stream is None:
+			self.stream = self._open()
+		offset = self._offset
+		try:
+			line = self.format(record) + self.terminator
+			self.stream.write(line)
+			self.flush()
+		except Exception:
+			self.handleError(record)
+			return
+		self._offset += len(line.encode('utf-8'))
+		self._index.add(record, offset, self._offset)
+
+
+	def write_event(self, line, created_ns, paths):
+		"""Fast path for the event writer, bypassing records and formatting.
+		"""
+
+		if self.stream is None:
+			self.stream = self._open()
+		offset = self._offset
+		self.stream.write(line)
+		self._offset += len(line.encode('utf-8'))
+		self._index.add_event(offset, self._offset, created_ns, paths)
+
+
+	def close(self):
+
+		self.acquire()
+		try:
+			self._index.close()
+		finally:
+			self.release()
+		super().close()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def parse_query_time(value):
+	"""Converts a point in time given on the command line into nanoseconds since the epoch:
+	either an integer (nanoseconds) or local time such as "2020-07-11 10:05[:00]".
+	"""
+
+	try:
+		return int(value)
+	except ValueError:
+		pass
+	for time_format in QUERY_TIME_FORMATS:
+		try:
+			return int(time.mktime(time.strptime(value, time_format))) * 10**9
+		except ValueError:
+			continue
+	raise ValueError('unknown time format: "%s"' % value)
+
+
+def load_index(log_path):
+	"""Returns the blocks of the sidecar index of a log file, empty if there is none.
+	Compressed segments share the index of their uncompressed original.
+	"""
+
+	index_path = strip_compression_suffix(log_path) + INDEX_SUFFIX
+	if not os.path.isfile(index_path):
+		return []
+
+	blocks = []
+	with open(index_path, 'r', encoding = 'utf-8') as f:
+		for line in f:
+			try:
+				blocks.append(json.loads(line))
+			except ValueError: # incomplete last line
+				break
+	return blocks
+
+
+def _block_relevant(block, paths, prefixes, since, until):
+
+	if since is not None and block['time_max'] < since:
+		return False
+	if until is not None and block['time_min'] > until:
+		return False
+	if len(paths) == 0 and len(prefixes) == 0:
+		return True
+	block_paths = block['paths']
+	if any(path in block_paths for path in paths): # sorted list, small compared to log
+		return True
+	return any(block_path.startswith(prefixes) for block_path in block_paths)
+
+
+def _ranges(log_path, blocks, paths, prefixes, since, until):
+	"""Byte ranges of the log file worth reading, merged. Anything beyond the last block is not indexed.
+	"""
+
+	if strip_compression_suffix(log_path) != log_path: # uncompressed size unknown
+		log_size = blocks[-1]['end'] if len(blocks) > 0 else float('inf')
+	else:
+		log_size = os.path.getsize(log_path)
+	if len(blocks) == 0:
+		return [(0, log_size)]
+
+	ranges = []
+	for block in blocks:
+		if block['end'] > log_size: # log file was truncated or replaced
+			return [(0, log_size)]
+		if not _block_relevant(block, paths, prefixes, since, until):
+			continue
+		if len(ranges) > 0 and ranges[-1][1] == block['offset']:
+			ranges[-1] = (ranges[-1][0], block['end'])
+		else:
+			ranges.append((block['offset'], block['end']))
+	tail = blocks[-1]['end']
+	if tail < log_size:
+		ranges.append((tail, log_size))
+	return ranges
+
+
+def _line_refers(line, paths, prefixes, text_re):
+
+	if line.startswith('{'):
+		log_dict = parse_json_line(line)
+		if log_dict is None:
+			return False
+		return any(
+			value in paths or value.startswith(prefixes)
+			for key, value in log_dict.items() if key.endswith('path') and isinstance(value, str)
+			)
+
+	# Traditional format: paths are not quoted and may contain blanks, so they are
+	# looked up in the parameters field instead of being split off, see _text_paths_re.
+	match = TEXT_LINE_RE.match(line)
+	if match is None:
+		return False
+	return text_re.search(match.group('params')) is not None
+
+
+def _text_paths_re(paths, prefixes):
+
+	return re.compile('(?:^| )(?:%s)' % '|'.join(
+		[re.escape(path) + TEXT_PATH_END for path in paths] + [re.escape(prefix) for prefix in prefixes]
+		))
+
+
+def query_log(log_path, paths = (), prefixes = (), since = None, until = None):
+	"""Yields lines of a log file (traditional or JSON format) referring to any of the paths,
+	or to paths starting with any of the prefixes, logged between since and until (ns, inclusive).
+	Only blocks of the log file which the sidecar index deems relevant are read.
+	"""
+
+	paths = tuple(path.rstrip('/') if path != '/' else path for path in paths)
+	prefixes = tuple(prefixes)
+	ranges = _ranges(log_path, load_index(log_path), paths, prefixes, since, until)
+	text_re = _text_paths_re(paths, prefixes)
+	parse_time = _timestamp_parser_class()
+
+	with open_log(log_path) as f: # seeking in compressed segments decompresses up to offset
+		for start, end in ranges:
+			f.seek(start)
+			while f.tell() < end:
+				line = f.readline()
+				if len(line) == 0:
+					break
+				line = line.decode('utf-8', errors = 'replace')
+
+				if since is not None or until is not None:
+					match = LINE_TIME_RE.match(line)
+					if match is None:
+						continue
+					line_time = parse_time(match.group(1))
+					if since is not None and line_time < since:
+						continue
+					if until is not None and line_time > until:
+						continue
+
+				if len(paths) > 0 or len(prefixes) > 0:
+					if not _line_refers(line.rstrip('\n'), paths, prefixes, text_re):
+						continue
+
+				yield line
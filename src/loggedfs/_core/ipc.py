@@ -29,13 +29,27 @@ specific language governing rights and limitations under the License.
 # IMPORT
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+import collections
+from functools import partial
+import io
+import mmap
+import os
 import pickle
 import queue
+import select
 import struct
 import subprocess
-import sys
+import tempfile
 import threading
 import time
+import traceback
+
+from .defaults import (
+	IPC_CODEC_DEFAULT,
+	IPC_QUEUE_MAX_BYTES_DEFAULT,
+	IPC_QUEUE_MAX_ITEMS_DEFAULT,
+	IPC_QUEUE_POLICY_DEFAULT
+	)
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -46,6 +60,41 @@ PREFIX = b'\xBA\xDE\xAF\xFE'
 LEN_DTYPE = 'Q' # uint64
 WAIT_TIMEOUT = 0.1 # seconds
 
+RING_DIR = '/dev/shm' # falls back to default temporary directory if not present
+RING_POS_DTYPE = 'Q' # uint64, total number of bytes written or read
+RING_WRITE_OFFSET = 0 # separate cache lines for positions and flag
+RING_READ_OFFSET = 64
+RING_WAITING_OFFSET = 128 # consumer is (about to go) asleep, wants doorbell
+RING_HEADER_LEN = 192
+RING_FULL_TIMEOUT = 0.001 # seconds, producer waits for consumer
+RING_SPIN_TIMEOUT = 0.0002 # seconds, consumer polls before it asks for doorbell
+RING_READ_CHUNK = 2**20 # bytes, buffer size of consumer
+RING_MACHINES = ('x86_64', 'amd64', 'i386', 'i486', 'i586', 'i686') # total store order, see _ring_class
+DOORBELL = b'\x00'
+
+QUEUE_ITEM_OVERHEAD = 512 # bytes, estimated size of an event dict without its strings
+
+SCHEMA_INTERN_KEYS = frozenset((
+	'action',
+	'proc_cmd',
+	'proc_gid_name',
+	'proc_uid_name',
+	'return_errorcode',
+	'return_exception',
+	)) # plus all keys ending with "path"
+PICKLE_PORTABLE_MODULES = frozenset(( # importable by any LoggedFS-python process, see portable_dumps
+	'builtins',
+	'collections',
+	'copyreg',
+	'functools',
+	'loggedfs',
+	'operator',
+	'_operator',
+	're',
+	))
+
+SCHEMA_INTERN_MAX = 2**16 # strings, afterwards new strings are sent literally
+
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS: END OF TRANSMISSION
@@ -69,6 +118,157 @@ class end_of_transmission:
 		return '<end of transmission on stream "{ID}">'.format(ID = self._id)
 
 
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: MOUNT READY
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class mount_ready:
+	"""Sent by a filesystem in library mode from init, i.e. once it is mounted.
+	"""
+
+
+	def __init__(self, directory, time_ns, lib_filter = False):
+
+		self._directory = directory
+		self._time_ns = time_ns
+		self._lib_filter = lib_filter
+
+
+	@property
+	def directory(self):
+		return self._directory
+
+
+	@property
+	def time_ns(self):
+		return self._time_ns
+
+
+	@property
+	def lib_filter(self):
+		"""True if the filesystem applies the filter pipeline handed over by the consumer.
+		"""
+		return self._lib_filter
+
+
+	def __repr__(self):
+
+		return '<mount ready at "{DIRECTORY}">'.format(DIRECTORY = self._directory)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: BOUNDED QUEUE
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _bounded_queue_class:
+	"""FIFO between a decoder (or filesystem) thread and the receiving thread,
+	limited by number of items and / or their size in bytes (0 means unlimited).
+	If full, put either blocks (backpressure), drops the oldest or drops the newest item.
+	A single item larger than max_bytes is admitted into an empty queue.
+	"""
+
+
+	def __init__(self,
+		max_items = IPC_QUEUE_MAX_ITEMS_DEFAULT,
+		max_bytes = IPC_QUEUE_MAX_BYTES_DEFAULT,
+		policy = IPC_QUEUE_POLICY_DEFAULT
+		):
+
+		self._max_items = max_items
+		self._max_bytes = max_bytes
+		self._policy = policy
+		self._items = collections.deque() # (data, size)
+		self._bytes = 0
+		self._lock = threading.Lock()
+		self._not_full = threading.Condition(self._lock)
+		self._stats = {
+			'put': 0,
+			'dropped_oldest': 0,
+			'dropped_newest': 0,
+			'blocked': 0,
+			'items_max': 0,
+			'bytes_max': 0,
+			}
+
+
+	@property
+	def stats(self):
+
+		with self._lock:
+			stats = self._stats.copy()
+			stats['items'] = len(self._items)
+			stats['bytes'] = self._bytes
+		return stats
+
+
+	def _full(self, size):
+
+		if len(self._items) == 0:
+			return False
+		if self._max_items > 0 and len(self._items) >= self._max_items:
+			return True
+		if self._max_bytes > 0 and self._bytes + size > self._max_bytes:
+			return True
+		return False
+
+
+	def put(self, data, size = None, force = False):
+		"""Enqueues data. size is its length in bytes if known, e.g. frame length.
+		force bypasses all limits, e.g. for end of transmission markers.
+		"""
+
+		if size is None:
+			size = _estimate_size(data) if self._max_bytes > 0 else 0
+
+		with self._not_full:
+			if not force and self._full(size):
+				if self._policy == 'drop_newest':
+					self._stats['dropped_newest'] += 1
+					return
+				if self._policy == 'drop_oldest':
+					while self._full(size):
+						_, dropped_size = self._items.popleft()
+						self._bytes -= dropped_size
+						self._stats['dropped_oldest'] += 1
+				else: # block
+					self._stats['blocked'] += 1
+					while self._full(size):
+						self._not_full.wait()
+			self._items.append((data, size))
+			self._bytes += size
+			self._stats['put'] += 1
+			if len(self._items) > self._stats['items_max']:
+				self._stats['items_max'] = len(self._items)
+			if self._bytes > self._stats['bytes_max']:
+				self._stats['bytes_max'] = self._bytes
+
+
+	def get_nowait(self):
+
+		with self._not_full:
+			try:
+				data, size = self._items.popleft()
+			except IndexError:
+				raise queue.Empty
+			self._bytes -= size
+			self._not_full.notify()
+		return data
+
+
+	def empty(self):
+
+		return len(self._items) == 0
+
+
+def _estimate_size(data):
+
+	if type(data) is not dict:
+		return QUEUE_ITEM_OVERHEAD
+	return QUEUE_ITEM_OVERHEAD + sum(
+		len(value) for value in data.values() if isinstance(value, (str, bytes))
+		)
+
+
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS: RECEIVER (SINGLE STREAM)
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -76,23 +276,60 @@ class end_of_transmission:
 class _receiver_class:
 
 
-	def __init__(self, stream_id, in_stream, decoder_func, processing_func):
+	def __init__(self,
+		stream_id, in_stream, decoder_func, processing_func,
+		batch_size = None, queue_config = None, ready_func = None
+		):
 
 		self._id = stream_id
 		self._s = in_stream
 		self._f = processing_func
-		self._q = queue.Queue()
+		self._batch_size = batch_size # processing_func consumes lists of up to batch_size items if set
+		self._q = _bounded_queue_class(**(queue_config or {}))
+		self._ready_func = ready_func # called with mount_ready right away, bypassing the queue
+		if decoder_func is None:
+			return
 		self._t = threading.Thread(
 			target = decoder_func,
-			args = (self._id, self._s, self._q),
+			args = (self._id, self._s, self),
 			daemon = True
 			)
 		self._t.start()
-		self.join = self._t.join
+
+
+	def put(self, data, size = None, force = False):
+		"""Feeds the queue, from the decoder thread or from within this process if there is no decoder.
+		"""
+
+		if type(data) is mount_ready:
+			if self._ready_func is not None:
+				self._ready_func(data)
+			return
+		self._q.put(data, size, force)
+
+
+	@property
+	def stats(self):
+
+		return self._q.stats
+
+
+	def join(self, timeout):
+		"""Waits for the decoder thread to exit while flushing the queue,
+		so a decoder blocked on a full queue can not deadlock.
+		"""
+
+		while self._t.is_alive():
+			self._t.join(timeout)
+			self.flush()
 
 
 	def flush(self):
 
+		if self._batch_size is not None:
+			self._flush_batches()
+			return
+
 		while not self._q.empty():
 			try:
 				data = self._q.get_nowait()
@@ -100,25 +337,425 @@ class _receiver_class:
 				pass
 			else:
 				self._f(data)
-				self._q.task_done()
+
+
+	def _flush_batches(self):
+
+		batch = []
+		while True:
+			try:
+				batch.append(self._q.get_nowait())
+			except queue.Empty:
+				break
+			if len(batch) == self._batch_size:
+				self._f(batch)
+				batch = []
+		if len(batch) > 0:
+			self._f(batch)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: CODECS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _pickle_codec_class:
+	"""Every message is pickled as it is.
+	"""
+
+
+	def encode(self, data):
+
+		return pickle.dumps(data)
+
+
+	def decode(self, data_bin):
+
+		return pickle.loads(data_bin)
+
+
+class _schema_codec_class:
+	"""Events (dicts) are sent as a schema ID followed by their values in the order of the schema.
+	Schemas (tuples of keys) and recurring strings (paths, commands, names) are defined
+	on first use and referenced by integer IDs afterwards. Stateful, one instance per stream.
+	Anything other than a dict is pickled as it is.
+	"""
+
+
+	def __init__(self):
+
+		self._schemas = {} # encoder: keys -> (schema_id, positions), decoder: schema_id -> (keys, positions)
+		self._strings = {} # encoder: string -> string_id, decoder: string_id -> string
+
+
+	@staticmethod
+	def _intern_positions(keys):
+
+		return tuple(
+			index for index, key in enumerate(keys)
+			if key in SCHEMA_INTERN_KEYS or key.endswith('path')
+			)
+
+
+	def encode(self, data):
+
+		if type(data) is not dict:
+			return pickle.dumps((None, None, None, data))
+
+		keys = tuple(data.keys())
+		try:
+			schema_id, positions = self._schemas[keys]
+			new_keys = None
+		except KeyError:
+			schema_id, positions = self._schemas[keys] = (len(self._schemas), self._intern_positions(keys))
+			new_keys = keys
+
+		values = list(data.values())
+		new_strings = []
+		strings = self._strings
+		for index in positions:
+			value = values[index]
+			if type(value) is not str:
+				values[index] = (value,) # not interned
+				continue
+			try:
+				values[index] = strings[value]
+			except KeyError:
+				if len(strings) < SCHEMA_INTERN_MAX:
+					values[index] = strings[value] = len(strings)
+					new_strings.append(value)
+				# else: send literally
+
+		return pickle.dumps((schema_id, new_keys, new_strings, values))
+
+
+	def decode(self, data_bin):
+
+		schema_id, new_keys, new_strings, values = pickle.loads(data_bin)
+
+		if schema_id is None:
+			return values
+
+		if new_keys is not None:
+			self._schemas[schema_id] = (new_keys, self._intern_positions(new_keys))
+		strings = self._strings
+		for value in new_strings:
+			strings[len(strings)] = value
+
+		keys, positions = self._schemas[schema_id]
+		for index in positions:
+			value = values[index]
+			if type(value) is int:
+				values[index] = strings[value]
+			elif type(value) is tuple:
+				values[index] = value[0]
+
+		return dict(zip(keys, values))
+
+
+CODECS = {
+	'pickle': _pickle_codec_class,
+	'schema': _schema_codec_class,
+	}
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: SENDER (SINGLE STREAM)
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _sender_class:
+
+
+	def __init__(self, out_stream, codec = IPC_CODEC_DEFAULT):
+
+		self._s = out_stream
+		self._encode = CODECS[codec]().encode
+
+
+	def send(self, data):
+
+		data_bin = self._encode(data)
+		self._s.write(PREFIX + struct.pack(LEN_DTYPE, len(data_bin)) + data_bin)
+		self._s.flush()
+
+
+class _locked_sender_class(_sender_class):
+	"""Sender shared by filesystems served by several threads of one process.
+	"""
+
+
+	def __init__(self, out_stream, codec = IPC_CODEC_DEFAULT):
+
+		super().__init__(out_stream, codec)
+		self._lock = threading.Lock() # serializes frames and the codec's state
+
+
+	def send(self, data):
+
+		with self._lock:
+			super().send(data)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: SHARED MEMORY RING BUFFER (SINGLE PRODUCER, SINGLE CONSUMER)
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _ring_class:
+	"""Byte stream through a memory mapped file, shared by exactly one producer and one consumer.
+	Each side owns one position in the header and only reads the other one, so no locks are required.
+	A pipe serves as a doorbell: The producer writes to it only if the consumer is waiting.
+	Lost wakeups are possible due to memory reordering, but bounded by WAIT_TIMEOUT.
+	Positions are published by plain stores, Python offers no memory fences. This is only
+	correct if the CPU keeps stores in order (x86, see RING_MACHINES and ring_supported),
+	e.g. on ARM or POWER the consumer could see a position before the data it covers.
+	"""
+
+
+	def __init__(self, ring_path, doorbell_stream):
+
+		self._f = open(ring_path, 'r+b')
+		self._m = mmap.mmap(self._f.fileno(), 0)
+		self._len = len(self._m) - RING_HEADER_LEN
+		if self._len <= 0:
+			raise ValueError('ring file is too small')
+		self._doorbell = doorbell_stream
+
+
+	def _get(self, offset):
+
+		return struct.unpack_from(RING_POS_DTYPE, self._m, offset)[0]
+
+
+	def _set(self, offset, value):
+
+		struct.pack_into(RING_POS_DTYPE, self._m, offset, value)
+
+
+	def close(self):
+
+		if not self._m.closed:
+			self._m.close()
+			self._f.close()
+
+
+class _ring_writer_class(_ring_class):
+	"""Producer side of ring: Blocks (backpressure) if ring is full.
+	"""
+
+
+	def __init__(self, ring_path, doorbell_stream):
+
+		super().__init__(ring_path, doorbell_stream)
+		self._pos = self._get(RING_WRITE_OFFSET)
+
+
+	def write(self, data):
+
+		view = memoryview(data)
+
+		while len(view) > 0:
+
+			free = self._len - (self._pos - self._get(RING_READ_OFFSET))
+			if free == 0:
+				self._ring()
+				time.sleep(RING_FULL_TIMEOUT)
+				continue
+
+			chunk_len = min(free, len(view))
+			start = RING_HEADER_LEN + self._pos % self._len
+			first_len = min(chunk_len, RING_HEADER_LEN + self._len - start)
+			self._m[start:start + first_len] = view[:first_len]
+			if first_len < chunk_len: # wrap around
+				self._m[RING_HEADER_LEN:RING_HEADER_LEN + chunk_len - first_len] = view[first_len:chunk_len]
+
+			self._pos += chunk_len
+			self._set(RING_WRITE_OFFSET, self._pos) # publish
+			view = view[chunk_len:]
+
+		return len(data)
+
+
+	def flush(self):
+
+		if self._get(RING_WAITING_OFFSET):
+			self._ring()
+
+
+	def _ring(self):
+
+		self._doorbell.write(DOORBELL)
+		self._doorbell.flush()
+
+
+class _ring_reader_class(_ring_class, io.RawIOBase):
+	"""Consumer side of ring: Reads block until data or end of file is available.
+	End of file is reached once the doorbell pipe is closed and the ring is drained.
+	Meant to be wrapped into an io.BufferedReader (see open_ring_reader), so small
+	reads (prefix, length, payload) are served without touching the shared header.
+	"""
+
+
+	def __init__(self, ring_path, doorbell_stream):
+
+		_ring_class.__init__(self, ring_path, doorbell_stream)
+		self._pos = self._get(RING_READ_OFFSET)
+		self._eof = False
+
+
+	def readable(self):
+
+		return True
+
+
+	def readinto(self, buffer):
+
+		while True:
+			available = self._get(RING_WRITE_OFFSET) - self._pos
+			if available > 0:
+				break
+			if self._eof:
+				return 0
+			self._wait()
+
+		chunk_len = min(available, len(buffer))
+		start = RING_HEADER_LEN + self._pos % self._len
+		first_len = min(chunk_len, RING_HEADER_LEN + self._len - start)
+		buffer[:first_len] = self._m[start:start + first_len]
+		if first_len < chunk_len: # wrap around
+			buffer[first_len:chunk_len] = self._m[RING_HEADER_LEN:RING_HEADER_LEN + chunk_len - first_len]
+
+		self._pos += chunk_len
+		self._set(RING_READ_OFFSET, self._pos) # release space
+
+		return chunk_len
+
+
+	def _wait(self):
+
+		spin_until = time.perf_counter() + RING_SPIN_TIMEOUT
+		while time.perf_counter() < spin_until: # avoid doorbell syscalls if producer is busy
+			if self._get(RING_WRITE_OFFSET) != self._pos:
+				return
+			time.sleep(0)
+
+		self._set(RING_WAITING_OFFSET, 1)
+		try:
+			if self._get(RING_WRITE_OFFSET) != self._pos: # data arrived in the meantime
+				return
+			fd = self._doorbell.fileno()
+			ready, _, _ = select.select([fd], [], [], WAIT_TIMEOUT)
+			if len(ready) > 0 and len(os.read(fd, 4096)) == 0:
+				self._eof = True
+		finally:
+			self._set(RING_WAITING_OFFSET, 0)
+
+
+def open_ring_reader(ring_path, doorbell_stream):
+
+	return io.BufferedReader(_ring_reader_class(ring_path, doorbell_stream), buffer_size = RING_READ_CHUNK)
+
+
+def ring_supported():
+	"""True if this CPU architecture orders stores as _ring_class requires.
+	"""
+
+	return os.uname().machine.lower() in RING_MACHINES
+
+
+def create_ring(ring_size):
+	"""Creates a ring buffer file and returns its path. The caller is responsible for removing it.
+	"""
+
+	fd, ring_path = tempfile.mkstemp(
+		prefix = 'loggedfs-', suffix = '.ring',
+		dir = RING_DIR if os.path.isdir(RING_DIR) else None
+		)
+	try:
+		os.ftruncate(fd, RING_HEADER_LEN + ring_size)
+	finally:
+		os.close(fd)
+
+	return ring_path
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: LINE STREAM (IN-PROCESS STDERR REPLACEMENT)
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _line_stream_class:
+	"""Minimal file-like object handing every write to a function.
+	Replaces stderr for log handlers of filesystems running within this process.
+	"""
+
+
+	def __init__(self, write_func):
+
+		self.write = write_func
+
+
+	def flush(self):
+
+		pass
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES: PORTABLE PICKLES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def portable_dumps(obj):
+	"""Pickles obj for another LoggedFS-python process or returns None if it can not.
+	Functions and classes are pickled by reference, so the pickle must only refer to
+	globals of PICKLE_PORTABLE_MODULES (and their submodules). A function defined in
+	e.g. __main__ can be pickled, but not unpickled by the LoggedFS-python process.
+	"""
+
+	import pickletools # deferred, only needed for pushing filter pipelines
+
+	try:
+		data = pickle.dumps(obj)
+	except Exception: # e.g. lambdas
+		return None
+
+	memo = {}
+	recent = (None, None) # last two values pushed, STACK_GLOBAL consumes them
+	for opcode, arg, _ in pickletools.genops(data):
+		if opcode.name in ('GLOBAL', 'INST'): # arg: "module name"
+			module = arg.split(' ')[0]
+		elif opcode.name == 'STACK_GLOBAL':
+			module = recent[0]
+		else:
+			if opcode.name == 'MEMOIZE':
+				memo[len(memo)] = recent[1]
+			elif opcode.name in ('PUT', 'BINPUT', 'LONG_BINPUT'):
+				memo[arg] = recent[1]
+			elif opcode.name in ('GET', 'BINGET', 'LONG_BINGET'):
+				recent = (recent[1], memo.get(arg, None))
+			elif 'UNICODE' in opcode.name:
+				recent = (recent[1], arg)
+			elif opcode.name not in ('FRAME', 'PROTO', 'STOP'):
+				recent = (recent[1], None)
+			continue
+		if not isinstance(module, str) or module.split('.')[0] not in PICKLE_PORTABLE_MODULES:
+			return None
+
+	return data
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES: DECODER FUNCTIONS FOR RECEIVER
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-def _out_decoder(_id, _s, _q):
+def _out_decoder(_id, _s, _q, decode_func = pickle.loads):
 
 	prefix_len = len(PREFIX)
 	while True:
 		prefix = _s.read(prefix_len)
 		if len(prefix) == 0: # end of pipe
-			_q.put(end_of_transmission(_id))
+			_q.put(end_of_transmission(_id), 0, True)
 			break
 		data_len_encoded = _s.read(8)
 		data_len = struct.unpack(LEN_DTYPE, data_len_encoded)[0]
 		data_bin = _s.read(data_len)
-		_q.put(pickle.loads(data_bin))
+		_q.put(decode_func(data_bin), data_len)
 
 
 def _err_decoder(_id, _s, _q):
@@ -126,38 +763,97 @@ def _err_decoder(_id, _s, _q):
 	while True:
 		msg = _s.readline()
 		if len(msg) == 0:
-			_q.put(end_of_transmission(_id))
+			_q.put(end_of_transmission(_id), 0, True)
 			break
-		_q.put(msg.decode('utf-8'))
+		_q.put(msg.decode('utf-8'), len(msg))
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES: SEND AND RECEIVE
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-def receive(cmd_list, out_func, err_func, post_exit_func):
-
-		proc = subprocess.Popen(cmd_list, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+def receive(
+	cmd_list, out_func, err_func, post_exit_func,
+	in_data = None, ring_path = None, codec = IPC_CODEC_DEFAULT,
+	batch_size = None, wait_timeout = WAIT_TIMEOUT, queue_config = None, register_func = None,
+	ready_func = None
+	):
+
+		proc = subprocess.Popen(
+			cmd_list,
+			stdin = subprocess.PIPE if in_data is not None else None,
+			stdout = subprocess.PIPE,
+			stderr = subprocess.PIPE
+			)
+		if in_data is not None:
+			proc.stdin.write(in_data)
+			proc.stdin.close()
 		proc_alive = True
-		out_r = _receiver_class('out', proc.stdout, _out_decoder, out_func)
+		if ring_path is not None: # stdout only serves as doorbell
+			out_s = open_ring_reader(ring_path, proc.stdout)
+		else:
+			out_s = proc.stdout
+		out_r = _receiver_class(
+			'out', out_s, partial(_out_decoder, decode_func = CODECS[codec]().decode), out_func,
+			batch_size, queue_config, ready_func
+			)
 		err_r = _receiver_class('err', proc.stderr, _err_decoder, err_func)
+		if register_func is not None:
+			register_func(out_r)
 
 		while proc_alive:
-			time.sleep(WAIT_TIMEOUT)
+			time.sleep(wait_timeout)
 			out_r.flush()
 			err_r.flush()
 			proc_alive = proc.poll() is None
 
-		out_r.join()
-		err_r.join()
+		out_r.join(wait_timeout)
+		err_r.join(wait_timeout)
+		out_r.flush()
+		err_r.flush()
+		if ring_path is not None:
+			out_s.close()
+			os.remove(ring_path)
 		post_exit_func()
 
 
-def send(data):
-
-	data_bin = pickle.dumps(data)
-	data_len = struct.pack(LEN_DTYPE, len(data_bin))
-	sys.stdout.buffer.write(PREFIX)
-	sys.stdout.buffer.write(data_len)
-	sys.stdout.buffer.write(data_bin)
-	sys.stdout.flush()
+def receive_inprocess(
+	fs_func, out_func, err_func, post_exit_func,
+	batch_size = None, wait_timeout = WAIT_TIMEOUT, queue_config = None, register_func = None,
+	ready_func = None
+	):
+	"""Runs a filesystem in a thread of this process instead of a separate process.
+	fs_func is called with two callables, consuming events and log output respectively.
+	Events are handed over through in-memory queues without being serialized.
+	"""
+
+	out_r = _receiver_class('out', None, None, out_func, batch_size, queue_config, ready_func)
+	err_r = _receiver_class('err', None, None, err_func)
+	if register_func is not None:
+		register_func(out_r)
+
+	fs_t = threading.Thread(
+		target = _fs_runner,
+		args = (fs_func, out_r.put, err_r.put),
+		daemon = True
+		)
+	fs_t.start()
+
+	while fs_t.is_alive():
+		fs_t.join(wait_timeout)
+		out_r.flush()
+		err_r.flush()
+
+	out_r.put(end_of_transmission('out'), 0, True)
+	err_r.put(end_of_transmission('err'), 0, True)
+	out_r.flush()
+	err_r.flush()
+	post_exit_func()
+
+
+def _fs_runner(fs_func, out_func, err_func):
+
+	try:
+		fs_func(out_func, err_func)
+	except Exception:
+		err_func(traceback.format_exc())
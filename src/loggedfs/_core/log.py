@@ -31,10 +31,11 @@ specific language governing rights and limitations under the License.
 
 import json
 import logging
-import logging.handlers
-import os
 import platform
 
+from .index import _indexed_file_handler_class
+from .sink import _sink_handler_class, rotating_file_sink_class
+from .syslog import _syslog_handler_class, syslog_sink_class
 from .timing import time
 
 
@@ -64,48 +65,93 @@ class _Formatter_ns_(logging.Formatter):
 
 	default_nsec_format = '%s,%09d'
 
+	def __init__(self, *args, time_ns = False, **kwargs):
+
+		super().__init__(*args, **kwargs)
+		self._time_ns = time_ns # raw nanoseconds since the epoch for machine consumers
+		self._timestamp = _timestamp_cache_class(self.converter)
+
 	def formatTime(self, record, datefmt=None):
 
 		if datefmt is not None: # Do not handle custom formats here ...
 			return super().formatTime(record, datefmt) # ... leave to original implementation
-		ct = self.converter(record.created_ns / 1e9)
-		t = time.strftime(self.default_time_format, ct)
-		s = self.default_nsec_format % (t, record.created_ns - (record.created_ns // 10**9) * 10**9)
-		return s
+		if self._time_ns:
+			return '%d' % record.created_ns
+		return self._timestamp(record.created_ns)
 
 
 logging.setLogRecordFactory(_LogRecord_ns_)
 
 
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: TIMESTAMP CACHE
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _timestamp_cache_class:
+	"""Formats nanosecond timestamps like _Formatter_ns_ ("2020-07-11 13:45:01,123456789", local time).
+	The part up to the seconds is formatted once per second and reused.
+	"""
+
+
+	def __init__(self, converter = time.localtime):
+
+		self._converter = converter
+		self._cache = (None, None) # second, prefix - replaced at once, formatters are shared by handlers
+
+
+	def __call__(self, time_ns):
+
+		second = time_ns // 10**9
+		cached_second, prefix = self._cache
+		if second != cached_second:
+			prefix = time.strftime(logging.Formatter.default_time_format, self._converter(second)) + ','
+			self._cache = (second, prefix)
+		return prefix + '%09d' % (time_ns - second * 10**9)
+
+
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 
-def get_logger(name, log_enabled, log_file, log_syslog, log_json):
+def get_logger(
+	name, log_enabled, log_file, log_syslog, log_json,
+	log_stream = None, log_index = False, log_sink = None, log_time_ns = False, log_handlers = None
+	):
 
-	if log_json:
+	if log_json and log_time_ns: # number, not string
+		log_formater = _Formatter_ns_('{"time": %(asctime)s, "logger": "%(name)s", %(message)s}', time_ns = True)
+		log_formater_short = _Formatter_ns_('{%(message)s}')
+	elif log_json:
 		log_formater = _Formatter_ns_('{"time": "%(asctime)s", "logger": "%(name)s", %(message)s}')
 		log_formater_short = _Formatter_ns_('{%(message)s}')
 	else:
-		log_formater = _Formatter_ns_('%(asctime)s (%(name)s) %(message)s')
+		log_formater = _Formatter_ns_('%(asctime)s (%(name)s) %(message)s', time_ns = log_time_ns)
 		log_formater_short = _Formatter_ns_('%(message)s')
 
-	logger = logging.getLogger(name)
+	if log_stream is None:
+		logger = logging.getLogger(name)
+	else: # Running within a library consumer's process: Do not share the logger with other instances
+		logger = logging.Logger(name)
 
 	if not bool(log_enabled):
 		logger.setLevel(logging.CRITICAL)
 		return logger
 	logger.setLevel(logging.DEBUG)
 
-	ch = logging.StreamHandler()
+	if log_handlers is not None: # shared with other mounts of this process
+		for handler in log_handlers:
+			logger.addHandler(handler)
+		return logger
+
+	ch = logging.StreamHandler(log_stream) # stderr if None
 	ch.setLevel(logging.DEBUG)
 	ch.setFormatter(log_formater)
 	logger.addHandler(ch)
 
 	if bool(log_syslog):
 		try:
-			sl = logging.handlers.SysLogHandler(address = SYSLOG_ADDRESS[platform.system()])
+			sl = _syslog_handler_class(syslog_sink_class(SYSLOG_ADDRESS[platform.system()]))
 		except KeyError:
 			raise NotImplementedError('unsupported operating system')
 		sl.setLevel(logging.DEBUG)
@@ -115,7 +161,12 @@ def get_logger(name, log_enabled, log_file, log_syslog, log_json):
 	if log_file is None:
 		return logger
 
-	fh = logging.FileHandler(os.path.join(log_file)) # TODO
+	if log_sink is not None: # rotating, compressing, keyword arguments for sink
+		fh = _sink_handler_class(rotating_file_sink_class(log_file, **log_sink), log_index = log_index)
+	elif log_index: # sidecar index for queries
+		fh = _indexed_file_handler_class(log_file)
+	else:
+		fh = logging.FileHandler(log_file)
 	fh.setLevel(logging.DEBUG)
 	fh.setFormatter(log_formater)
 	logger.addHandler(fh)
@@ -38,11 +38,31 @@ import threading
 
 from .defaults import (
 	FUSE_ALLOWOTHER_DEFAULT,
+	IPC_BATCH_LATENCY_DEFAULT,
+	IPC_BATCH_SIZE_DEFAULT,
+	IPC_CODEC_DEFAULT,
+	IPC_CODECS,
+	IPC_QUEUE_MAX_BYTES_DEFAULT,
+	IPC_QUEUE_MAX_ITEMS_DEFAULT,
+	IPC_QUEUE_POLICIES,
+	IPC_QUEUE_POLICY_DEFAULT,
+	IPC_RING_SIZE_DEFAULT,
+	IPC_TRANSPORT_DEFAULT,
+	IPC_TRANSPORTS,
 	LOG_BUFFERS_DEFAULT,
 	LOG_ONLYMODIFYOPERATIONS_DEFAULT
 	)
 from .filter import filter_pipeline_class
-from .ipc import receive, end_of_transmission
+from .ipc import (
+	create_ring,
+	end_of_transmission,
+	portable_dumps,
+	receive,
+	receive_inprocess,
+	ring_supported,
+	_line_stream_class
+	)
+from .timing import time
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -84,7 +104,17 @@ class notify_class:
 		log_buffers = LOG_BUFFERS_DEFAULT,
 		log_only_modify_operations = LOG_ONLYMODIFYOPERATIONS_DEFAULT,
 		fuse_allowother = FUSE_ALLOWOTHER_DEFAULT,
-		background = False # thread in background
+		background = False, # thread in background
+		in_process = False, # filesystem in thread instead of separate process
+		transport = IPC_TRANSPORT_DEFAULT, # pipe or shared memory ring buffer
+		ring_size = IPC_RING_SIZE_DEFAULT,
+		codec = IPC_CODEC_DEFAULT, # event serialization
+		consumer_batch_func = None, # consumes lists of signals
+		batch_size = IPC_BATCH_SIZE_DEFAULT,
+		batch_latency = IPC_BATCH_LATENCY_DEFAULT,
+		queue_max_items = IPC_QUEUE_MAX_ITEMS_DEFAULT, # events received but not yet consumed
+		queue_max_bytes = IPC_QUEUE_MAX_BYTES_DEFAULT,
+		queue_policy = IPC_QUEUE_POLICY_DEFAULT # what happens if the queue is full
 		):
 		"""Creates a filesystem notifier object.
 
@@ -92,10 +122,30 @@ class notify_class:
 		- consumer_out_func: None or callable, consumes events provided as a dictionary
 		- consumer_err_func: None or callable, consumes output from stderr
 		- post_exit_func: None or callable, called when notifier was terminated
-		- log_filter: None or instance of filter_pipeline_class
+		- log_filter: None or instance of filter_pipeline_class, applied within the
+		  LoggedFS-python process (before events are sent) if the pipeline can be pickled
+		  and unpickled there (see PICKLE_PORTABLE_MODULES), otherwise in this process
 		- log_buffers: Boolean, activates logging of read and write buffers
 		- fuse_allowother: Boolean, allows other users to see the LoggedFS filesystem
 		- background: Boolean, starts notifier in a thread
+		- in_process: Boolean, runs the filesystem in a thread of this process and hands
+		  events over in memory instead of starting a separate LoggedFS-python process.
+		  Faster, but the filesystem shares interpreter, GIL and signal handlers with the caller.
+		- transport: "pipe" or "ring", how events travel from a separate LoggedFS-python process:
+		  through its stdout or through a shared memory ring buffer (stdout then only wakes up the receiver).
+		  The ring buffer requires x86 (see ring_supported), elsewhere "pipe" is used instead.
+		- ring_size: Integer, size of shared memory ring buffer in bytes
+		- codec: "pickle" or "schema", serialization of events sent by a separate LoggedFS-python process:
+		  entire dicts or values only, with keys and recurring strings replaced by IDs
+		- consumer_batch_func: None or callable, consumes lists of events (alternative to consumer_out_func).
+		  The last list ends with the "end of transmission" marker.
+		- batch_size: Integer, maximum number of events per list
+		- batch_latency: Float, seconds, maximum delay before received events are delivered
+		- queue_max_items: Integer, maximum number of events received but not yet consumed, 0 for unlimited
+		- queue_max_bytes: Integer, maximum size of events received but not yet consumed, 0 for unlimited.
+		  Sizes are frame lengths or, in process, estimates dominated by (buffer) strings.
+		- queue_policy: "block", "drop_oldest" or "drop_newest", if the queue is full.
+		  "block" stops receiving, which eventually blocks the filesystem. Counters: queue_stats
 		"""
 
 		if log_filter is None:
@@ -118,6 +168,31 @@ class notify_class:
 		if hasattr(consumer_err_func, '__call__'):
 			if len(inspect.signature(consumer_err_func).parameters.keys()) != 1:
 				raise ValueError('consumer_err_func must have one parameter')
+		if consumer_batch_func is not None and not hasattr(consumer_batch_func, '__call__'):
+			raise TypeError('consumer_batch_func must either be None or callable')
+		if hasattr(consumer_batch_func, '__call__'):
+			if len(inspect.signature(consumer_batch_func).parameters.keys()) != 1:
+				raise ValueError('consumer_batch_func must have one parameter')
+			if consumer_out_func is not None:
+				raise ValueError('consumer_out_func and consumer_batch_func are mutually exclusive')
+		if not isinstance(batch_size, int):
+			raise TypeError('batch_size must be of type int')
+		if batch_size <= 0:
+			raise ValueError('batch_size must be positive')
+		if not isinstance(batch_latency, (int, float)):
+			raise TypeError('batch_latency must be of type float')
+		if batch_latency <= 0:
+			raise ValueError('batch_latency must be positive')
+		if not isinstance(queue_max_items, int):
+			raise TypeError('queue_max_items must be of type int')
+		if queue_max_items < 0:
+			raise ValueError('queue_max_items must not be negative')
+		if not isinstance(queue_max_bytes, int):
+			raise TypeError('queue_max_bytes must be of type int')
+		if queue_max_bytes < 0:
+			raise ValueError('queue_max_bytes must not be negative')
+		if queue_policy not in IPC_QUEUE_POLICIES:
+			raise ValueError('queue_policy must be one of %s' % ', '.join(IPC_QUEUE_POLICIES))
 		if post_exit_func is not None and not hasattr(post_exit_func, '__call__'):
 			raise TypeError('post_exit_func must either be None or callable')
 		if not isinstance(log_filter, filter_pipeline_class):
@@ -130,19 +205,65 @@ class notify_class:
 			raise TypeError('fuse_allowother must be of type bool')
 		if not isinstance(background, bool):
 			raise TypeError('background must be of type bool')
+		if not isinstance(in_process, bool):
+			raise TypeError('in_process must be of type bool')
+		if transport not in IPC_TRANSPORTS:
+			raise ValueError('transport must be one of %s' % ', '.join(IPC_TRANSPORTS))
+		if codec not in IPC_CODECS:
+			raise ValueError('codec must be one of %s' % ', '.join(IPC_CODECS))
+		if not isinstance(ring_size, int):
+			raise TypeError('ring_size must be of type int')
+		if ring_size <= 0:
+			raise ValueError('ring_size must be positive')
 
 		self._directory = os.path.abspath(directory)
 		self._post_exit_func = post_exit_func
 		self._consumer_out_func = consumer_out_func
 		self._consumer_err_func = consumer_err_func
+		self._consumer_batch_func = consumer_batch_func
+		self._batch_size = batch_size
+		self._batch_latency = batch_latency
+		self._queue_config = {
+			'max_items': queue_max_items,
+			'max_bytes': queue_max_bytes,
+			'policy': queue_policy,
+			}
+		self._out_receiver = None
 		self._log_filter = log_filter
 		self._log_buffers = log_buffers
 		self._log_only_modify_operations = log_only_modify_operations
 		self._fuse_allowother = fuse_allowother
 		self._background = background
-
+		self._in_process = in_process
+		self._transport = transport if transport != 'ring' or ring_supported() else 'pipe'
+		self._ring_size = ring_size
+		self._codec = codec
+
+		self._ready = threading.Event() # set on mount_ready or exit, whatever comes first
+		self._ready_signal = None
+		self._ready_latency = None
+		self._start_time = time.monotonic()
 		self._up = True
 
+		if self._consumer_batch_func is not None:
+			out_args = (self._handle_stdout_batch, self._handle_stderr, self._handle_exit)
+			batch_args = (self._batch_size, self._batch_latency)
+		else:
+			out_args = (self._handle_stdout, self._handle_stderr, self._handle_exit)
+			batch_args = (None, self._batch_latency)
+		batch_args += (self._queue_config, self._register_receiver, self._handle_ready)
+
+		if self._in_process:
+			self._log_filter_pushed = True
+			args = (self._mount_inprocess,) + out_args + batch_args
+			self._start(receive_inprocess, args)
+			return
+
+		# Filter in LoggedFS-python process if possible, i.e. before events are sent.
+		# Until mount_ready confirms it, events are filtered here.
+		filter_data = portable_dumps(self._log_filter)
+		self._log_filter_pushed = False
+
 		command = ['loggedfs',
 			'-f', # foreground
 			'-s', # no syslog
@@ -154,16 +275,88 @@ class notify_class:
 			command.append('-m')
 		if self._fuse_allowother:
 			command.append('-p')
+		if filter_data is not None:
+			command.append('--lib-filter')
+		command.extend(['--lib-codec', self._codec])
+		if self._transport == 'ring':
+			ring_path = create_ring(self._ring_size)
+			command.extend(['--lib-ring', ring_path])
+		else:
+			ring_path = None
 		command.append(self._directory)
 
-		args = (command, self._handle_stdout, self._handle_stderr, self._handle_exit)
+		self._command = command
+		self._filter_data = filter_data
+		args = (command,) + out_args + (filter_data, ring_path, self._codec) + batch_args
+		self._start(receive, args)
+
+
+	def _start(self, receive_func, args):
 
 		atexit.register(self.terminate)
 		if self._background:
-			self._t = threading.Thread(target = receive, args = args, daemon = False)
+			self._t = threading.Thread(target = receive_func, args = args, daemon = False)
 			self._t.start()
 		else:
-			receive(*args)
+			receive_func(*args)
+
+
+	def _register_receiver(self, out_receiver):
+
+		self._out_receiver = out_receiver
+
+
+	@property
+	def queue_stats(self):
+		"""Counters of the queue of received events, None before receiving started.
+		"""
+
+		if self._out_receiver is None:
+			return None
+		return self._out_receiver.stats
+
+
+	@property
+	def ready(self):
+		"""True once the filesystem is mounted.
+		"""
+
+		return self._ready_signal is not None
+
+
+	@property
+	def startup_latency(self):
+		"""Seconds from starting the notifier to the filesystem being mounted, None before.
+		"""
+
+		return self._ready_latency
+
+
+	def wait_ready(self, timeout = None):
+		"""Blocks until the filesystem is mounted, it exited or timeout (seconds) expired.
+		Returns True if it is mounted. Requires background mode.
+		"""
+
+		self._ready.wait(timeout)
+		return self.ready
+
+
+	def _mount_inprocess(self, out_func, err_func):
+
+		from .fs import loggedfs_factory # deferred, refuse is only needed in process
+
+		loggedfs_factory(
+			self._directory,
+			fuse_foreground = True,
+			fuse_allowother = self._fuse_allowother,
+			lib_mode = True,
+			log_buffers = self._log_buffers,
+			log_filter = self._log_filter,
+			log_only_modify_operations = self._log_only_modify_operations,
+			log_syslog = False,
+			_lib_out_func = out_func,
+			_log_stream = _line_stream_class(err_func)
+			)
 
 
 	def _handle_stderr(self, msg):
@@ -177,7 +370,7 @@ class notify_class:
 
 	def _handle_stdout(self, msg):
 
-		if not isinstance(msg, end_of_transmission):
+		if not isinstance(msg, end_of_transmission) and not self._log_filter_pushed:
 			if not self._log_filter.match(msg):
 				return
 
@@ -188,8 +381,31 @@ class notify_class:
 			sys.stdout.flush()
 
 
+	def _handle_stdout_batch(self, msg_list):
+
+		if not self._log_filter_pushed:
+			msg_list = [
+				msg for msg in msg_list
+				if isinstance(msg, end_of_transmission) or self._log_filter.match(msg)
+				]
+			if len(msg_list) == 0:
+				return
+
+		self._consumer_batch_func(msg_list)
+
+
+	def _handle_ready(self, signal):
+
+		if signal.lib_filter:
+			self._log_filter_pushed = True
+		self._ready_latency = time.monotonic() - self._start_time
+		self._ready_signal = signal
+		self._ready.set()
+
+
 	def _handle_exit(self):
 
+		self._ready.set() # wakes up wait_ready if mounting failed
 		if self._post_exit_func is not None:
 			self._post_exit_func()
 
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/notify_async.py: Notification backend - LoggedFS as a library for asyncio
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import asyncio
+from collections import deque
+import struct
+
+from .defaults import (
+	FUSE_ALLOWOTHER_DEFAULT,
+	IPC_CODEC_DEFAULT,
+	IPC_STREAM_LIMIT_DEFAULT,
+	LOG_BUFFERS_DEFAULT,
+	LOG_ONLYMODIFYOPERATIONS_DEFAULT
+	)
+from .ipc import (
+	CODECS,
+	LEN_DTYPE,
+	PREFIX,
+	mount_ready
+	)
+from .timing import time
+from .notify import notify_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+HEADER_LEN = len(PREFIX) + struct.calcsize(LEN_DTYPE)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: NOTIFY ASYNC
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class notify_async_class(notify_class):
+	"""Wrapper for using LoggedFS-python as a library within asyncio.
+	Iterate over filesystem events asynchronously, no threads involved:
+
+		async with loggedfs_notify_async('demo_dir') as demo:
+			async for event in demo:
+				print(event)
+
+	Frames are decoded from the LoggedFS-python process' stdout only when the consumer
+	asks for the next event. If the consumer is slow, the stream's buffer fills up,
+	reading from the pipe pauses and the filesystem eventually blocks.
+	"await demo.wait_ready()" waits for the filesystem to be mounted.
+	"""
+
+
+	def __init__(self,
+		directory,
+		consumer_err_func = None, # consumes anything on stderr
+		post_exit_func = None, # called on exit
+		log_filter = None,
+		log_buffers = LOG_BUFFERS_DEFAULT,
+		log_only_modify_operations = LOG_ONLYMODIFYOPERATIONS_DEFAULT,
+		fuse_allowother = FUSE_ALLOWOTHER_DEFAULT,
+		codec = IPC_CODEC_DEFAULT, # event serialization
+		stream_limit = IPC_STREAM_LIMIT_DEFAULT # buffer size before reading pauses
+		):
+		"""Creates an asynchronous filesystem notifier object.
+		The LoggedFS-python process is started on entering the context or on the first iteration.
+
+		- directory: Relative or absolute path as a string
+		- consumer_err_func: None or callable, consumes output from stderr
+		- post_exit_func: None or callable, called when notifier was terminated
+		- log_filter: None or instance of filter_pipeline_class, applied within the
+		  LoggedFS-python process (before events are sent) if the pipeline can be pickled
+		- log_buffers: Boolean, activates logging of read and write buffers
+		- fuse_allowother: Boolean, allows other users to see the LoggedFS filesystem
+		- codec: "pickle" or "schema", serialization of events
+		- stream_limit: Integer, bytes buffered from stdout before reading from the pipe pauses
+		"""
+
+		if not isinstance(stream_limit, int):
+			raise TypeError('stream_limit must be of type int')
+		if stream_limit <= 0:
+			raise ValueError('stream_limit must be positive')
+
+		self._stream_limit = stream_limit
+		self._proc = None
+		self._err_task = None
+		self._frame_task = None # frame being received, survives timeouts
+		self._pending = deque() # events received while waiting for the mount
+		self._exited = False
+
+		super().__init__(
+			directory,
+			consumer_err_func = consumer_err_func,
+			post_exit_func = post_exit_func,
+			log_filter = log_filter,
+			log_buffers = log_buffers,
+			log_only_modify_operations = log_only_modify_operations,
+			fuse_allowother = fuse_allowother,
+			codec = codec
+			)
+
+
+	def _start(self, receive_func, args):
+
+		# Nothing to start yet, the process is started by the event loop from
+		# self._command and self._filter_data, see notify_class.__init__
+		self._decode = CODECS[self._codec]().decode
+
+
+	async def start(self):
+		"""Starts the LoggedFS-python process. Called implicitly by context and iteration.
+		"""
+
+		if self._proc is not None:
+			return
+
+		self._start_time = time.monotonic()
+		self._proc = await asyncio.create_subprocess_exec(
+			*self._command,
+			stdin = asyncio.subprocess.PIPE if self._filter_data is not None else None,
+			stdout = asyncio.subprocess.PIPE,
+			stderr = asyncio.subprocess.PIPE,
+			limit = self._stream_limit
+			)
+		if self._filter_data is not None:
+			self._proc.stdin.write(self._filter_data)
+			await self._proc.stdin.drain()
+			self._proc.stdin.close()
+		self._err_task = asyncio.ensure_future(self._receive_stderr())
+
+
+	async def _receive_stderr(self):
+
+		while True:
+			msg = await self._proc.stderr.readline()
+			if len(msg) == 0:
+				break
+			self._handle_stderr(msg.decode('utf-8'))
+
+
+	async def _receive_stdout(self):
+
+		stdout = self._proc.stdout
+		try:
+			header = await stdout.readexactly(HEADER_LEN)
+		except asyncio.IncompleteReadError as e:
+			if len(e.partial) == 0: # end of pipe
+				return None
+			raise
+		data_len = struct.unpack(LEN_DTYPE, header[len(PREFIX):])[0]
+		return self._decode(await stdout.readexactly(data_len))
+
+
+	async def _next_frame(self, timeout = None):
+
+		if self._frame_task is None:
+			self._frame_task = asyncio.ensure_future(self._receive_stdout())
+		await asyncio.wait((self._frame_task,), timeout = timeout) # does not cancel on timeout
+		if not self._frame_task.done():
+			raise asyncio.TimeoutError()
+		task, self._frame_task = self._frame_task, None
+		return task.result()
+
+
+	async def wait_ready(self, timeout = None):
+		"""Waits until the filesystem is mounted, it exited or timeout (seconds) expired.
+		Returns True if it is mounted. Events received meanwhile are kept for iteration.
+		"""
+
+		if self._proc is None:
+			await self.start()
+
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while self._ready_signal is None and not self._exited:
+			try:
+				msg = await self._next_frame(None if deadline is None else max(0, deadline - time.monotonic()))
+			except asyncio.TimeoutError:
+				break
+			if msg is None:
+				await self._finish()
+			elif type(msg) is mount_ready:
+				self._handle_ready(msg)
+			else:
+				self._pending.append(msg)
+		return self.ready
+
+
+	async def _finish(self):
+
+		if self._exited:
+			return
+		self._exited = True
+		await self._proc.wait()
+		await self._err_task
+		self._up = False
+		self._handle_exit()
+
+
+	def __aiter__(self):
+
+		return self
+
+
+	async def __anext__(self):
+
+		if self._proc is None:
+			await self.start()
+
+		while True:
+			msg = self._pending.popleft() if len(self._pending) > 0 else await self._next_frame()
+			if msg is None:
+				await self._finish()
+				raise StopAsyncIteration
+			if type(msg) is mount_ready:
+				self._handle_ready(msg)
+				continue
+			if not self._log_filter_pushed and not self._log_filter.match(msg):
+				continue
+			return msg
+
+
+	async def __aenter__(self):
+
+		await self.start()
+		return self
+
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+
+		await self.aterminate()
+
+
+	async def aterminate(self):
+		"""Unmounts the filesystem and waits for the LoggedFS-python process to exit.
+		Events which have not been consumed yet are discarded.
+		"""
+
+		if not self._up:
+			return
+
+		self._up = False
+
+		proc = await asyncio.create_subprocess_exec(
+			'fusermount', '-u', self._directory,
+			stdout = asyncio.subprocess.PIPE,
+			stderr = asyncio.subprocess.PIPE
+			)
+		await proc.communicate()
+
+		if self._proc is None:
+			return
+
+		self._pending.clear()
+		while await self._next_frame() is not None: # keep pipe flowing until the process exits
+			pass
+		await self._finish()
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/notify_pool.py: Many notifiers served by a few LoggedFS-python processes
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import atexit
+from functools import partial
+import inspect
+import itertools
+import os
+import subprocess
+import sys
+import threading
+
+from .defaults import (
+	FUSE_ALLOWOTHER_DEFAULT,
+	IPC_BATCH_LATENCY_DEFAULT,
+	IPC_CODEC_DEFAULT,
+	IPC_CODECS,
+	IPC_QUEUE_MAX_BYTES_DEFAULT,
+	IPC_QUEUE_MAX_ITEMS_DEFAULT,
+	IPC_QUEUE_POLICIES,
+	IPC_QUEUE_POLICY_DEFAULT,
+	LOG_BUFFERS_DEFAULT,
+	LOG_ONLYMODIFYOPERATIONS_DEFAULT,
+	POOL_PROCESSES_DEFAULT
+	)
+from .filter import filter_pipeline_class
+from .ipc import (
+	CODECS,
+	end_of_transmission,
+	portable_dumps,
+	_err_decoder,
+	_out_decoder,
+	_receiver_class,
+	_sender_class
+	)
+from .notify import c
+from .pool import MOUNT_ID_KEY, POOL_FILTER_KEY, POOL_MOUNT, POOL_UNMOUNT
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: MOUNT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _pool_mount_class:
+	"""State of one directory watched by notify_pool_class.
+	"""
+
+	__slots__ = (
+		'mount_id', 'directory', 'worker', 'consumer_out_func', 'log_filter', 'log_filter_pushed',
+		'start_time', 'ready', 'ready_signal', 'ready_latency', 'up',
+		)
+
+
+	def __init__(self, mount_id, directory, worker, consumer_out_func, log_filter):
+
+		self.mount_id = mount_id
+		self.directory = directory
+		self.worker = worker
+		self.consumer_out_func = consumer_out_func
+		self.log_filter = log_filter
+		self.log_filter_pushed = False # until mount_ready confirms it
+		self.start_time = time.monotonic()
+		self.ready = threading.Event() # set on mount_ready or end of mount, whatever comes first
+		self.ready_signal = None
+		self.ready_latency = None
+		self.up = True
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: WORKER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _pool_worker_class:
+	"""One LoggedFS-python process hosting mounts, see serve_pool, and its receivers.
+	"""
+
+
+	def __init__(self, codec, out_func, err_func, ready_func, queue_config):
+
+		self._proc = subprocess.Popen(
+			['loggedfs', 'lib-pool', '--lib-codec', codec],
+			stdin = subprocess.PIPE,
+			stdout = subprocess.PIPE,
+			stderr = subprocess.PIPE
+			)
+		self._control = _sender_class(self._proc.stdin, 'pickle').send
+		self._lock = threading.Lock()
+		self.mounts = set() # mount IDs
+		self.out_r = _receiver_class(
+			'out', self._proc.stdout, partial(_out_decoder, decode_func = CODECS[codec]().decode), out_func,
+			None, queue_config, ready_func
+			)
+		self.err_r = _receiver_class('err', self._proc.stderr, _err_decoder, err_func)
+
+
+	@property
+	def alive(self):
+
+		return self._proc.poll() is None
+
+
+	def command(self, *command):
+
+		with self._lock:
+			if self._proc.stdin.closed:
+				return
+			try:
+				self._control(command)
+			except BrokenPipeError: # process is gone, its mounts end with it
+				pass
+
+
+	def close(self):
+		"""Closes the control stream, the process then unmounts everything and exits.
+		"""
+
+		with self._lock:
+			if self._proc.stdin.closed:
+				return
+			try:
+				self._proc.stdin.close()
+			except BrokenPipeError:
+				pass
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: NOTIFY POOL
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class notify_pool_class:
+	"""Watches many directories with a few LoggedFS-python processes (processes), instead of
+	one process per directory as loggedfs_notify does. Each process hosts many mounts and
+	sends their events, tagged with mount IDs, through one pipe. A single thread delivers
+	the events of all mounts to their consumers:
+
+		pool = loggedfs_notify_pool(processes = 2)
+		mount_id = pool.add('demo_dir', consumer_out_func = print)
+		pool.wait_ready(mount_id, timeout = 5.0)
+		...
+		pool.terminate()
+
+	Events carry their mount ID in the "mount_id" field. A mount's events end with
+	end_of_transmission(mount_id), once it is removed or its process exited.
+	"""
+
+
+	def __init__(self,
+		consumer_err_func = None, # consumes anything on stderr of all processes
+		post_exit_func = None, # called on exit
+		processes = POOL_PROCESSES_DEFAULT,
+		codec = IPC_CODEC_DEFAULT, # event serialization
+		batch_latency = IPC_BATCH_LATENCY_DEFAULT,
+		queue_max_items = IPC_QUEUE_MAX_ITEMS_DEFAULT, # events per process received but not yet consumed
+		queue_max_bytes = IPC_QUEUE_MAX_BYTES_DEFAULT,
+		queue_policy = IPC_QUEUE_POLICY_DEFAULT # what happens if a queue is full
+		):
+		"""Creates a pool of filesystem notifiers. Processes are started as mounts are added.
+
+		- consumer_err_func: None or callable, consumes output from stderr of all processes
+		- post_exit_func: None or callable, called when the pool was terminated
+		- processes: Integer, maximum number of LoggedFS-python processes. Mounts are
+		  spread across them, each new mount goes to the process hosting fewest.
+		- codec: "pickle" or "schema", serialization of events
+		- batch_latency: Float, seconds, maximum delay before received events are delivered
+		- queue_max_items, queue_max_bytes, queue_policy: Bounds of the queue of each process,
+		  see loggedfs_notify. Counters: queue_stats
+		"""
+
+		if consumer_err_func is not None and not hasattr(consumer_err_func, '__call__'):
+			raise TypeError('consumer_err_func must either be None or callable')
+		if post_exit_func is not None and not hasattr(post_exit_func, '__call__'):
+			raise TypeError('post_exit_func must either be None or callable')
+		if not isinstance(processes, int):
+			raise TypeError('processes must be of type int')
+		if processes <= 0:
+			raise ValueError('processes must be positive')
+		if codec not in IPC_CODECS:
+			raise ValueError('codec must be one of %s' % ', '.join(IPC_CODECS))
+		if not isinstance(batch_latency, (int, float)):
+			raise TypeError('batch_latency must be of type float')
+		if batch_latency <= 0:
+			raise ValueError('batch_latency must be positive')
+		if not isinstance(queue_max_items, int) or not isinstance(queue_max_bytes, int):
+			raise TypeError('queue_max_items and queue_max_bytes must be of type int')
+		if queue_max_items < 0 or queue_max_bytes < 0:
+			raise ValueError('queue_max_items and queue_max_bytes must not be negative')
+		if queue_policy not in IPC_QUEUE_POLICIES:
+			raise ValueError('queue_policy must be one of %s' % ', '.join(IPC_QUEUE_POLICIES))
+
+		self._consumer_err_func = consumer_err_func
+		self._post_exit_func = post_exit_func
+		self._processes = processes
+		self._codec = codec
+		self._batch_latency = batch_latency
+		self._queue_config = {
+			'max_items': queue_max_items,
+			'max_bytes': queue_max_bytes,
+			'policy': queue_policy,
+			}
+
+		self._ids = itertools.count()
+		self._mounts = {} # mount_id: _pool_mount_class, until the mount ended
+		self._directories = {} # directory: mount_id, mounted or mounting
+		self._workers = []
+		self._lock = threading.Lock()
+		self._t = None
+		self._up = True
+
+		atexit.register(self.terminate)
+
+
+	@property
+	def mounts(self):
+		"""IDs of mounts which have not ended yet.
+		"""
+
+		with self._lock:
+			return [mount_id for mount_id, mount in self._mounts.items() if mount.up]
+
+
+	@property
+	def queue_stats(self):
+		"""Counters of the queues of received events, one per process.
+		"""
+
+		with self._lock:
+			return [worker.out_r.stats for worker in self._workers]
+
+
+	def add(self,
+		directory,
+		consumer_out_func = None, # consumes signals of this mount
+		log_filter = None,
+		log_buffers = LOG_BUFFERS_DEFAULT,
+		log_only_modify_operations = LOG_ONLYMODIFYOPERATIONS_DEFAULT,
+		fuse_allowother = FUSE_ALLOWOTHER_DEFAULT
+		):
+		"""Mounts a directory, returns its mount ID. Parameters as for loggedfs_notify.
+		"""
+
+		if log_filter is None:
+			log_filter = filter_pipeline_class()
+
+		if not isinstance(directory, str):
+			raise TypeError('directory must be of type string')
+		if not os.path.isdir(directory):
+			raise ValueError('directory must be a path to an existing directory')
+		if not os.access(directory, os.W_OK | os.R_OK):
+			raise ValueError('not sufficient permissions on directory')
+		if consumer_out_func is not None and not hasattr(consumer_out_func, '__call__'):
+			raise TypeError('consumer_out_func must either be None or callable')
+		if hasattr(consumer_out_func, '__call__'):
+			if len(inspect.signature(consumer_out_func).parameters.keys()) != 1:
+				raise ValueError('consumer_out_func must have one parameter')
+		if not isinstance(log_filter, filter_pipeline_class):
+			raise TypeError('log_filter must either be None or of type filter_pipeline_class')
+		if not isinstance(log_buffers, bool):
+			raise TypeError('log_buffers must be of type bool')
+		if not isinstance(log_only_modify_operations, bool):
+			raise TypeError('log_only_modify_operations must be of type bool')
+		if not isinstance(fuse_allowother, bool):
+			raise TypeError('fuse_allowother must be of type bool')
+		if not self._up:
+			raise ValueError('pool has been terminated')
+
+		directory = os.path.abspath(directory)
+		config = {
+			'fuse_allowother': fuse_allowother,
+			'log_buffers': log_buffers,
+			'log_only_modify_operations': log_only_modify_operations,
+			}
+		# Filter in LoggedFS-python process if possible, i.e. before events are sent.
+		# Pickled separately, so the process can not fail on decoding the command itself.
+		# Until mount_ready confirms the filter is applied, events are filtered here.
+		filter_data = portable_dumps(log_filter)
+		if filter_data is not None:
+			config[POOL_FILTER_KEY] = filter_data
+
+		with self._lock:
+			if directory in self._directories:
+				raise ValueError('directory is already watched by this pool')
+			worker = self._get_worker()
+			mount_id = next(self._ids)
+			self._mounts[mount_id] = _pool_mount_class(
+				mount_id, directory, worker, consumer_out_func, log_filter
+				)
+			self._directories[directory] = mount_id
+			worker.mounts.add(mount_id)
+		worker.command(POOL_MOUNT, mount_id, directory, config)
+
+		return mount_id
+
+
+	def remove(self, mount_id):
+		"""Unmounts a directory. Its consumer receives end_of_transmission(mount_id) last.
+		Does nothing if its mount already ended.
+		"""
+
+		with self._lock:
+			mount = self._mounts.get(mount_id, None)
+		if mount is not None and mount.up:
+			mount.worker.command(POOL_UNMOUNT, mount_id, None, None)
+
+
+	def wait_ready(self, mount_id, timeout = None):
+		"""Blocks until a directory is mounted, its mount ended or timeout (seconds) expired.
+		Returns True if it is mounted, False if not (yet) or if its mount ended.
+		"""
+
+		with self._lock:
+			mount = self._mounts.get(mount_id, None)
+		if mount is None:
+			return False
+		mount.ready.wait(timeout)
+		return mount.ready_signal is not None and mount.up
+
+
+	def startup_latency(self, mount_id):
+		"""Seconds from adding a directory to it being mounted, None before and once its mount ended.
+		"""
+
+		with self._lock:
+			mount = self._mounts.get(mount_id, None)
+		return None if mount is None else mount.ready_latency
+
+
+	def terminate(self):
+		"""Unmounts all directories and waits for all processes to exit.
+		"""
+
+		if not self._up:
+			return
+
+		self._up = False
+
+		with self._lock:
+			workers = tuple(self._workers)
+		for worker in workers:
+			worker.close()
+
+		if self._t is not None:
+			self._t.join()
+		elif self._post_exit_func is not None: # nothing was ever mounted
+			self._post_exit_func()
+
+
+	def _get_worker(self):
+
+		if len(self._workers) < self._processes:
+			worker = _pool_worker_class(
+				self._codec, self._handle_stdout, self._handle_stderr, self._handle_ready, self._queue_config
+				)
+			self._workers.append(worker)
+			if self._t is None:
+				self._t = threading.Thread(target = self._receive, daemon = False)
+				self._t.start()
+			return worker
+		return min(self._workers, key = lambda worker: len(worker.mounts))
+
+
+	def _receive(self):
+
+		while True:
+			time.sleep(self._batch_latency)
+			with self._lock:
+				workers = tuple(self._workers)
+			for worker in workers:
+				alive = worker.alive
+				worker.out_r.flush()
+				worker.err_r.flush()
+				if not alive:
+					self._finish_worker(worker)
+			if not self._up:
+				with self._lock:
+					if len(self._workers) == 0:
+						break
+
+		if self._post_exit_func is not None:
+			self._post_exit_func()
+
+
+	def _finish_worker(self, worker):
+
+		worker.out_r.join(self._batch_latency)
+		worker.err_r.join(self._batch_latency)
+		worker.out_r.flush()
+		worker.err_r.flush()
+		for mount_id in tuple(worker.mounts): # ended with the process
+			self._handle_stdout(end_of_transmission(mount_id))
+		with self._lock:
+			self._workers.remove(worker)
+
+
+	def _end_mount(self, mount):
+
+		with self._lock:
+			mount.up = False
+			mount.worker.mounts.discard(mount.mount_id)
+			self._directories.pop(mount.directory, None)
+			self._mounts.pop(mount.mount_id, None) # its end_of_transmission is delivered by the caller
+		mount.ready.set() # wakes up wait_ready if mounting failed
+
+
+	def _handle_ready(self, signal):
+
+		mount = self._mounts.get(self._directories.get(signal.directory, None), None)
+		if mount is None:
+			return
+		if signal.lib_filter:
+			mount.log_filter_pushed = True
+		mount.ready_latency = time.monotonic() - mount.start_time
+		mount.ready_signal = signal
+		mount.ready.set()
+
+
+	def _handle_stderr(self, msg):
+
+		if isinstance(msg, end_of_transmission):
+			return
+		if self._consumer_err_func is not None:
+			self._consumer_err_func(msg)
+		else:
+			sys.stderr.write(c['RED'] + str(msg).rstrip('\n') + c['RESET'] + '\n')
+			sys.stderr.flush()
+
+
+	def _handle_stdout(self, msg):
+
+		if isinstance(msg, end_of_transmission):
+			mount = self._mounts.get(msg.id, None)
+			if mount is None or not mount.up: # end of a process' stream or repeated
+				return
+			self._end_mount(mount)
+		else:
+			mount = self._mounts.get(msg[MOUNT_ID_KEY], None)
+			if mount is None:
+				return
+			if not mount.log_filter_pushed and not mount.log_filter.match(msg):
+				return
+
+		if mount.consumer_out_func is not None:
+			mount.consumer_out_func(msg)
+		else:
+			sys.stdout.write(c['GREEN'] + str(msg) + c['RESET'] + '\n')
+			sys.stdout.flush()
@@ -29,22 +29,22 @@ specific language governing rights and limitations under the License.
 # IMPORT
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-import base64
 import errno
 from functools import wraps
 import grp
 import inspect
 import json
 import pwd
-import zlib
 
 from refuse.high import (
 	fuse_get_context,
 	FuseOSError,
 	)
 
-from .ipc import send
+from .buffers import _encode_buffer_
 from .log import log_msg
+from .profile import PROFILED_ACTIONS
+from .sketch import hot_msg
 from .timing import time
 
 
@@ -72,7 +72,10 @@ ERROR_STAGE2 = 'UNEXPECTED in log stage (2)'
 # ROUTINES
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-def event(format_pattern = ''):
+def event(format_pattern = '', finalize = False):
+	"""Logs an operation once it returned. With finalize, e.g. for destroy, outputs are
+	flushed and closed (_finalize_outputs) after its own event has been logged.
+	"""
 
 	def wrapper(func):
 
@@ -120,25 +123,15 @@ def event(format_pattern = ''):
 				except Exception as e:
 					self._logger.exception(log_msg(self._log_json, ERROR_STAGE2))
 					raise e
+				finally:
+					if finalize:
+						self._finalize_outputs()
 
 		return wrapped
 
 	return wrapper
 
 
-def decode_buffer(in_buffer):
-
-	if not isinstance(in_buffer, str):
-		raise TypeError('in_buffer must be a string')
-
-	return zlib.decompress(base64.b64decode(in_buffer.encode('utf-8')))
-
-
-def _encode_buffer_(in_bytes):
-
-	return base64.b64encode(zlib.compress(in_bytes, 1)).decode('utf-8') # compress level 1 (weak)
-
-
 def _get_fh_from_fip_(fip):
 
 	if fip is None:
@@ -158,6 +151,22 @@ def _get_group_name_from_gid_(gid):
 		return '[gid: omitted argument]'
 
 
+def _profile_access_(self, action, func_arg_names, func_args, func_kwargs, ret_status, ret_value):
+
+	arg_dict = dict(zip(func_arg_names, func_args), **func_kwargs)
+	fh = _get_fh_from_fip_(arg_dict['fip'])
+	if action == 'release':
+		self._access_profiler.release(fh)
+	elif action == 'read' and ret_status:
+		self._access_profiler.access(
+			fh, self._full_path(arg_dict['path']), False, arg_dict['offset'], arg_dict['length'], len(ret_value)
+			)
+	elif action == 'write' and ret_status:
+		self._access_profiler.access(
+			fh, self._full_path(arg_dict['path']), True, arg_dict['offset'], len(arg_dict['buf']), ret_value
+			)
+
+
 def _get_process_cmdline_(pid):
 
 	try:
@@ -183,6 +192,9 @@ def _log_event_(
 	ret_status, ret_value
 	):
 
+	if self._access_profiler is not None and func.__name__ in PROFILED_ACTIONS: # regardless of filters
+		_profile_access_(self, func.__name__, func_arg_names, func_args, func_kwargs, ret_status, ret_value)
+
 	if self._log_only_modify_operations:
 		if func.__name__ not in (
 			'chmod',
@@ -216,6 +228,8 @@ def _log_event_(
 		'action': func.__name__,
 		'status': ret_status,
 		}
+	if self._mount_id is not None: # one of several directories served by this process
+		log_dict['mount_id'] = self._mount_id
 
 	arg_dict = {
 		arg_name: arg
@@ -270,16 +284,33 @@ def _log_event_(
 			'return_errorcode': errno.errorcode[ret_value[1]]
 			})
 
-	if not self._lib_mode:
-		if not self._log_filter.match(log_dict):
-			return
+	if self._hot_tracker is not None: # regardless of filters
+		self._hot_tracker.add(log_dict)
+		if time.monotonic() >= self._hot_next:
+			self._hot_next = time.monotonic() + self._hot_interval
+			self._logger.info(hot_msg(self._log_json, self._hot_tracker.stats(self._hot_top)))
 
-	if self._log_json and not self._lib_mode:
-		self._logger.info( json.dumps(log_dict, sort_keys = True)[1:-1] )
+	if not self._log_filter.match(log_dict):
 		return
-	elif self._lib_mode:
+
+	if self._log_columnar is not None:
+		self._log_columnar.append(log_dict, time.time_ns())
+
+	if self._lib_mode:
 		log_dict['time'] = time.time_ns()
-		send(log_dict)
+		self._lib_send(log_dict)
+		return
+
+	if not self._log_writer.enabled:
+		return
+
+	if self._log_index: # paths for sidecar index
+		log_paths = [v for k, v in log_dict.items() if k.endswith('path')]
+	else:
+		log_paths = None
+
+	if self._log_json:
+		self._log_writer.write(json.dumps(log_dict, sort_keys = True)[1:-1], log_paths)
 		return
 
 	log_out = ' '.join([
@@ -291,4 +322,4 @@ def _log_event_(
 		'( %s = %d )' % ret_value
 		])
 
-	self._logger.info(log_out)
+	self._log_writer.write(log_out, log_paths)
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/pool.py: Hosting many filesystems in library mode in one process
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from functools import partial
+import pickle
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from .defaults import IPC_CODEC_DEFAULT
+from .filter import filter_pipeline_class
+from .ipc import (
+	end_of_transmission,
+	mount_ready,
+	_locked_sender_class,
+	_out_decoder
+	)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+MOUNT_ID_KEY = 'mount_id' # tag of events sent by hosted filesystems, see out.py
+
+POOL_MOUNT = 'mount' # control commands: (POOL_MOUNT, mount_id, directory, config)
+POOL_UNMOUNT = 'unmount' # (POOL_UNMOUNT, mount_id, None, None)
+POOL_FILTER_KEY = 'log_filter' # config item, pipeline pickled separately by portable_dumps
+
+POOL_UNMOUNT_RETRY = 0.1 # seconds, unmounting waits for pending or busy mounts
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: HOSTED MOUNT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _hosted_mount_class:
+	"""State of one filesystem served by _pool_host_class.
+	"""
+
+	__slots__ = ('mount_id', 'directory', 'thread', 'ready', 'cancelled')
+
+
+	def __init__(self, mount_id, directory):
+
+		self.mount_id = mount_id
+		self.directory = directory
+		self.thread = None
+		self.ready = threading.Event() # set once mounted, i.e. on mount_ready
+		self.cancelled = False # unmount requested
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: POOL HOST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _pool_host_class:
+	"""Mounts and unmounts filesystems in library mode as commanded, each served by a
+	thread of this process. All of them share one output stream: events are tagged with
+	their mount ID (MOUNT_ID_KEY), a mount ends with end_of_transmission(mount_id).
+	"""
+
+
+	def __init__(self, out_stream, codec = IPC_CODEC_DEFAULT):
+
+		self._send = _locked_sender_class(out_stream, codec).send
+		self._mounts = {} # mount_id: _hosted_mount_class, until its mount thread ends
+
+
+	def put(self, command, size = None, force = False):
+		"""Consumes control commands, see _out_decoder. Broken commands are reported
+		on stderr, they never stop the control stream.
+		"""
+
+		if isinstance(command, end_of_transmission): # control stream closed, i.e. shutting down
+			for mount_id in tuple(self._mounts.keys()):
+				self._unmount(mount_id)
+			return
+		if command is None: # could not be decoded, already reported
+			return
+
+		try:
+			action, mount_id, directory, config = command
+			if action == POOL_MOUNT:
+				if mount_id in self._mounts:
+					raise ValueError('mount ID %d is already in use' % mount_id)
+				mount = _hosted_mount_class(mount_id, directory)
+				mount.thread = threading.Thread(target = self._mount, args = (mount, config), daemon = False)
+				self._mounts[mount_id] = mount
+				mount.thread.start()
+			elif action == POOL_UNMOUNT:
+				self._unmount(mount_id)
+			else:
+				raise ValueError('unknown command %r' % (action,))
+		except Exception:
+			_report_error('Pool command failed.')
+
+
+	def join(self):
+
+		for mount in tuple(self._mounts.values()):
+			mount.thread.join()
+
+
+	def _mount(self, mount, config):
+
+		from .fs import loggedfs_factory # deferred, refuse is only needed here
+
+		try:
+			if mount.cancelled: # removed before it was mounted
+				return
+			config = dict(config)
+			log_filter = self._load_filter(mount, config.pop(POOL_FILTER_KEY, None))
+			loggedfs_factory(
+				mount.directory,
+				fuse_foreground = True,
+				lib_mode = True,
+				log_filter = log_filter,
+				log_syslog = False,
+				mount_id = mount.mount_id,
+				_lib_filter = log_filter is not None,
+				_lib_out_func = partial(self._send_mount, mount),
+				_log_stream = sys.stderr, # own logger per mount
+				**config
+				)
+		except Exception:
+			_report_error('Mount %d failed.' % mount.mount_id)
+		finally:
+			mount.ready.set() # mounted or never will be
+			self._send(end_of_transmission(mount.mount_id))
+			self._mounts.pop(mount.mount_id, None)
+
+
+	def _load_filter(self, mount, filter_data):
+
+		if filter_data is None:
+			return None
+		try:
+			log_filter = pickle.loads(filter_data)
+			if not isinstance(log_filter, filter_pipeline_class):
+				raise TypeError('not an instance of filter_pipeline_class')
+		except Exception as e: # mount anyway, mount_ready tells the consumer to filter
+			_report_error('Filter pipeline of mount %d not applied, events are not filtered: %r' % (mount.mount_id, e), False)
+			return None
+		return log_filter
+
+
+	def _send_mount(self, mount, data):
+
+		if type(data) is mount_ready:
+			mount.ready.set()
+		self._send(data)
+
+
+	def _unmount(self, mount_id):
+
+		mount = self._mounts.get(mount_id, None)
+		if mount is None or mount.cancelled:
+			return
+		mount.cancelled = True
+		threading.Thread(target = self._unmount_when_ready, args = (mount,), daemon = True).start()
+
+
+	def _unmount_when_ready(self, mount):
+
+		while mount.thread.is_alive():
+			if not mount.ready.wait(POOL_UNMOUNT_RETRY): # mount is pending
+				continue
+			if not mount.thread.is_alive():
+				break
+			proc = subprocess.run(['fusermount', '-u', mount.directory], stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+			if proc.returncode == 0:
+				break
+			time.sleep(POOL_UNMOUNT_RETRY) # e.g. busy or not quite mounted yet
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def serve_pool(control_stream, out_stream, codec = IPC_CODEC_DEFAULT):
+	"""Hosts filesystems as commanded through pickled frames on control_stream until it
+	is closed, then unmounts all remaining filesystems and returns once they are down.
+	"""
+
+	host = _pool_host_class(out_stream, codec)
+	_out_decoder('control', control_stream, host, _decode_command)
+	host.join()
+
+
+def _decode_command(data_bin):
+
+	try:
+		return pickle.loads(data_bin)
+	except Exception:
+		_report_error('Pool command could not be decoded.')
+		return None
+
+
+def _report_error(msg, trace = True):
+
+	sys.stderr.write(msg + '\n')
+	if trace:
+		sys.stderr.write(traceback.format_exc())
+	sys.stderr.flush()
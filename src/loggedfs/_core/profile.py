@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/profile.py: Online access pattern profiles per file handle
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import json
+
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+PROFILED_ACTIONS = ('read', 'write', 'release')
+PATTERNS = ('sequential', 'strided', 'random')
+
+PROFILE_MSG = 'LoggedFS-python access profile'
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: FILE HANDLE STATE
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _fh_state_class:
+	"""Constant size state of one open file handle.
+	"""
+
+	__slots__ = (
+		'path', 'start_ns',
+		'reads', 'writes', 'bytes_read', 'bytes_written',
+		'read_min', 'read_max', 'write_min', 'write_max',
+		'sequential', 'strided', 'random', 'stride',
+		'last_offset', 'last_end', 'read_end', 'reread_bytes',
+		)
+
+
+	def __init__(self, path):
+
+		self.path = path
+		self.start_ns = time.time_ns()
+		self.reads, self.writes, self.bytes_read, self.bytes_written = 0, 0, 0, 0
+		self.read_min, self.read_max, self.write_min, self.write_max = None, 0, None, 0
+		self.sequential, self.strided, self.random, self.stride = 0, 0, 0, 0
+		self.last_offset, self.last_end = None, None
+		self.read_end = 0 # highest byte read so far
+		self.reread_bytes = 0
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: PROFILER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class access_profiler_class:
+	"""Classifies the reads and writes of each open file handle online. Every access
+	after the first one is sequential (starting where the previous one ended), strided
+	(same non-zero distance to the previous offset as before) or random. Reads below the highest
+	byte read so far count as re-reads, assuming files are read without gaps.
+	A summary (see summary) is handed to emit_func when the handle is released.
+	"""
+
+
+	def __init__(self, emit_func):
+
+		if not callable(emit_func):
+			raise TypeError('emit_func must be callable')
+
+		self._emit = emit_func
+		self._fhs = {} # fh: _fh_state_class
+
+
+	def __len__(self):
+
+		return len(self._fhs)
+
+
+	def access(self, fh, path, is_write, offset, length, transferred):
+		"""Records a read or write of length bytes requested at offset, of which transferred
+		bytes were actually read or written.
+		"""
+
+		state = self._fhs.get(fh, None)
+		if state is None:
+			state = self._fhs[fh] = _fh_state_class(path)
+
+		if state.last_offset is not None:
+			stride = offset - state.last_offset
+			if offset == state.last_end:
+				state.sequential += 1
+			elif stride != 0 and stride == state.stride:
+				state.strided += 1
+			else:
+				state.random += 1
+			state.stride = stride
+		state.last_offset = offset
+		state.last_end = offset + transferred
+
+		if is_write:
+			state.writes += 1
+			state.bytes_written += transferred
+			state.write_min = length if state.write_min is None else min(state.write_min, length)
+			state.write_max = max(state.write_max, length)
+			return
+
+		state.reads += 1
+		state.bytes_read += transferred
+		state.read_min = length if state.read_min is None else min(state.read_min, length)
+		state.read_max = max(state.read_max, length)
+		if offset < state.read_end:
+			state.reread_bytes += min(offset + transferred, state.read_end) - offset
+		state.read_end = max(state.read_end, offset + transferred)
+
+
+	def release(self, fh):
+		"""Emits and forgets the summary of a file handle, if it was read or written.
+		"""
+
+		state = self._fhs.pop(fh, None)
+		if state is not None:
+			self._emit(self.summary(fh, state))
+
+
+	def release_all(self):
+
+		for fh in tuple(self._fhs.keys()):
+			self.release(fh)
+
+
+	@staticmethod
+	def summary(fh, state):
+
+		counts = {pattern: getattr(state, pattern) for pattern in PATTERNS}
+		accesses = sum(counts.values())
+		return {
+			'path': state.path,
+			'fh': fh,
+			'seconds': (time.time_ns() - state.start_ns) / 1e9,
+			'pattern': max(PATTERNS, key = counts.get) if accesses > 0 else None,
+			'sequential': counts['sequential'],
+			'strided': counts['strided'],
+			'random': counts['random'],
+			'stride': state.stride if state.strided > 0 else None,
+			'reads': state.reads,
+			'writes': state.writes,
+			'bytes_read': state.bytes_read,
+			'bytes_written': state.bytes_written,
+			'read_size_min': state.read_min,
+			'read_size_max': state.read_max,
+			'read_size_mean': state.bytes_read / state.reads if state.reads > 0 else None,
+			'write_size_min': state.write_min,
+			'write_size_max': state.write_max,
+			'write_size_mean': state.bytes_written / state.writes if state.writes > 0 else None,
+			'reread_bytes': state.reread_bytes,
+			'reread_ratio': state.reread_bytes / state.bytes_read if state.bytes_read > 0 else 0.0,
+			}
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def access_profile_msg(log_json, summary):
+	"""Log message holding a summary of access_profiler_class.
+	"""
+
+	if log_json:
+		return '"msg": "%s", "access_profile": %s' % (PROFILE_MSG, json.dumps(summary, sort_keys = True))
+
+	total = max(1, sum(summary[pattern] for pattern in PATTERNS))
+	msg = '%s: %s (fh=%d) %s [ %s ]' % (
+		PROFILE_MSG, summary['path'], summary['fh'], summary['pattern'] or 'single',
+		' '.join('%s %0.0f%%' % (pattern, 100 * summary[pattern] / total) for pattern in PATTERNS)
+		)
+	if summary['reads'] > 0:
+		msg += ' [ reads {reads} {bytes_read} bytes size {read_size_min}-{read_size_max} re-read {reread_ratio:.0%} ]'.format(**summary)
+	if summary['writes'] > 0:
+		msg += ' [ writes {writes} {bytes_written} bytes size {write_size_min}-{write_size_max} ]'.format(**summary)
+	return msg
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/reader.py: Reading JSON logs and library mode event streams
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import gzip
+import json
+import re
+import struct
+
+try:
+	import lzma
+except ImportError: # Python built without liblzma
+	lzma = None
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+from .defaults import IPC_CODEC_DEFAULT
+from .ipc import CODECS, LEN_DTYPE, PREFIX
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S' # logging.Formatter.default_time_format
+TIME_NS_SEP = ','
+
+TEXT_LINE_RE = re.compile( # traditional format, see out.py
+	r'^(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d+|\d+) \([^)]*\) (?P<action>\w+) (?P<params>.*)'
+	r' \{(?P<status>SUCCESS|FAILURE)\} \[ pid = (?P<pid>\d+) (?:(?P<cmd>.*) )?uid = (?P<uid>\d+) \]'
+	r' \( (?P<ret_name>\S+) = (?P<ret>.*) \)$'
+	)
+TEXT_LENGTH_KEYS = {'read': 'param_length', 'write': 'param_buf_len'} # "N bytes ..."
+
+COMPRESSIONS_INSTALL = { # how to make a compression available
+	'xz': 'Python must be built with liblzma',
+	'zstd': 'pip install zstandard',
+	}
+COMPRESSIONS = { # name: (file name suffix, open function or None if unavailable)
+	'gzip': ('.gz', gzip.open),
+	'xz': ('.xz', lzma.open if lzma is not None else None),
+	'zstd': ('.zst', zstandard.open if zstandard is not None else None),
+	}
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: TIMESTAMP PARSER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _timestamp_parser_class:
+	"""Converts log timestamps ("2020-07-11 13:45:01,123456789", local time, or
+	already nanoseconds since the epoch) into nanoseconds since the epoch.
+	The seconds part is parsed once per second of log.
+	"""
+
+
+	def __init__(self):
+
+		self._prefix = None
+		self._prefix_ns = None
+
+
+	def __call__(self, timestamp):
+
+		if timestamp.isdigit(): # logged with --time-ns
+			return int(timestamp)
+		prefix, nsec = timestamp.rsplit(TIME_NS_SEP, 1)
+		if prefix != self._prefix:
+			self._prefix_ns = int(time.mktime(time.strptime(prefix, TIME_FORMAT))) * 10**9
+			self._prefix = prefix
+		return self._prefix_ns + int(nsec)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def open_log(path):
+	"""Opens a log file or a compressed log segment for reading (binary).
+	"""
+
+	for name, (suffix, open_func) in COMPRESSIONS.items():
+		if not path.endswith(suffix):
+			continue
+		if open_func is None:
+			raise ImportError('decompression of "%s" files is not available (%s)' % (suffix, COMPRESSIONS_INSTALL[name]))
+		return open_func(path, 'rb')
+	return open(path, 'rb')
+
+
+def strip_compression_suffix(path):
+
+	for suffix, _ in COMPRESSIONS.values():
+		if path.endswith(suffix):
+			return path[:-len(suffix)]
+	return path
+
+
+def parse_json_line(line, parse_time = None):
+	"""Returns the event logged in one line of a JSON log (-j) as a dict in the format
+	of library mode, with "time" in nanoseconds since the epoch.
+	Returns None for lines not holding events, e.g. messages and empty lines.
+	"""
+
+	line = line.strip()
+	if len(line) == 0 or line[0] != '{':
+		return None
+	try:
+		log_dict = json.loads(line)
+	except ValueError:
+		return None
+	if 'action' not in log_dict:
+		return None
+
+	log_dict.pop('logger', None)
+	timestamp = log_dict.get('time', None)
+	if isinstance(timestamp, str):
+		log_dict['time'] = (parse_time or _timestamp_parser_class())(timestamp)
+
+	return log_dict
+
+
+def parse_text_line(line, parse_time = None):
+	"""Returns the event logged in one line of a log in traditional format as a dict
+	in the format of library mode, as far as the line tells: time, action, status, process,
+	the first path, the number of bytes of reads and writes, and the return value as a string.
+	Paths containing blanks are cut off. Returns None for lines not holding events.
+	"""
+
+	match = TEXT_LINE_RE.match(line.rstrip('\n'))
+	if match is None:
+		return None
+
+	action, params, ret = match.group('action', 'params', 'ret')
+	log_dict = {
+		'time': (parse_time or _timestamp_parser_class())(match.group('time')),
+		'action': action,
+		'status': match.group('status') == 'SUCCESS',
+		'proc_pid': int(match.group('pid')),
+		'proc_cmd': match.group('cmd') or '',
+		'proc_uid': int(match.group('uid')),
+		}
+	for param in params.split(' '):
+		if param.startswith('/'):
+			log_dict['param_path'] = param
+			break
+	if action in TEXT_LENGTH_KEYS:
+		length = params.split(' ', 1)[0]
+		if length.isdigit():
+			log_dict[TEXT_LENGTH_KEYS[action]] = int(length)
+	if log_dict['status']:
+		log_dict['return'] = ret
+	else:
+		log_dict['return_exception'] = match.group('ret_name')
+		log_dict['return_errno'] = int(ret) if ret.isdigit() else None
+
+	return log_dict
+
+
+def read_log(in_stream):
+	"""Yields events from a log in traditional or JSON format, text or binary stream,
+	skipping other lines.
+	"""
+
+	parse_time = _timestamp_parser_class()
+	for line in in_stream:
+		if isinstance(line, bytes):
+			line = line.decode('utf-8', errors = 'replace')
+		if line.startswith('{'):
+			log_dict = parse_json_line(line, parse_time)
+		else:
+			log_dict = parse_text_line(line, parse_time)
+		if log_dict is not None:
+			yield log_dict
+
+
+def read_json_log(in_stream):
+	"""Yields events from a JSON log (-j), text or binary stream, skipping other lines.
+	"""
+
+	parse_time = _timestamp_parser_class()
+	for line in in_stream:
+		if isinstance(line, bytes):
+			line = line.decode('utf-8')
+		log_dict = parse_json_line(line, parse_time)
+		if log_dict is not None:
+			yield log_dict
+
+
+def read_lib_frames(in_stream, codec = IPC_CODEC_DEFAULT):
+	"""Yields events from a recorded library mode stream (binary), skipping signals
+	such as mount_ready.
+	"""
+
+	decode = CODECS[codec]().decode
+	prefix_len = len(PREFIX)
+	len_len = struct.calcsize(LEN_DTYPE)
+	while True:
+		prefix = in_stream.read(prefix_len)
+		if len(prefix) < prefix_len:
+			break
+		if prefix != PREFIX:
+			raise ValueError('stream is not a library mode event stream')
+		data_len = struct.unpack(LEN_DTYPE, in_stream.read(len_len))[0]
+		data = decode(in_stream.read(data_len))
+		if isinstance(data, dict): # events, not signals
+			yield data
+
+
+def read_events(in_stream, codec = IPC_CODEC_DEFAULT):
+	"""Yields events from a JSON log or a recorded library mode stream (binary),
+	detected by the library mode frame prefix.
+	"""
+
+	head = in_stream.peek(len(PREFIX))[:len(PREFIX)] if hasattr(in_stream, 'peek') else b''
+	if head == PREFIX:
+		return read_lib_frames(in_stream, codec)
+	return read_json_log(in_stream)
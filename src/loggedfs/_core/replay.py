@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/replay.py: Replaying logged operations against a directory
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import errno
+import json
+import os
+import queue
+import threading
+
+from .buffers import decode_buffer
+from .defaults import (
+	IPC_CODEC_DEFAULT,
+	REPLAY_QUEUE_EVENTS_DEFAULT,
+	REPLAY_SPEED_DEFAULT
+	)
+from .reader import open_log, read_events
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+ROOT_MSG_PREFIX = 'LoggedFS-python starting at '
+ROOT_SEARCH_LINES = 100 # startup messages precede events
+
+SKIPPED_ACTIONS = ('init', 'destroy')
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: REPLAY
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class replay_class:
+	"""Replays logged events against the target directory. Paths are taken relative to root,
+	the directory the log was recorded at. Only successful operations are replayed.
+	Events of each process are replayed in their logged order, processes run in parallel
+	threads (or in logged order in one thread if not parallel).
+	speed scales timing: 0 replays as fast as possible, 1 in real time, 2 twice as fast.
+	Writes use logged buffers (-b) or zeros of the logged length. Open flags are not logged:
+	files are opened for reading and writing where permitted.
+	"""
+
+
+	def __init__(self,
+		target,
+		root,
+		speed = REPLAY_SPEED_DEFAULT,
+		parallel = True,
+		queue_events = REPLAY_QUEUE_EVENTS_DEFAULT
+		):
+
+		if not isinstance(target, str) or not isinstance(root, str):
+			raise TypeError('target and root must be of type string')
+		if not os.path.isdir(target):
+			raise ValueError('target must be a path to an existing directory')
+		if not isinstance(speed, (int, float)):
+			raise TypeError('speed must be of type float')
+		if speed < 0:
+			raise ValueError('speed must not be negative')
+		if not isinstance(parallel, bool):
+			raise TypeError('parallel must be of type bool')
+
+		self._target = os.path.abspath(target)
+		self._root = root.rstrip('/') or '/'
+		self._speed = speed
+		self._parallel = parallel
+		self._queue_events = queue_events
+
+		self._fds = {} # (logged pid, logged file handle): replayed file descriptor
+		self._fds_lock = threading.Lock() # workers share _fds
+		self._start = None # monotonic seconds
+		self._first_ns = None # time of first event
+		self._workers = {} # pid: (queue, thread, stats)
+		self._stats = self._new_stats()
+
+
+	@staticmethod
+	def _new_stats():
+
+		return {'events': 0, 'replayed': 0, 'skipped': 0, 'failed': 0, 'actions': {}, 'errors': {}}
+
+
+	@staticmethod
+	def _merge_stats(stats, other):
+
+		for key in ('events', 'replayed', 'skipped', 'failed'):
+			stats[key] += other[key]
+		for key in ('actions', 'errors'):
+			for name, count in other[key].items():
+				stats[key][name] = stats[key].get(name, 0) + count
+
+
+	def _path(self, logged_path):
+		"""Maps a logged (absolute) path into target, None if it is outside of root.
+		"""
+
+		rel_path = os.path.relpath(logged_path, self._root)
+		if rel_path == '..' or rel_path.startswith('../'):
+			return None
+		return os.path.normpath(os.path.join(self._target, rel_path))
+
+
+	@staticmethod
+	def _fh(event):
+		"""Key of the logged file handle. Handles are reused after release,
+		so they are only unique per process.
+		"""
+
+		return (event.get('proc_pid', 0), event.get('param_fip', -1))
+
+
+	def _fd(self, event, path):
+		"""Replayed file descriptor for the logged file handle, opens the file if unknown.
+		"""
+
+		key = self._fh(event)
+		with self._fds_lock:
+			fd = self._fds.get(key, None)
+			if fd is None:
+				fd = self._open(path)
+				if key[1] >= 0:
+					self._fds[key] = fd
+		return fd
+
+
+	@staticmethod
+	def _open(path):
+
+		try:
+			return os.open(path, os.O_RDWR)
+		except OSError as e:
+			if e.errno not in (errno.EACCES, errno.EISDIR, errno.EROFS, errno.EPERM, errno.ETXTBSY):
+				raise
+		return os.open(path, os.O_RDONLY)
+
+
+	def _wait(self, event):
+
+		if self._speed == 0 or 'time' not in event:
+			return
+		delay = self._start + (event['time'] - self._first_ns) / 1e9 / self._speed - time.monotonic()
+		if delay > 0:
+			time.sleep(delay)
+
+
+	def _apply(self, event):
+		"""Replays one event, returns False if it was skipped.
+		"""
+
+		action = event['action']
+		path = self._path(event['param_path']) if 'param_path' in event else None
+
+		if action == 'open':
+			key = self._fh(event)
+			fd = self._open(path)
+			with self._fds_lock:
+				if key[1] >= 0:
+					fd, self._fds[key] = self._fds.get(key, None), fd
+			if fd is not None:
+				os.close(fd)
+		elif action == 'release':
+			with self._fds_lock:
+				fd = self._fds.pop(self._fh(event), None)
+			if fd is not None:
+				os.close(fd)
+		elif action == 'read':
+			os.pread(self._fd(event, path), event['param_length'], event['param_offset'])
+		elif action == 'write':
+			buf = event.get('param_buf', '')
+			data = decode_buffer(buf) if len(buf) > 0 else bytes(event['param_buf_len'])
+			os.pwrite(self._fd(event, path), data, event['param_offset'])
+		elif action == 'truncate':
+			if event.get('param_fip', None) is not None and event['param_fip'] >= 0:
+				os.ftruncate(self._fd(event, path), event['param_length'])
+			else:
+				os.truncate(path, event['param_length'])
+		elif action == 'getattr':
+			os.lstat(path)
+		elif action == 'access':
+			os.access(path, event['param_mode'])
+		elif action == 'readdir':
+			os.listdir(path)
+		elif action == 'readlink':
+			os.readlink(path)
+		elif action == 'statfs':
+			os.statvfs(path)
+		elif action == 'mkdir':
+			os.mkdir(path, event['param_mode'])
+		elif action == 'mknod':
+			os.mknod(path, event['param_mode'])
+		elif action == 'rmdir':
+			os.rmdir(path)
+		elif action == 'unlink':
+			os.unlink(path)
+		elif action == 'chmod':
+			os.chmod(path, event['param_mode'])
+		elif action == 'chown':
+			os.chown(path, event['param_uid'], event['param_gid'], follow_symlinks = False)
+		elif action == 'utimens':
+			times = event.get('param_times', None)
+			if times is None or None in times: # now
+				os.utime(path, follow_symlinks = False)
+			else:
+				os.utime(path, ns = tuple(times), follow_symlinks = False)
+		elif action == 'rename':
+			new_path = self._path(event['param_new_path'])
+			old_path = self._path(event['param_old_path'])
+			if None in (old_path, new_path):
+				return False
+			os.rename(old_path, new_path)
+		elif action == 'link':
+			source_path = self._path(event['param_source_path'])
+			target_path = self._path(event['param_target_path'])
+			if None in (source_path, target_path):
+				return False
+			os.link(source_path, target_path)
+		elif action == 'symlink': # location relative to mount, root was prepended to content when logged
+			location = os.path.join(self._target, event['param_target_path_'].lstrip('/'))
+			content = event['param_source_path']
+			if self._path(content) is not None:
+				content = os.path.relpath(content, self._root)
+			os.symlink(content, location)
+		else:
+			return False
+		return True
+
+
+	def _replay(self, event, stats):
+
+		stats['events'] += 1
+		action = event.get('action', None)
+		if (
+			not event.get('status', False)
+			or action in SKIPPED_ACTIONS
+			or ('param_path' in event and self._path(event['param_path']) is None)
+			):
+			stats['skipped'] += 1
+			return
+
+		self._wait(event)
+		try:
+			replayed = self._apply(event)
+		except (OSError, KeyError, TypeError, ValueError):
+			stats['failed'] += 1
+			stats['errors'][action] = stats['errors'].get(action, 0) + 1
+			return
+		if not replayed:
+			stats['skipped'] += 1
+			return
+		stats['replayed'] += 1
+		stats['actions'][action] = stats['actions'].get(action, 0) + 1
+
+
+	def _work(self, q, stats):
+
+		while True:
+			event = q.get()
+			if event is None:
+				break
+			self._replay(event, stats)
+
+
+	def _dispatch(self, event):
+
+		pid = event.get('proc_pid', 0)
+		worker = self._workers.get(pid, None)
+		if worker is None:
+			q = queue.Queue(maxsize = self._queue_events)
+			stats = self._new_stats()
+			t = threading.Thread(target = self._work, args = (q, stats), daemon = True)
+			t.start()
+			worker = self._workers[pid] = (q, t, stats)
+		worker[0].put(event)
+
+
+	def run(self, events):
+		"""Replays an iterable of events (dicts, as in library mode), returns statistics.
+		"""
+
+		start = time.monotonic()
+		pids = set()
+		for event in events:
+			pids.add(event.get('proc_pid', 0))
+			if self._first_ns is None and 'time' in event:
+				self._first_ns = event['time']
+				self._start = time.monotonic()
+			if self._parallel:
+				self._dispatch(event)
+			else:
+				self._replay(event, self._stats)
+
+		for q, t, stats in self._workers.values():
+			q.put(None)
+		for q, t, stats in self._workers.values():
+			t.join()
+			self._merge_stats(self._stats, stats)
+		for fd in self._fds.values():
+			os.close(fd)
+		self._fds.clear()
+
+		self._stats['processes'] = len(pids)
+		self._stats['seconds'] = time.monotonic() - start
+		return self._stats
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def find_log_root(log_path):
+	"""Returns the directory a JSON log was recorded at, from its startup messages, or None.
+	"""
+
+	with open_log(log_path) as f:
+		for _ in range(ROOT_SEARCH_LINES):
+			line = f.readline()
+			if len(line) == 0 or not line.startswith(b'{'):
+				break
+			try:
+				msg = json.loads(line.decode('utf-8')).get('msg', '')
+			except ValueError:
+				break
+			if msg.startswith(ROOT_MSG_PREFIX):
+				return msg[len(ROOT_MSG_PREFIX):]
+	return None
+
+
+def replay_log(log_path, target, root = None, codec = IPC_CODEC_DEFAULT, **kwargs):
+	"""Replays a JSON log (-j) or a recorded library mode stream against target,
+	see replay_class. root defaults to the directory the JSON log was recorded at.
+	"""
+
+	if root is None:
+		root = find_log_root(log_path)
+	if root is None:
+		raise ValueError('root unknown, the log does not say where it was recorded')
+
+	with open_log(log_path) as f:
+		return replay_class(target, root, **kwargs).run(read_events(f, codec))
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/sink.py: Rotating, compressing log file sink
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import io
+import logging
+import os
+import queue
+import shutil
+import threading
+import traceback
+
+from .defaults import (
+	SINK_BUFFER_SIZE_DEFAULT,
+	SINK_COMPRESSION_DEFAULT,
+	SINK_FSYNC_INTERVAL_DEFAULT,
+	SINK_ROTATE_BYTES_DEFAULT,
+	SINK_ROTATE_SECONDS_DEFAULT
+	)
+from .index import _index_writer_class
+from .reader import COMPRESSIONS, COMPRESSIONS_INSTALL
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+SEGMENT_TIME_FORMAT = '%Y%m%d-%H%M%S'
+COMPRESS_CHUNK = 2**20 # bytes
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: ROTATING FILE SINK
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class rotating_file_sink_class:
+	"""Appends text to a log file through a large buffer. Once the file exceeds rotate_bytes
+	or is older than rotate_seconds (0 disables either), it is closed and renamed to a segment
+	named after its start time, e.g. "loggedfs.log.20200711-134501-042". A background thread
+	fsyncs every fsync_interval seconds, closes and renames full files and compresses segments
+	(gzip, xz, zstd or none). Writing only ever costs a buffered write and queueing of jobs:
+	until a full file has been renamed, text is buffered in memory, and a rotation falling due
+	meanwhile waits for the rename. Rotation is checked on write: an idle file is rotated
+	by its next line.
+	"""
+
+
+	def __init__(self,
+		path,
+		rotate_bytes = SINK_ROTATE_BYTES_DEFAULT,
+		rotate_seconds = SINK_ROTATE_SECONDS_DEFAULT,
+		compression = SINK_COMPRESSION_DEFAULT,
+		buffer_size = SINK_BUFFER_SIZE_DEFAULT,
+		fsync_interval = SINK_FSYNC_INTERVAL_DEFAULT
+		):
+
+		if not isinstance(path, str):
+			raise TypeError('path must be of type string')
+		if not isinstance(rotate_bytes, int) or not isinstance(buffer_size, int):
+			raise TypeError('rotate_bytes and buffer_size must be of type int')
+		if rotate_bytes < 0 or rotate_seconds < 0 or fsync_interval < 0:
+			raise ValueError('rotate_bytes, rotate_seconds and fsync_interval must not be negative')
+		if compression != 'none':
+			if compression not in COMPRESSIONS:
+				raise ValueError('compression must be one of none, %s' % ', '.join(sorted(COMPRESSIONS)))
+			if COMPRESSIONS[compression][1] is None:
+				raise ValueError('compression "%s" is not available (%s)' % (compression, COMPRESSIONS_INSTALL[compression]))
+
+		self._path = path
+		self._rotate_bytes = rotate_bytes
+		self._rotate_ns = int(rotate_seconds * 10**9)
+		self._compression = compression
+		self._buffer_size = buffer_size
+		self._fsync_ns = int(fsync_interval * 10**9)
+		self._rotate_funcs = [] # called with segment path after rotation
+		self._retired = None # set by the worker once a full file is renamed, see rotate
+		self._segment_pending = None # segment path the worker is about to rename to
+
+		self._jobs = queue.Queue()
+		self._worker = threading.Thread(target = self._work, daemon = True)
+		self._worker.start()
+
+		self._open()
+
+
+	@property
+	def path(self):
+		return self._path
+
+
+	def add_rotate_func(self, rotate_func):
+
+		self._rotate_funcs.append(rotate_func)
+
+
+	def _open(self):
+
+		self._f = open(self._path, 'ab', buffering = self._buffer_size)
+		self._size = self._f.tell()
+		self._opened_ns = time.time_ns()
+		self._fsynced_ns = self._opened_ns
+
+
+	def tell(self):
+
+		return self._size
+
+
+	def rotate_if_due(self):
+
+		if self._retired is not None: # previous rotation pending, keep buffering
+			if not self._retired.is_set():
+				return
+			self._reopen()
+		if (
+			(self._rotate_bytes > 0 and self._size >= self._rotate_bytes)
+			or (self._rotate_ns > 0 and time.time_ns() - self._opened_ns >= self._rotate_ns)
+			):
+			self.rotate()
+
+
+	def write(self, msg):
+
+		self.rotate_if_due()
+		if self._retired is not None and self._retired.is_set():
+			self._reopen()
+		data = msg.encode('utf-8')
+		self._f.write(data)
+		self._size += len(data)
+
+
+	def flush(self):
+		"""Called by logging handlers after every record and periodically by the event writer.
+		Flushes the buffer, hands a batched fsync to the worker when due (fsync_interval > 0).
+		"""
+
+		if self._retired is not None: # text stays in memory until the full file is renamed
+			if not self._retired.is_set():
+				return
+			self._reopen()
+		self._f.flush()
+		if self._fsync_ns == 0:
+			return
+		now = time.time_ns()
+		if now - self._fsynced_ns < self._fsync_ns:
+			return
+		self._fsynced_ns = now
+		self._jobs.put((self._fsync, os.dup(self._f.fileno())))
+
+
+	def rotate(self):
+		"""Does nothing while the previous rotation is pending, see rotate_if_due.
+		"""
+
+		if self._retired is not None:
+			if not self._retired.is_set():
+				return
+			self._reopen()
+		segment_path = self._segment_path()
+		self._retired = threading.Event()
+		self._segment_pending = segment_path
+		self._jobs.put((self._retire, (self._f, segment_path, self._retired)))
+		self._f = io.BytesIO()
+		self._size = 0
+		self._opened_ns = time.time_ns()
+		self._fsynced_ns = self._opened_ns
+		for rotate_func in self._rotate_funcs:
+			rotate_func(segment_path)
+		if self._compression != 'none':
+			self._jobs.put((self._compress, segment_path))
+
+
+	def _reopen(self):
+
+		data = self._f.getvalue()
+		opened_ns = self._opened_ns
+		self._retired = None
+		self._open()
+		self._opened_ns = opened_ns # age counts from rotation
+		self._f.write(data)
+		self._size = self._f.tell()
+
+
+	def _segment_path(self):
+
+		segment_path = '%s.%s-%03d' % ( # sortable by start time
+			self._path,
+			time.strftime(SEGMENT_TIME_FORMAT, time.localtime(self._opened_ns // 10**9)),
+			(self._opened_ns // 10**6) % 1000
+			)
+		candidate, number = segment_path, 0
+		while (
+			os.path.exists(candidate) or os.path.exists(candidate + self._suffix())
+			or candidate == self._segment_pending
+			):
+			number += 1
+			candidate = '%s.%d' % (segment_path, number)
+		return candidate
+
+
+	def _suffix(self):
+
+		if self._compression == 'none':
+			return ''
+		return COMPRESSIONS[self._compression][0]
+
+
+	def _retire(self, job):
+
+		f, segment_path, retired = job
+		try:
+			f.close()
+			os.rename(self._path, segment_path)
+		finally:
+			retired.set()
+
+
+	@staticmethod
+	def _fsync(fd):
+
+		try:
+			os.fsync(fd)
+		finally:
+			os.close(fd)
+
+
+	def _compress(self, segment_path):
+
+		compressed_path = segment_path + self._suffix()
+		with open(segment_path, 'rb') as f_in:
+			with COMPRESSIONS[self._compression][1](compressed_path + '.tmp', 'wb') as f_out:
+				shutil.copyfileobj(f_in, f_out, COMPRESS_CHUNK)
+		with open(compressed_path + '.tmp', 'rb') as f:
+			os.fsync(f.fileno())
+		os.rename(compressed_path + '.tmp', compressed_path)
+		os.remove(segment_path)
+
+
+	def _work(self):
+
+		while True:
+			job = self._jobs.get()
+			if job is None:
+				break
+			job_func, arg = job
+			try:
+				job_func(arg)
+			except Exception:
+				traceback.print_exc() # stderr, logging itself is what failed
+
+
+	def close(self):
+		"""Flushes and fsyncs the current file, waits for pending compressions.
+		"""
+
+		if self._retired is not None:
+			self._retired.wait()
+			self._reopen()
+		self._f.flush()
+		os.fsync(self._f.fileno())
+		self._f.close()
+		self._jobs.put(None)
+		self._worker.join()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: LOGGING HANDLER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _sink_handler_class(logging.StreamHandler):
+	"""Logging handler writing to a rotating_file_sink_class object,
+	optionally maintaining a sidecar index which rotates with the log file.
+	"""
+
+
+	def __init__(self, sink, log_index = False):
+
+		super().__init__(sink)
+		self._sink = sink
+		if log_index:
+			self._index = _index_writer_class(sink.path)
+			sink.add_rotate_func(self._index.rotate)
+		else:
+			self._index = None
+
+
+	def emit(self, record):
+
+		if self._index is None:
+			super().emit(record)
+			return
+		try:
+			msg = self.format(record) + self.terminator
+		except Exception:
+			self.handleError(record)
+			return
+		self._sink.rotate_if_due() # before offsets are taken
+		offset = self._sink.tell()
+		self._sink.write(msg)
+		self._sink.flush()
+		self._index.add(record, offset, self._sink.tell())
+
+
+	def write_event(self, line, created_ns, paths):
+		"""Fast path for the event writer, bypassing records and formatting.
+		"""
+
+		if self._index is None:
+			self._sink.write(line)
+			return
+		self._sink.rotate_if_due()
+		offset = self._sink.tell()
+		self._sink.write(line)
+		self._index.add_event(offset, self._sink.tell(), created_ns, paths)
+
+
+	def close(self):
+
+		self.acquire()
+		try:
+			if self._index is not None:
+				self._index.close()
+			self._sink.close()
+		finally:
+			self.release()
+		super().close()
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/sketch.py: Top-K tracking of paths, processes and users in fixed memory
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from array import array
+import heapq
+import json
+import random
+
+from .defaults import (
+	HOT_CAPACITY_DEFAULT,
+	HOT_SKETCH_DEPTH_DEFAULT,
+	HOT_SKETCH_WIDTH_DEFAULT,
+	HOT_TOP_DEFAULT
+	)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+HOT_MSG = 'LoggedFS-python hot'
+HOT_DIMENSIONS = ('paths', 'processes', 'uids')
+
+HASH_PRIME = 2**61 - 1 # Mersenne prime for row hashes
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: SPACE-SAVING
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class space_saving_class:
+	"""Space-Saving counter (Metwally et al.) holding at most capacity keys. A new key
+	replaces one with the minimum count and inherits it as its error: counts never
+	underestimate, overestimate by at most error, and every key counted more than
+	total / capacity times is held. Keys are kept in buckets by count (stream summary),
+	so each add takes constant time.
+	"""
+
+
+	def __init__(self, capacity = HOT_CAPACITY_DEFAULT):
+
+		if not isinstance(capacity, int):
+			raise TypeError('capacity must be of type int')
+		if capacity < 1:
+			raise ValueError('capacity must be positive')
+
+		self._capacity = capacity
+		self._counts = {} # key: count
+		self._errors = {} # key: overestimation
+		self._buckets = {} # count: keys (dict as ordered set, oldest first)
+		self._min = 0
+		self.total = 0
+
+
+	def __len__(self):
+
+		return len(self._counts)
+
+
+	def add(self, key):
+		"""Counts key once, returns its new (over-)estimated count.
+		"""
+
+		self.total += 1
+		count = self._counts.get(key, None)
+
+		if count is None:
+			if len(self._counts) < self._capacity:
+				count, self._min = 0, 0
+			else: # replace the oldest key of minimum count
+				count = self._min
+				bucket = self._buckets[count]
+				victim = next(iter(bucket))
+				del bucket[victim], self._counts[victim], self._errors[victim]
+			self._errors[key] = count
+		else:
+			bucket = self._buckets[count]
+			del bucket[key]
+		if count in self._buckets and len(self._buckets[count]) == 0:
+			del self._buckets[count]
+
+		count += 1
+		self._counts[key] = count
+		self._buckets.setdefault(count, {})[key] = None
+		if self._min not in self._buckets:
+			self._min = count if self._min == 0 else self._min + 1
+		return count
+
+
+	def top(self, n):
+		"""The n keys counted most often as (key, count, error) tuples, most first.
+		"""
+
+		return [
+			(key, count, self._errors[key])
+			for key, count in heapq.nlargest(n, self._counts.items(), key = lambda item: item[1])
+			]
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: COUNT-MIN
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class count_min_class:
+	"""Count-Min sketch (Cormode and Muthukrishnan) of depth rows of width counters.
+	Estimates never underestimate, and overestimate by at most about
+	e / width * total with probability 1 - exp(-depth). Rows map Python's hash of a key
+	through random pairwise independent hash functions, valid within the process only.
+	"""
+
+
+	def __init__(self, width = HOT_SKETCH_WIDTH_DEFAULT, depth = HOT_SKETCH_DEPTH_DEFAULT):
+
+		if not isinstance(width, int) or not isinstance(depth, int):
+			raise TypeError('width and depth must be of type int')
+		if width < 1 or depth < 1:
+			raise ValueError('width and depth must be positive')
+
+		self._width = width
+		self._rows = tuple(
+			(random.randrange(1, HASH_PRIME), random.randrange(HASH_PRIME), array('Q', bytes(8 * width)))
+			for _ in range(depth)
+			) # (a, b, counters): index is ((a * hash + b) mod prime) mod width
+		self.total = 0
+
+
+	def add(self, key, weight = 1):
+
+		self.total += weight
+		key_hash = hash(key)
+		for a, b, row in self._rows:
+			row[(a * key_hash + b) % HASH_PRIME % self._width] += weight
+
+
+	def estimate(self, key):
+
+		key_hash = hash(key)
+		return min(row[(a * key_hash + b) % HASH_PRIME % self._width] for a, b, row in self._rows)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: HOT TRACKER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class hot_tracker_class:
+	"""Most active paths, processes (pid and command) and users (uid) by events,
+	with bytes read and written per key. Memory is fixed by capacity (Space-Saving,
+	per dimension) and width and depth (Count-Min, bytes per dimension), regardless of
+	the number of distinct keys.
+	"""
+
+
+	def __init__(self,
+		capacity = HOT_CAPACITY_DEFAULT,
+		width = HOT_SKETCH_WIDTH_DEFAULT,
+		depth = HOT_SKETCH_DEPTH_DEFAULT
+		):
+
+		self._events = {dimension: space_saving_class(capacity) for dimension in HOT_DIMENSIONS}
+		self._bytes = {dimension: count_min_class(width, depth) for dimension in HOT_DIMENSIONS}
+
+
+	def add(self, log_dict):
+
+		action = log_dict['action']
+		if action == 'read':
+			nbytes = log_dict.get('return_len', 0)
+		elif action == 'write' and log_dict['status']:
+			nbytes = log_dict.get('param_buf_len', 0)
+		else:
+			nbytes = 0
+
+		keys = (
+			log_dict.get('param_path', None),
+			(log_dict['proc_pid'], log_dict['proc_cmd']),
+			log_dict['proc_uid'],
+			)
+		for dimension, key in zip(HOT_DIMENSIONS, keys):
+			if key is None:
+				continue
+			self._events[dimension].add(key)
+			if nbytes > 0:
+				self._bytes[dimension].add(key, nbytes)
+
+
+	def stats(self, top = HOT_TOP_DEFAULT):
+		"""Per dimension: total events and the top keys with estimated events,
+		maximum overestimation of events (error) and estimated bytes.
+		"""
+
+		stats = {}
+		for dimension in HOT_DIMENSIONS:
+			counter, sketch = self._events[dimension], self._bytes[dimension]
+			rows = []
+			for key, events, error in counter.top(top):
+				row = {'events': events, 'error': error, 'bytes': sketch.estimate(key)}
+				if dimension == 'processes':
+					row['pid'], row['cmd'] = key
+				else:
+					row[dimension[:-1]] = key
+				rows.append(row)
+			stats[dimension] = {'events': counter.total, 'top': rows}
+		return stats
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def hot_msg(log_json, stats):
+	"""Log message holding statistics of hot_tracker_class.
+	"""
+
+	if log_json:
+		return '"msg": "%s", "hot": %s' % (HOT_MSG, json.dumps(stats, sort_keys = True))
+
+	parts = []
+	for dimension in HOT_DIMENSIONS:
+		parts.append('[ %s: %s ]' % (dimension, ', '.join(
+			'%s %d%s' % (
+				'%d %s' % (row['pid'], row['cmd']) if dimension == 'processes' else row[dimension[:-1]],
+				row['events'],
+				' (%d bytes)' % row['bytes'] if row['bytes'] > 0 else ''
+				)
+			for row in stats[dimension]['top']
+			)))
+	return '%s: %s' % (HOT_MSG, ' '.join(parts))
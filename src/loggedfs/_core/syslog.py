@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/syslog.py: Non-blocking RFC5424 syslog sink
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import collections
+import errno
+import logging
+import os
+import socket
+import threading
+
+from .defaults import (
+	SYSLOG_APP_NAME_DEFAULT,
+	SYSLOG_BATCH_BYTES_DEFAULT,
+	SYSLOG_QUEUE_MAX_ITEMS_DEFAULT,
+	SYSLOG_RETRY_INTERVAL_DEFAULT,
+	SYSLOG_SEND_TIMEOUT_DEFAULT
+	)
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+FACILITY_USER = 1
+
+SEVERITIES = { # logging level: syslog severity
+	logging.CRITICAL: 2,
+	logging.ERROR: 3,
+	logging.WARNING: 4,
+	logging.INFO: 6,
+	logging.DEBUG: 7,
+	}
+SEVERITY_INFO = SEVERITIES[logging.INFO]
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S' # RFC3339, UTC
+BOM = b'\xef\xbb\xbf' # RFC5424: UTF-8 message
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: SYSLOG SINK
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class syslog_sink_class:
+	"""Sends syslog messages to a socket from a background thread. address is either
+	the path of a unix socket or a (host, port) tuple. A stream socket is tried first and
+	carries batches of octet-counted RFC5424 frames (RFC6587), which keeps binary and multi-line
+	messages intact. Datagram sockets receive one message per datagram: RFC5424 if remote,
+	"<PRI>APP-NAME[PID]: MSG" (RFC3164) if local (e.g. /dev/log), as syslog(3) sends it.
+	put never blocks: once max_items messages are queued, further messages are dropped
+	and counted. Messages of a failed send are counted as dropped, the socket is reconnected
+	after retry_interval seconds.
+	"""
+
+
+	def __init__(self,
+		address,
+		app_name = SYSLOG_APP_NAME_DEFAULT,
+		facility = FACILITY_USER,
+		max_items = SYSLOG_QUEUE_MAX_ITEMS_DEFAULT,
+		batch_bytes = SYSLOG_BATCH_BYTES_DEFAULT,
+		retry_interval = SYSLOG_RETRY_INTERVAL_DEFAULT,
+		send_timeout = SYSLOG_SEND_TIMEOUT_DEFAULT
+		):
+
+		if not isinstance(address, (str, tuple)):
+			raise TypeError('address must either be a socket path (string) or a (host, port) tuple')
+		if not isinstance(app_name, str) or not isinstance(facility, int):
+			raise TypeError('app_name must be of type string, facility of type int')
+		if not isinstance(max_items, int) or not isinstance(batch_bytes, int):
+			raise TypeError('max_items and batch_bytes must be of type int')
+		if max_items < 1 or batch_bytes < 1:
+			raise ValueError('max_items and batch_bytes must be positive')
+		if not 0 <= facility <= 23:
+			raise ValueError('facility must be between 0 and 23')
+		if retry_interval < 0 or send_timeout <= 0:
+			raise ValueError('retry_interval must not be negative, send_timeout must be positive')
+
+		self._address = address
+		self._facility = facility
+		self._max_items = max_items
+		self._batch_bytes = batch_bytes
+		self._retry_interval = retry_interval
+		self._send_timeout = send_timeout
+
+		self._header = ' %s %s %d - - ' % ( # HOSTNAME APP-NAME PROCID MSGID STRUCTURED-DATA
+			socket.gethostname() or '-', app_name or '-', os.getpid()
+			)
+		self._local_header = '%s[%d]: ' % (app_name or '-', os.getpid()) # RFC3164 TAG
+		self._timestamp_second = None
+		self._timestamp_prefix = None
+
+		self._sock = None
+		self._stream = None
+		self._local = isinstance(address, str) # unix socket
+		self._failed_ns = None # time of last failure, for retry interval
+
+		self._queue = collections.deque()
+		self._wake = threading.Event()
+		self._stop = False
+		self._stats = {
+			'sent': 0,
+			'dropped': 0,
+			'errors': 0,
+			'connects': 0,
+			}
+		self._lock = threading.Lock() # stats only, the queue is a deque
+
+		self._t = threading.Thread(target = self._work, daemon = True)
+		self._t.start()
+
+
+	@property
+	def stats(self):
+
+		with self._lock:
+			stats = self._stats.copy()
+		stats['items'] = len(self._queue)
+		stats['stream'] = self._stream
+		return stats
+
+
+	def _count(self, key, value = 1):
+
+		with self._lock:
+			self._stats[key] += value
+
+
+	def put(self, message, severity = SEVERITY_INFO, time_ns = None):
+		"""Queues a message (string) for sending. Returns False if it was dropped.
+		"""
+
+		if len(self._queue) >= self._max_items: # racy by design, the bound is approximate
+			self._count('dropped')
+			return False
+		self._queue.append((time.time_ns() if time_ns is None else time_ns, severity, message))
+		if not self._wake.is_set():
+			self._wake.set()
+		return True
+
+
+	def _timestamp(self, time_ns):
+
+		second = time_ns // 10**9
+		if second != self._timestamp_second: # worker thread only
+			self._timestamp_prefix = time.strftime(TIMESTAMP_FORMAT, time.gmtime(second)) + '.'
+			self._timestamp_second = second
+		return self._timestamp_prefix + '%06dZ' % ((time_ns - second * 10**9) // 1000)
+
+
+	def _frame(self, time_ns, severity, message):
+
+		if self._local and not self._stream: # local syslog daemon, adds time and host itself
+			return (
+				'<%d>' % (self._facility * 8 + severity) + self._local_header
+				).encode('ascii') + message.encode('utf-8', errors = 'surrogateescape')
+		data = (
+			'<%d>1 ' % (self._facility * 8 + severity)
+			+ self._timestamp(time_ns) + self._header
+			).encode('ascii') + BOM + message.encode('utf-8', errors = 'surrogateescape')
+		if self._stream:
+			return b'%d %s' % (len(data), data) # octet counting
+		return data
+
+
+	def _connect(self):
+
+		if isinstance(self._address, str):
+			family = socket.AF_UNIX
+		else:
+			family = socket.AF_INET6 if ':' in self._address[0] else socket.AF_INET
+
+		for sock_type in (socket.SOCK_STREAM, socket.SOCK_DGRAM):
+			sock = socket.socket(family, sock_type)
+			sock.settimeout(self._send_timeout)
+			try:
+				sock.connect(self._address)
+			except OSError as e:
+				sock.close()
+				if sock_type == socket.SOCK_STREAM and e.errno in (
+					errno.EPROTOTYPE, errno.ECONNREFUSED, errno.ENOTSOCK
+					): # e.g. /dev/log, a datagram socket
+					continue
+				raise
+			self._sock = sock
+			self._stream = sock_type == socket.SOCK_STREAM
+			self._count('connects')
+			return
+
+
+	def _disconnect(self):
+
+		if self._sock is not None:
+			self._sock.close()
+		self._sock = None
+		self._failed_ns = time.time_ns()
+
+
+	def _send(self, batch):
+
+		if self._sock is None:
+			if (
+				self._failed_ns is not None
+				and time.time_ns() - self._failed_ns < self._retry_interval * 10**9
+				):
+				raise ConnectionError('waiting for retry interval')
+			try:
+				self._connect()
+			except OSError:
+				self._failed_ns = time.time_ns()
+				raise
+
+		frames = [self._frame(*item) for item in batch]
+		if self._stream:
+			self._sock.sendall(b''.join(frames))
+			return len(frames)
+		sent = 0
+		for frame in frames:
+			try:
+				self._sock.send(frame)
+			except OSError as e:
+				if e.errno != errno.EMSGSIZE:
+					raise
+				self._count('dropped') # too large for a datagram
+			else:
+				sent += 1
+		return sent
+
+
+	def _drain(self):
+
+		while len(self._queue) > 0:
+			batch, batch_bytes = [], 0
+			while len(self._queue) > 0 and batch_bytes < self._batch_bytes:
+				item = self._queue.popleft()
+				batch.append(item)
+				batch_bytes += len(item[2])
+			try:
+				sent = self._send(batch)
+			except OSError:
+				if self._sock is not None:
+					self._disconnect()
+				self._count('errors')
+				self._count('dropped', len(batch))
+			else:
+				self._count('sent', sent)
+
+
+	def _work(self):
+
+		while True:
+			self._wake.wait()
+			self._wake.clear()
+			self._drain()
+			if self._stop:
+				break
+
+
+	def close(self, timeout = None):
+		"""Sends what is queued (waiting at most timeout seconds) and closes the socket.
+		"""
+
+		self._stop = True
+		self._wake.set()
+		self._t.join(timeout)
+		if not self._t.is_alive():
+			self._disconnect()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: LOGGING HANDLER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _syslog_handler_class(logging.Handler):
+	"""Logging handler queueing records on a syslog_sink_class object.
+	"""
+
+
+	def __init__(self, sink):
+
+		super().__init__()
+		self._sink = sink
+
+
+	@property
+	def sink(self):
+		return self._sink
+
+
+	def emit(self, record):
+
+		try:
+			self._sink.put(
+				self.format(record),
+				SEVERITIES.get(record.levelno, SEVERITY_INFO),
+				getattr(record, 'created_ns', None)
+				)
+		except Exception:
+			self.handleError(record)
+
+
+	def write_message(self, message, time_ns):
+		"""Fast path for the event writer, bypassing records and formatting.
+		"""
+
+		self._sink.put(message, SEVERITY_INFO, time_ns)
+
+
+	def close(self):
+
+		self.acquire()
+		try:
+			self._sink.close()
+		finally:
+			self.release()
+		super().close()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	src/loggedfs/_core/writer.py: Event writer bypassing the logging module
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from functools import partial
+import logging
+import threading
+
+from .defaults import WRITER_FLUSH_INTERVAL_DEFAULT
+from .log import _timestamp_cache_class
+from .syslog import _syslog_handler_class
+from .timing import time
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: EVENT WRITER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _event_writer_class:
+	"""Writes operation events to the handlers of a logger without going through logging:
+	no records, no formatters, no per-event flushes. Lines are identical to those of
+	get_logger's formatters. The timestamp is formatted once per second (or written as
+	nanoseconds since the epoch if log_time_ns is set). Streams are flushed by a background
+	thread no later than flush_interval seconds after a write, and by flush and close.
+	Errors of handlers go through their handleError, as with logging, and do not reach the caller.
+	Startup and diagnostic messages keep using the logger, sharing its streams, so order is kept.
+	If shared is set, the handlers are shared with writers in other threads and each write
+	holds the handler's lock.
+	"""
+
+
+	def __init__(self,
+		logger, log_json, log_time_ns = False, flush_interval = WRITER_FLUSH_INTERVAL_DEFAULT, shared = False
+		):
+
+		if log_json and log_time_ns:
+			self._infix = ', "logger": "%s", ' % logger.name
+			self._template = '{"time": %s%s%s}\n'
+		elif log_json:
+			self._infix = '", "logger": "%s", ' % logger.name
+			self._template = '{"time": "%s%s%s}\n'
+		else:
+			self._infix = ' (%s) ' % logger.name
+			self._template = '%s%s%s\n'
+		self._log_json = log_json
+		self._timestamp = '%d'.__mod__ if log_time_ns else _timestamp_cache_class()
+		self._flush_interval = flush_interval
+		self._shared = shared
+
+		self._lock = threading.Lock() # writes and flushes of this writer
+		self._pending = False # unflushed writes
+		self._wake = threading.Event() # pending or closed
+		self._closed = False
+		self._flusher = None # thread, started by first write
+
+		self._write_funcs = []
+		self._flush_funcs = []
+		if logger.isEnabledFor(logging.INFO):
+			for handler in logger.handlers:
+				self._add_handler(handler)
+
+
+	def _add_handler(self, handler):
+
+		if hasattr(handler, 'write_event'): # indexed log file, rotating sink
+			write_func = lambda line, message, time_ns, paths: handler.write_event(line, time_ns, paths)
+			self._flush_funcs.append((handler, handler.flush))
+		elif isinstance(handler, _syslog_handler_class): # queued, sent by its own thread
+			if self._log_json:
+				write_func = lambda line, message, time_ns, paths: handler.write_message('{%s}' % message, time_ns)
+			else:
+				write_func = lambda line, message, time_ns, paths: handler.write_message(message, time_ns)
+		elif isinstance(handler, logging.StreamHandler): # stderr, stream, plain log file
+			if handler.stream is None: # delayed file handler
+				handler.stream = handler._open()
+			stream_write = handler.stream.write
+			write_func = lambda line, message, time_ns, paths: stream_write(line)
+			self._flush_funcs.append((handler, handler.flush))
+		else:
+			raise TypeError('unsupported log handler: %s' % type(handler).__name__)
+
+		if self._shared:
+			self._write_funcs.append((handler, partial(_locked_write, handler.lock, write_func)))
+		else:
+			self._write_funcs.append((handler, write_func))
+
+
+	@property
+	def enabled(self):
+		return len(self._write_funcs) > 0
+
+
+	def write(self, message, paths = None):
+		"""Writes one event message (without timestamp and logger name) to all targets.
+		paths is handed to targets maintaining an index.
+		"""
+
+		time_ns = time.time_ns()
+		line = self._template % (self._timestamp(time_ns), self._infix, message)
+		with self._lock:
+			for handler, write_func in self._write_funcs:
+				try:
+					write_func(line, message, time_ns, paths)
+				except Exception:
+					_handle_error(handler, message)
+			if not self._pending:
+				self._pending = True
+				self._wake.set()
+		if self._flusher is None:
+			self._start_flusher()
+
+
+	def flush(self):
+
+		with self._lock:
+			self._flush()
+
+
+	def close(self):
+		"""Flushes and stops the background flush thread. Later writes are flushed by flush only.
+		"""
+
+		self._closed = True
+		self._wake.set()
+		if self._flusher is not None and self._flusher is not threading.current_thread():
+			self._flusher.join()
+		self.flush()
+
+
+	def _flush(self):
+
+		self._pending = False
+		for handler, flush_func in self._flush_funcs:
+			try:
+				flush_func()
+			except Exception:
+				_handle_error(handler, None)
+
+
+	def _start_flusher(self):
+
+		with self._lock:
+			if self._flusher is not None or self._closed:
+				return
+			self._flusher = threading.Thread(target = self._flush_worker, name = 'loggedfs-flush', daemon = True)
+			self._flusher.start()
+
+
+	def _flush_worker(self):
+
+		while not self._closed:
+			self._wake.wait()
+			self._wake.clear()
+			if not self._closed:
+				self._wake.wait(self._flush_interval) # collects the writes of the interval, close interrupts
+			with self._lock:
+				if self._pending:
+					self._flush()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _handle_error(handler, message):
+	"""Reports the exception being handled through the handler, as logging.Handler.emit does.
+	"""
+
+	handler.handleError(logging.makeLogRecord({'msg': message}))
+
+
+def _locked_write(lock, write_func, line, message, time_ns, paths):
+
+	with lock:
+		write_func(line, message, time_ns, paths)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/scripts/bench_import.py: Import time of the package and of its entry points
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+STATEMENTS = (
+	'import loggedfs',
+	'from loggedfs import filter_pipeline_class',
+	'from loggedfs import read_events',
+	'from loggedfs import cli_entry',
+	)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def measure(statement, repeat):
+	"""Cumulative microseconds of all imports caused by statement, beyond interpreter startup.
+	"""
+
+	baseline = set(_importtime('pass').keys())
+	durations = []
+	for _ in range(repeat): # fresh interpreter each time, median against noise
+		durations.append(sum(
+			cumulative for name, (cumulative, top_level) in _importtime(statement).items()
+			if top_level and name not in baseline
+			))
+
+	return {
+		'benchmark': 'import',
+		'statement': statement,
+		'repeat': repeat,
+		'median_us': statistics.median(durations),
+		'min_us': min(durations),
+		}
+
+
+def _importtime(statement):
+	"""Returns {module: (cumulative microseconds, imported directly by statement)}.
+	"""
+
+	proc = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', statement],
+		stdout = subprocess.PIPE, stderr = subprocess.PIPE, check = True
+		)
+	modules = {}
+	for line in proc.stderr.decode('utf-8').splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line: # header
+			continue
+		_, cumulative, name = line[len('import time:'):].split('|')
+		modules[name.strip()] = (int(cumulative), not name.startswith('   ')) # nested imports are indented
+	return modules
+
+
+def main():
+
+	parser = argparse.ArgumentParser(description = 'Measure import time of the package and of its entry points')
+	parser.add_argument('--repeat', type = int, default = 20, help = 'fresh interpreters per statement')
+	parser.add_argument('--json', action = 'store_true', help = 'one JSON object per result line')
+	args = parser.parse_args()
+
+	for statement in STATEMENTS:
+		result = measure(statement, args.repeat)
+		if args.json:
+			print(json.dumps(result, sort_keys = True))
+		else:
+			print('{statement:>45s}: {median_us:8.0f} us median | {min_us:8.0f} us min'.format(**result))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ENTRY POINT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+if __name__ == '__main__':
+
+	main()
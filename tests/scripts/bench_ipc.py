@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/scripts/bench_ipc.py: Compare throughput and latency of IPC transports and codecs
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from loggedfs._core.defaults import IPC_CODECS, IPC_RING_SIZE_DEFAULT, IPC_TRANSPORTS
+from loggedfs._core.ipc import (
+	CODECS,
+	create_ring,
+	end_of_transmission,
+	open_ring_reader,
+	_out_decoder,
+	ring_supported,
+	_ring_writer_class,
+	_sender_class
+	)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+EVENT = { # typical read event, as sent in library mode
+	'proc_cmd': '/usr/bin/python3 -m some.module --with-argument',
+	'proc_uid': 1000,
+	'proc_uid_name': 'user',
+	'proc_gid': 100,
+	'proc_gid_name': 'users',
+	'proc_pid': 11716,
+	'action': 'read',
+	'status': True,
+	'param_path': '/home/user/data/some_directory/some_file.txt',
+	'param_length': 4096,
+	'param_offset': 0,
+	'param_fip': 5,
+	'return_len': 4096,
+	'return': '',
+	}
+PATHS = 64 # number of distinct paths events rotate through
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _latency_recorder_class:
+	"""Replaces the receiver's queue, recording the time of arrival of every event.
+	"""
+
+
+	def __init__(self):
+
+		self.latencies = []
+		self.first = None
+		self.last = None
+
+
+	def put(self, data, size = None, force = False):
+
+		now = time.time_ns()
+		if isinstance(data, end_of_transmission):
+			return
+		if self.first is None:
+			self.first = now
+		self.last = now
+		self.latencies.append(now - data['time'])
+
+
+def _events(count, payload):
+
+	template = EVENT.copy()
+	template['return'] = 'A' * payload # BASE64 buffer, as logged with -b
+	paths = [
+		'/home/user/data/some_directory/some_file_%d.txt' % index
+		for index in range(PATHS)
+		]
+
+	for index in range(count):
+		event = template.copy()
+		event['param_path'] = paths[index % PATHS]
+		event['param_offset'] = index * 4096
+		event['time'] = time.time_ns()
+		yield event
+
+
+def produce(transport, codec, ring_path, count, payload):
+
+	if transport == 'ring':
+		sender = _sender_class(_ring_writer_class(ring_path, sys.stdout.buffer), codec)
+	else:
+		sender = _sender_class(sys.stdout.buffer, codec)
+
+	for event in _events(count, payload):
+		sender.send(event)
+
+
+def consume(transport, codec, count, ring_size, payload):
+
+	ring_path = create_ring(ring_size) if transport == 'ring' else ''
+	proc = subprocess.Popen(
+		[
+			sys.executable, __file__,
+			'--produce', transport, '--codec', codec, '--ring-path', ring_path,
+			'--count', str(count), '--payload', str(payload)
+			],
+		stdout = subprocess.PIPE
+		)
+	if transport == 'ring':
+		stream = open_ring_reader(ring_path, proc.stdout)
+	else:
+		stream = proc.stdout
+
+	recorder = _latency_recorder_class()
+	_out_decoder('out', stream, recorder, decode_func = CODECS[codec]().decode)
+	proc.wait()
+
+	if transport == 'ring':
+		stream.close()
+		os.remove(ring_path)
+
+	assert len(recorder.latencies) == count
+	latencies = sorted(recorder.latencies)
+	duration = (recorder.last - recorder.first) / 1e9
+
+	return {
+		'benchmark': 'ipc',
+		'transport': transport,
+		'codec': codec,
+		'events': count,
+		'payload_bytes': payload,
+		'events_per_second': count / duration if duration > 0 else None,
+		'latency_median_us': latencies[len(latencies) // 2] / 1e3,
+		'latency_p99_us': latencies[int(len(latencies) * 0.99)] / 1e3,
+		}
+
+
+def measure_codec(codec, count, payload):
+	"""Encodes and decodes in-process, without any transport.
+	"""
+
+	events = list(_events(count, payload))
+	encode = CODECS[codec]().encode
+	decode = CODECS[codec]().decode
+
+	start = time.perf_counter_ns()
+	encoded = [encode(event) for event in events]
+	encode_ns = time.perf_counter_ns() - start
+
+	start = time.perf_counter_ns()
+	decoded = [decode(data_bin) for data_bin in encoded]
+	decode_ns = time.perf_counter_ns() - start
+
+	assert decoded == events
+
+	return {
+		'benchmark': 'codec',
+		'codec': codec,
+		'events': count,
+		'payload_bytes': payload,
+		'bytes_per_event': sum(len(data_bin) for data_bin in encoded) / count,
+		'encode_ns_per_event': encode_ns / count,
+		'decode_ns_per_event': decode_ns / count,
+		}
+
+
+def main():
+
+	parser = argparse.ArgumentParser(description = 'Compare IPC transports and codecs of library mode')
+	parser.add_argument('--count', type = int, default = 100000, help = 'number of events')
+	parser.add_argument('--ring-size', type = int, default = IPC_RING_SIZE_DEFAULT, help = 'bytes')
+	parser.add_argument('--payload', type = int, default = 0, help = 'bytes of buffer per event')
+	parser.add_argument('--json', action = 'store_true', help = 'one JSON object per result line')
+	parser.add_argument('--produce', choices = IPC_TRANSPORTS, help = argparse.SUPPRESS)
+	parser.add_argument('--codec', choices = IPC_CODECS, help = argparse.SUPPRESS)
+	parser.add_argument('--ring-path', help = argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.produce is not None:
+		produce(args.produce, args.codec, args.ring_path, args.count, args.payload)
+		return
+
+	for codec in IPC_CODECS:
+		result = measure_codec(codec, args.count, args.payload)
+		if args.json:
+			print(json.dumps(result, sort_keys = True))
+		else:
+			print('{codec:>6s}: {bytes_per_event:8.1f} bytes/event | encode {encode_ns_per_event:8.0f} ns | decode {decode_ns_per_event:8.0f} ns'.format(**result))
+
+	for transport in IPC_TRANSPORTS:
+		if transport == 'ring' and not ring_supported():
+			continue
+		for codec in IPC_CODECS:
+			result = consume(transport, codec, args.count, args.ring_size, args.payload)
+			if args.json:
+				print(json.dumps(result, sort_keys = True))
+			else:
+				print('{transport:>6s} {codec:>6s}: {events_per_second:12.0f} events/s | latency median {latency_median_us:10.1f} us | p99 {latency_p99_us:10.1f} us'.format(**result))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ENTRY POINT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+if __name__ == '__main__':
+
+	main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/scripts/bench_log.py: Compare event throughput of logging module, event writer and formatters
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from loggedfs._core.log import _Formatter_ns_, get_logger
+from loggedfs._core.writer import _event_writer_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+MESSAGE_TEXT = (
+	'read /home/user/data/some_directory/some_file.txt 4096 bytes at 0 (fh=5) {SUCCESS} '
+	'[ pid = 11716 /usr/bin/python3 -m some.module uid = 1000 ] ( r = 4096 )'
+	)
+MESSAGE_JSON = json.dumps({
+	'action': 'read',
+	'param_path': '/home/user/data/some_directory/some_file.txt',
+	'param_length': 4096,
+	'param_offset': 0,
+	'param_fip': 5,
+	'proc_cmd': '/usr/bin/python3 -m some.module',
+	'proc_pid': 11716,
+	'proc_uid': 1000,
+	'status': True,
+	'return_len': 4096,
+	}, sort_keys = True)[1:-1]
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: REFERENCE FORMATTER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _uncached_formatter_class(logging.Formatter):
+	"""_Formatter_ns_ as of LoggedFS-python 0.0.6: converter, strftime and formatting per record.
+	"""
+
+	default_nsec_format = '%s,%09d'
+
+	def formatTime(self, record, datefmt=None):
+
+		ct = self.converter(record.created_ns / 1e9)
+		t = time.strftime(self.default_time_format, ct)
+		return self.default_nsec_format % (t, record.created_ns - (record.created_ns // 10**9) * 10**9)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _logger(log_json, log_file, devnull):
+
+	logger = get_logger('LoggedFS-python', True, log_file, False, log_json, log_stream = devnull)
+	return logger
+
+
+def measure(path, log_json, count):
+
+	message = MESSAGE_JSON if log_json else MESSAGE_TEXT
+
+	with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+		logger = _logger(log_json, os.path.join(tmp, 'loggedfs.log'), devnull)
+		writer = None
+		if path == 'logging':
+			write = logger.info
+		else:
+			writer = _event_writer_class(logger, log_json)
+			write = writer.write
+
+		start = time.perf_counter()
+		for _ in range(count):
+			write(message)
+		duration = time.perf_counter() - start
+
+		if writer is not None:
+			writer.close()
+		for handler in logger.handlers:
+			handler.close()
+
+	return {
+		'benchmark': 'log',
+		'path': path,
+		'format': 'json' if log_json else 'text',
+		'events': count,
+		'events_per_second': count / duration,
+		'ns_per_event': duration * 1e9 / count,
+		}
+
+
+def measure_formatter(name, count):
+
+	fmt = '%(asctime)s (%(name)s) %(message)s'
+	formatter = {
+		'uncached': lambda: _uncached_formatter_class(fmt),
+		'cached': lambda: _Formatter_ns_(fmt),
+		'time_ns': lambda: _Formatter_ns_(fmt, time_ns = True),
+		}[name]()
+	records = [ # fresh records, format caches asctime on the record
+		logging.getLogRecordFactory()('LoggedFS-python', logging.INFO, __file__, 0, MESSAGE_TEXT, None, None)
+		for _ in range(count)
+		]
+
+	start = time.perf_counter()
+	for record in records:
+		formatter.format(record)
+	duration = time.perf_counter() - start
+
+	return {
+		'benchmark': 'formatter',
+		'formatter': name,
+		'events': count,
+		'events_per_second': count / duration,
+		'ns_per_event': duration * 1e9 / count,
+		}
+
+
+def main():
+
+	parser = argparse.ArgumentParser(description = 'Compare formatters, logging module and event writer (file plus stream)')
+	parser.add_argument('--count', type = int, default = 100000, help = 'number of events')
+	parser.add_argument('--json', action = 'store_true', help = 'one JSON object per result line')
+	args = parser.parse_args()
+
+	for name in ('uncached', 'cached', 'time_ns'):
+		result = measure_formatter(name, args.count)
+		if args.json:
+			print(json.dumps(result, sort_keys = True))
+		else:
+			print('{formatter:>12s}: {events_per_second:12.0f} events/s | {ns_per_event:8.0f} ns/event'.format(**result))
+
+	for log_json in (False, True):
+		for path in ('logging', 'writer'):
+			result = measure(path, log_json, args.count)
+			if args.json:
+				print(json.dumps(result, sort_keys = True))
+			else:
+				print('{format:>4s} {path:>7s}: {events_per_second:12.0f} events/s | {ns_per_event:8.0f} ns/event'.format(**result))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ENTRY POINT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+if __name__ == '__main__':
+
+	main()
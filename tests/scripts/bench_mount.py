@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/scripts/bench_mount.py: Per-operation overhead of a mounted filesystem
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from loggedfs import loggedfs_notify
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+MODES = { # name: command line options of loggedfs, None for no mount, 'lib' for library mode
+	'bare': None,
+	'text': [],
+	'json': ['-j'],
+	'buffers': ['-b'],
+	'modify': ['-m'],
+	'filter': ['-c', '{config}'],
+	'lib': 'lib',
+	}
+WORKLOADS = ('stat', 'create_delete', 'seq_write', 'seq_read', 'rand_write', 'rand_read', 'readdir')
+BLOCK_SIZES = (4096, 65536, 2**20) # bytes, read/write workloads
+
+FILTER_CONFIG = """<?xml version="1.0" encoding="UTF-8"?>
+<loggedFS logEnabled="true" printProcessName="true">
+	<includes>
+		<include extension=".*" uid="*" action=".*" retname=".*"/>
+	</includes>
+	<excludes>
+		<exclude extension=".*/readdir/.*" uid="*" action="getattr" retname=".*"/>
+		<exclude extension=".*\\.tmp" uid="*" action=".*" retname=".*"/>
+	</excludes>
+</loggedFS>
+"""
+
+MOUNT_TIMEOUT = 10.0 # seconds
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: MOUNT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _mount_class:
+	"""Mounts LoggedFS-python on top of directory in one of MODES, logging to a file in log_dir.
+	"""
+
+
+	def __init__(self, mode, directory, log_dir):
+
+		self._mode = mode
+		self._directory = directory
+		self._log_dir = log_dir
+		self._proc = None
+		self._notify = None
+		self.events = 0
+
+
+	def __enter__(self):
+
+		options = MODES[self._mode]
+		if options is None:
+			return self
+		if options == 'lib':
+			self._notify = loggedfs_notify(
+				self._directory, consumer_batch_func = self._count, background = True
+				)
+		else:
+			config_path = os.path.join(self._log_dir, 'filter.xml')
+			with open(config_path, 'w') as f:
+				f.write(FILTER_CONFIG)
+			self._proc = subprocess.Popen(
+				['loggedfs', '-f', '-s', '-l', os.path.join(self._log_dir, '%s.log' % self._mode)]
+				+ [option.format(config = config_path) for option in options]
+				+ [self._directory],
+				stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL
+				)
+		self._wait_mounted()
+		return self
+
+
+	def _count(self, events):
+
+		self.events += len(events)
+
+
+	def _wait_mounted(self):
+
+		deadline = time.monotonic() + MOUNT_TIMEOUT
+		while not os.path.ismount(self._directory):
+			if self._proc is not None and self._proc.poll() is not None:
+				raise SystemError('loggedfs exited with status %d' % self._proc.returncode)
+			if time.monotonic() > deadline:
+				raise TimeoutError('loggedfs did not mount within %0.1f seconds' % MOUNT_TIMEOUT)
+			time.sleep(0.05)
+
+
+	def __exit__(self, exc_type, exc_value, traceback):
+
+		if self._notify is not None:
+			self._notify.terminate()
+		elif self._proc is not None:
+			subprocess.run(['fusermount', '-u', self._directory], check = False)
+			self._proc.wait()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES: WORKLOADS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# Each workload prepares its files, then returns the number of operations and their duration (ns).
+
+def _workload_stat(directory, count, block_size):
+
+	paths = [os.path.join(directory, 'stat_%d' % index) for index in range(64)]
+	for path in paths:
+		open(path, 'w').close()
+	start = time.perf_counter_ns()
+	for index in range(count):
+		os.stat(paths[index % 64])
+	return count, time.perf_counter_ns() - start
+
+
+def _workload_create_delete(directory, count, block_size):
+
+	data = b'x' * 256
+	path = os.path.join(directory, 'create_%d')
+	start = time.perf_counter_ns()
+	for index in range(count):
+		with open(path % index, 'wb') as f:
+			f.write(data)
+		os.unlink(path % index)
+	return count, time.perf_counter_ns() - start
+
+
+def _blocks(count, block_size):
+
+	return max(1, min(count, (64 * 2**20) // block_size)) # at most 64 MiB per file
+
+
+def _workload_seq_write(directory, count, block_size):
+
+	blocks = _blocks(count, block_size)
+	data = os.urandom(block_size)
+	fd = os.open(os.path.join(directory, 'seq'), os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+	start = time.perf_counter_ns()
+	for _ in range(blocks):
+		os.write(fd, data)
+	os.fsync(fd)
+	duration = time.perf_counter_ns() - start
+	os.close(fd)
+	return blocks, duration
+
+
+def _workload_seq_read(directory, count, block_size):
+
+	blocks, _ = _workload_seq_write(directory, count, block_size)
+	fd = os.open(os.path.join(directory, 'seq'), os.O_RDONLY)
+	start = time.perf_counter_ns()
+	for _ in range(blocks):
+		os.read(fd, block_size)
+	duration = time.perf_counter_ns() - start
+	os.close(fd)
+	return blocks, duration
+
+
+def _offsets(blocks, block_size):
+
+	rng = random.Random(blocks) # same offsets in every mode
+	return [rng.randrange(blocks) * block_size for _ in range(blocks)]
+
+
+def _workload_rand_write(directory, count, block_size):
+
+	blocks, _ = _workload_seq_write(directory, count, block_size)
+	data = os.urandom(block_size)
+	offsets = _offsets(blocks, block_size)
+	fd = os.open(os.path.join(directory, 'seq'), os.O_WRONLY)
+	start = time.perf_counter_ns()
+	for offset in offsets:
+		os.pwrite(fd, data, offset)
+	os.fsync(fd)
+	duration = time.perf_counter_ns() - start
+	os.close(fd)
+	return blocks, duration
+
+
+def _workload_rand_read(directory, count, block_size):
+
+	blocks, _ = _workload_seq_write(directory, count, block_size)
+	offsets = _offsets(blocks, block_size)
+	fd = os.open(os.path.join(directory, 'seq'), os.O_RDONLY)
+	start = time.perf_counter_ns()
+	for offset in offsets:
+		os.pread(fd, block_size, offset)
+	duration = time.perf_counter_ns() - start
+	os.close(fd)
+	return blocks, duration
+
+
+def _workload_readdir(directory, count, block_size):
+
+	entries = max(1000, count // 10)
+	readdir_path = os.path.join(directory, 'readdir')
+	os.mkdir(readdir_path)
+	for index in range(entries):
+		open(os.path.join(readdir_path, 'entry_%d' % index), 'w').close()
+	listings = max(1, count // entries)
+	start = time.perf_counter_ns()
+	for _ in range(listings):
+		for entry in os.scandir(readdir_path):
+			entry.stat() # ls -l
+	return listings * entries, time.perf_counter_ns() - start
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _clear(directory):
+
+	for entry in os.scandir(directory):
+		if entry.is_dir(follow_symlinks = False):
+			shutil.rmtree(entry.path)
+		else:
+			os.unlink(entry.path)
+
+
+def measure(base, mode, workload, block_size, count):
+
+	with tempfile.TemporaryDirectory(dir = base) as tmp:
+		directory = os.path.join(tmp, 'mount')
+		log_dir = os.path.join(tmp, 'log')
+		os.mkdir(directory)
+		os.mkdir(log_dir)
+
+		with _mount_class(mode, directory, log_dir) as mount:
+			operations, duration = globals()['_workload_%s' % workload](directory, count, block_size)
+			_clear(directory)
+
+		log_path = os.path.join(log_dir, '%s.log' % mode)
+		log_bytes = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+
+	return {
+		'benchmark': 'mount',
+		'mode': mode,
+		'workload': workload,
+		'block_size': block_size if workload in ('seq_write', 'seq_read', 'rand_write', 'rand_read') else None,
+		'operations': operations,
+		'ops_per_second': operations / (duration / 1e9),
+		'ns_per_op': duration / operations,
+		'log_bytes': log_bytes,
+		'lib_events': mount.events if mode == 'lib' else None,
+		}
+
+
+def _cases(workloads):
+
+	for workload in workloads:
+		if workload in ('seq_write', 'seq_read', 'rand_write', 'rand_read'):
+			for block_size in BLOCK_SIZES:
+				yield workload, block_size
+		else:
+			yield workload, 0
+
+
+def main():
+
+	parser = argparse.ArgumentParser(description = 'Per-operation overhead of LoggedFS-python mounts')
+	parser.add_argument('--base', default = '/dev/shm', help = 'parent directory of mounts, ideally tmpfs')
+	parser.add_argument('--count', type = int, default = 10000, help = 'operations per workload')
+	parser.add_argument('--mode', action = 'append', choices = tuple(MODES), help = 'can be repeated, default: all')
+	parser.add_argument('--workload', action = 'append', choices = WORKLOADS, help = 'can be repeated, default: all')
+	parser.add_argument('--json', action = 'store_true', help = 'one JSON object per result line')
+	parser.add_argument('--output', help = 'append JSON result lines to this file, for tracking over time')
+	args = parser.parse_args()
+
+	modes = args.mode or tuple(MODES)
+	if 'bare' not in modes:
+		modes = ('bare',) + tuple(modes) # reference for overhead
+	run = {
+		'run_time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'base': args.base,
+		}
+
+	output = open(args.output, 'a') if args.output is not None else None
+	for workload, block_size in _cases(args.workload or WORKLOADS):
+		bare_ns = None
+		for mode in modes:
+			result = measure(args.base, mode, workload, block_size, args.count)
+			if mode == 'bare':
+				bare_ns = result['ns_per_op']
+			result['overhead'] = result['ns_per_op'] / bare_ns
+			result.update(run)
+			if output is not None:
+				output.write(json.dumps(result, sort_keys = True) + '\n')
+			if args.json:
+				print(json.dumps(result, sort_keys = True))
+			else:
+				print('{workload:>13s} {block:>7s} {mode:>7s}: {ops_per_second:12.0f} ops/s | {ns_per_op:10.0f} ns/op | x{overhead:7.1f}'.format(
+					block = str(block_size or ''), **result
+					))
+			sys.stdout.flush()
+	if output is not None:
+		output.close()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ENTRY POINT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+if __name__ == '__main__':
+
+	main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/scripts/bench_ops.py: Cost of operations and their event pipeline, without FUSE
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+
+import loggedfs._core.fs as fs_module
+import loggedfs._core.out as out_module
+from loggedfs._core.filter import filter_pipeline_class
+from loggedfs._core.ipc import _sender_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+MODES = { # name: keyword arguments of _loggedfs, None for the undecorated operation
+	'raw': None,
+	'off': {'log_enabled': False},
+	'text': {},
+	'json': {'log_json': True},
+	'buffers': {'log_buffers': True},
+	'modify': {'log_only_modify_operations': True},
+	'filter': {'log_filter': 'xml'},
+	'lib': {'lib_mode': True},
+	}
+OPERATIONS = ('getattr', 'read', 'write', 'readdir', 'open_release', 'statfs')
+
+FILTER_CONFIG = """<?xml version="1.0" encoding="UTF-8"?>
+<loggedFS logEnabled="true" printProcessName="true">
+	<includes>
+		<include extension=".*" uid="*" action=".*" retname=".*"/>
+	</includes>
+	<excludes>
+		<exclude extension=".*\\.tmp" uid="*" action=".*" retname=".*"/>
+		<exclude extension=".*" uid="*" action="statfs" retname=".*"/>
+	</excludes>
+</loggedFS>
+"""
+
+STAGES = ( # (stage, file name suffix, function names): time spent in and below these functions
+	('operation', 'fs.py', ('getattr', 'read', 'write', 'readdir', 'open', 'release', 'statfs')),
+	('context', 'out.py', ('_get_process_cmdline_', '_get_user_name_from_uid_', '_get_group_name_from_gid_')),
+	('buffers', 'buffers.py', ('_encode_buffer_',)),
+	('filter', 'filter.py', ('match',)),
+	('serialize', 'json/__init__.py', ('dumps',)),
+	('output', 'writer.py', ('write',)),
+	('output', 'ipc.py', ('send',)),
+	) # rest of event decorator: "event", i.e. building the event dict and formatting
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS: FILE INFO
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _fip_class:
+	"""Replaces the fuse_file_info structure handed to operations by refuse (raw_fi).
+	"""
+
+	__slots__ = ('fh', 'flags')
+
+	def __init__(self, fh = 0, flags = 0):
+
+		self.fh = fh
+		self.flags = flags
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _stub_fuse_context():
+	"""Outside of FUSE, there is no calling process: pretend it is this one.
+	"""
+
+	context = (os.getuid(), os.getgid(), os.getpid())
+	fs_module.fuse_get_context = lambda: context
+	out_module.fuse_get_context = lambda: context
+
+
+def _filesystem(mode, directory, log_dir, devnull, codec):
+
+	kwargs = dict(MODES[mode] or {})
+	if kwargs.get('log_filter', None) == 'xml':
+		kwargs['log_filter'] = filter_pipeline_class.from_xmlstring(FILTER_CONFIG)[2]
+	if kwargs.get('lib_mode', False):
+		kwargs['_lib_out_func'] = _sender_class(open(os.devnull, 'wb'), codec).send
+	else:
+		kwargs['log_file'] = os.path.join(log_dir, '%s.log' % mode)
+
+	return fs_module._loggedfs(
+		directory,
+		log_syslog = False,
+		_log_stream = devnull,
+		**kwargs
+		)
+
+
+def _operations(filesystem, mode, block_size):
+	"""Returns a callable per operation, each running one operation (or one pair).
+	"""
+
+	def call(name, *args):
+		func = getattr(type(filesystem), name)
+		if mode == 'raw':
+			func = func.__wrapped__ # skip event decorator
+		return func(filesystem, *args)
+
+	fip = _fip_class(flags = os.O_RDWR)
+	call('open', '/data', fip)
+	data = os.urandom(block_size)
+
+	def open_release():
+		open_fip = _fip_class(flags = os.O_RDONLY)
+		call('open', '/data', open_fip)
+		call('release', '/data', open_fip)
+
+	return fip, {
+		'getattr': lambda: call('getattr', '/data', None),
+		'read': lambda: call('read', '/data', block_size, 0, fip),
+		'write': lambda: call('write', '/data', data, 0, fip),
+		'readdir': lambda: call('readdir', '/dir', None),
+		'open_release': open_release,
+		'statfs': lambda: call('statfs', '/'),
+		}
+
+
+def _loop(operation, count):
+
+	start = time.perf_counter_ns()
+	for _ in range(count):
+		operation()
+	return time.perf_counter_ns() - start
+
+
+def _allocations(operation, count):
+
+	tracemalloc.start()
+	before = tracemalloc.take_snapshot()
+	start_size, _ = tracemalloc.get_traced_memory()
+	tracemalloc.reset_peak()
+	_loop(operation, count)
+	end_size, peak_size = tracemalloc.get_traced_memory()
+	after = tracemalloc.take_snapshot()
+	tracemalloc.stop()
+
+	exclude = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+	top = [
+		'%s: %+d B' % (stat.traceback.format()[0].strip(), stat.size_diff)
+		for stat in after.filter_traces(exclude).compare_to(before.filter_traces(exclude), 'lineno')[:3]
+		if stat.size_diff != 0
+		]
+	return {
+		'mem_peak_bytes': peak_size - start_size,
+		'mem_retained_bytes_per_op': (end_size - start_size) / count,
+		'mem_retained_top': top,
+		}
+
+
+def _profile(operation, count, mode):
+
+	profiler = cProfile.Profile()
+	profiler.runcall(_loop, operation, count)
+	stats = pstats.Stats(profiler).stats
+
+	total = 0.0
+	stages = {}
+	for (filename, _, funcname), (_, _, _, cumtime, _) in stats.items():
+		if (
+			(mode != 'raw' and filename.endswith('out.py') and funcname == 'wrapped')
+			or (mode == 'raw' and filename.endswith('fs.py') and funcname in STAGES[0][2])
+			):
+			total += cumtime
+		for stage, suffix, funcnames in STAGES:
+			if filename.endswith(suffix) and funcname in funcnames:
+				stages[stage] = stages.get(stage, 0.0) + cumtime
+				break
+	if total == 0.0:
+		return {}
+	stages['event'] = max(0.0, total - sum(stages.values()))
+	return {stage: round(value / total, 3) for stage, value in sorted(stages.items())}
+
+
+def measure(mode, operation_name, count, block_size, codec, profile, trace):
+
+	with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+		directory = os.path.join(tmp, 'root')
+		log_dir = os.path.join(tmp, 'log')
+		os.mkdir(directory)
+		os.mkdir(log_dir)
+		with open(os.path.join(directory, 'data'), 'wb') as f:
+			f.write(os.urandom(max(block_size, 4096)))
+		os.mkdir(os.path.join(directory, 'dir'))
+		for index in range(100):
+			open(os.path.join(directory, 'dir', 'entry_%d' % index), 'w').close()
+
+		filesystem = _filesystem(mode, directory, log_dir, devnull, codec)
+		fip, operations = _operations(filesystem, mode, block_size)
+		operation = operations[operation_name]
+
+		_loop(operation, min(count, 1000)) # warm up caches
+		duration = _loop(operation, count)
+		result = {
+			'benchmark': 'ops',
+			'mode': mode,
+			'operation': operation_name,
+			'block_size': block_size if operation_name in ('read', 'write') else None,
+			'operations': count,
+			'ns_per_op': duration / count,
+			'ops_per_second': count / (duration / 1e9),
+			}
+		if trace:
+			result.update(_allocations(operation, min(count, 10000)))
+		if profile:
+			result['profile'] = _profile(operation, count, mode)
+
+		os.close(fip.fh)
+		filesystem._log_writer.flush()
+		for handler in filesystem._logger.handlers:
+			handler.close()
+		os.close(filesystem._root_path_fd)
+
+	return result
+
+
+def main():
+
+	parser = argparse.ArgumentParser(description = 'Cost of operations and their event pipeline, without FUSE')
+	parser.add_argument('--count', type = int, default = 20000, help = 'operations per measurement')
+	parser.add_argument('--block-size', type = int, default = 4096, help = 'bytes per read / write')
+	parser.add_argument('--codec', default = 'pickle', help = 'library mode codec')
+	parser.add_argument('--mode', action = 'append', choices = tuple(MODES), help = 'can be repeated, default: all')
+	parser.add_argument('--operation', action = 'append', choices = OPERATIONS, help = 'can be repeated, default: all')
+	parser.add_argument('--trace', action = 'store_true', help = 'measure memory allocations (tracemalloc)')
+	parser.add_argument('--profile', action = 'store_true', help = 'break time down by pipeline stage (cProfile)')
+	parser.add_argument('--json', action = 'store_true', help = 'one JSON object per result line')
+	args = parser.parse_args()
+
+	_stub_fuse_context()
+
+	for operation_name in args.operation or OPERATIONS:
+		raw_ns = None
+		for mode in args.mode or tuple(MODES):
+			result = measure(
+				mode, operation_name, args.count, args.block_size, args.codec, args.profile, args.trace
+				)
+			if mode == 'raw':
+				raw_ns = result['ns_per_op']
+			result['overhead_ns'] = result['ns_per_op'] - raw_ns if raw_ns is not None else None
+			if args.json:
+				print(json.dumps(result, sort_keys = True))
+				continue
+			line = '{operation:>12s} {mode:>7s}: {ns_per_op:9.0f} ns/op'.format(**result)
+			if result['overhead_ns'] is not None:
+				line += ' | {overhead_ns:+9.0f} ns event'.format(**result)
+			if args.trace:
+				line += ' | peak {mem_peak_bytes:8d} B | retained {mem_retained_bytes_per_op:6.1f} B/op'.format(**result)
+			print(line)
+			if args.profile:
+				print(' ' * 22 + ' '.join('%s %0.0f%%' % (stage, share * 100) for stage, share in result['profile'].items()))
+			if args.trace:
+				for top in result['mem_retained_top']:
+					print(' ' * 22 + top)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ENTRY POINT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+if __name__ == '__main__':
+
+	main()
@@ -31,6 +31,7 @@ specific language governing rights and limitations under the License.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 import datetime
+import heapq
 import os
 import sys
 
@@ -100,25 +101,16 @@ def hex_to_dec(hex_str):
 	return str(int(hex_str[2:], 16))
 
 
-def split_at(in_str, separator, position):
-
-	split_list = in_str.split(separator)
-	return [
-		separator.join(split_list[:position]),
-		separator.join(split_list[position:])
-		]
-
-
 def parse_fs_line(line):
 
-	ts, payload = split_at(line, ' ', 2)
+	date, time, payload = line.split(' ', 2)
+	ts = date + ' ' + time
 	if payload.startswith('INFO [default] '): # original LoggedFS
-		_, payload = split_at(payload, ' ', 2)
+		_, _, command, payload = payload.split(' ', 3)
 		_original_loggedfs = True
 	else: # LoggedFS-python
-		_, payload = split_at(payload, ' ', 1)
+		_, command, payload = payload.split(' ', 2)
 		_original_loggedfs = False
-	command, payload = payload.split(' ', 1)
 	if '{SUCCESS}' in payload:
 		param, remaining = payload.split(' {SUCCESS} ', 1)
 	else:
@@ -152,35 +144,42 @@ def parse_fsx_line(line):
 		}
 
 
+def read_fs_log(path):
+	"""Yields parsed lines of the LoggedFS log, streaming, in the order of time.
+	"""
+
+	mount_path = os.path.join(os.path.abspath('.'), 'tests/test_mount/test_child')
+	with open(path, 'r', encoding = 'utf-8') as f:
+		for line in f:
+			line = line.rstrip('\n')
+			if (
+				' fsx-linux ' in line
+				or ' pid = 0 uid = 0 ' in line
+				or ' write ' in line
+				or ' read ' in line
+				or ' truncate ' in line
+				) and ' getattr ' not in line:
+				yield parse_fs_line(line.replace(mount_path, ''))
+
+
+def read_fsx_log(path):
+	"""Yields parsed lines of the fsx-linux log, streaming, in the order of time.
+	"""
+
+	with open(path, 'r', encoding = 'utf-8') as f:
+		for line in f:
+			line = line.rstrip('\n')
+			if line[:6].isdigit() and line[6:7] == ' ':
+				yield parse_fsx_line(line)
+
+
 def main():
 
-	with open('tests/test_logs/loggedfs.log', 'r', encoding = 'utf-8') as f:
-		log_fs = f.read()
-
-	with open('tests/test_logs/iotest.fsxlog', 'r', encoding = 'utf-8') as f:
-		log_fsx = f.read()
-
-	log_fs_lines = [
-		parse_fs_line(line) for line in
-		log_fs.replace(os.path.join(os.path.abspath('.'), 'tests/test_mount/test_child'), '').split('\n')
-		if (
-			' fsx-linux ' in line
-			or ' pid = 0 uid = 0 ' in line
-			or ' write ' in line
-			or ' read ' in line
-			or ' truncate ' in line
-			) and ' getattr ' not in line
-		]
-
-	log_fsx_lines = [
-		parse_fsx_line(line) for line in
-		log_fsx.split('\n')
-		if line[:6].isdigit() and line[6] == ' '
-		]
-
-	log_lines = sorted(log_fs_lines + log_fsx_lines, key = lambda k: k['t'])
-
-	for line in log_lines:
+	for line in heapq.merge( # both logs are written in the order of time
+		read_fs_log('tests/test_logs/loggedfs.log'),
+		read_fsx_log('tests/test_logs/iotest.fsxlog'),
+		key = lambda k: k['t']
+		):
 		print_line(line)
 
 
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_analyze.py: Summaries of logs
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import json
+
+from loggedfs._core.analyze import analyze_logs
+from loggedfs._core.index import query_log
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+EVENTS = (
+	{'action': 'write', 'param_path': '/demo/a', 'param_buf_len': 4, 'return': 4},
+	{'action': 'read', 'param_path': '/demo/a', 'param_length': 2, 'return_len': 2},
+	{'action': 'rename', 'param_old_path': '/demo/a', 'param_new_path': '/demo/b'},
+	{'action': 'link', 'param_source_path': '/demo/b', 'param_target_path': '/demo/hard'},
+	{'action': 'symlink', 'param_source_path': '/demo/b', 'param_target_path_': '/soft'},
+	)
+
+
+def _write_log(path):
+
+	with open(path, 'w', encoding = 'utf-8') as f:
+		f.write('{"time": 1594467900000000000, "logger": "LoggedFS-python", "msg": "starting"}\n')
+		for index, event in enumerate(EVENTS):
+			log_dict = dict(event, status = True, proc_pid = 10 + index, proc_cmd = 'sh', proc_uid = 0)
+			f.write('{"time": %d, "logger": "LoggedFS-python", %s}\n' % (
+				1594467901000000000 + index, json.dumps(log_dict, sort_keys = True)[1:-1]
+				))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_analyze_round_trip(tmp_path):
+
+	path = str(tmp_path / 'loggedfs.log')
+	_write_log(path)
+
+	summary = analyze_logs([path], jobs = 1).to_dict()
+
+	assert summary['lines'] == 1 + len(EVENTS)
+	assert summary['events'] == len(EVENTS)
+	assert summary['first_ns'] == 1594467901000000000
+	paths = {row['path']: row for row in summary['paths']['rows']}
+	assert sorted(paths) == ['/demo/a', '/demo/b', '/demo/hard'] # symlink by content
+	assert paths['/demo/a']['events'] == 3
+	assert paths['/demo/a']['bytes_read'] == 2
+	assert paths['/demo/a']['bytes_written'] == 4
+	assert sum(row['events'] for row in summary['paths']['rows']) == len(EVENTS) # every event counted
+
+
+def test_analyze_agrees_with_query(tmp_path):
+
+	path = str(tmp_path / 'loggedfs.log')
+	_write_log(path)
+
+	summary = analyze_logs([path], jobs = 1).to_dict()
+
+	for row in summary['paths']['rows']:
+		assert len(list(query_log(path, paths = (row['path'],)))) >= row['events']
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_filter.py: Filter pipelines
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import pickle
+import random
+
+import pytest
+
+from loggedfs._core.filter import filter_path_trie_class, filter_pipeline_class
+from loggedfs._core.ipc import portable_dumps
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+CONFIG = """<?xml version="1.0" encoding="UTF-8"?>
+<loggedFS logEnabled="true" printProcessName="true">
+	<includes>
+		<include path="/data/a"/>
+		<include path="/data/b/"/>
+		<include prefix="/tmp/lo"/>
+		<include extension=".*\\.txt" action="write"/>
+	</includes>
+	<excludes>
+		<exclude path="/data/a/private"/>
+		<exclude prefix="/data/b/."/>
+		<exclude command=".*gvfs.*"/>
+	</excludes>
+</loggedFS>
+"""
+
+PATHS = ('/data/a', '/data/b/c', '/tmp/loggedfs', '/tmp/lo', '/tmp/l/o', '/usr/a', '/', '/data')
+
+
+def _pipeline(cache_size = 0):
+
+	_, _, pipeline = filter_pipeline_class.from_xmlstring(CONFIG, cache_size = cache_size)
+	return pipeline
+
+
+def _event(path, action = 'read', key = 'param_path', cmd = 'cat', **kwargs):
+
+	event = {'action': action, 'status': True, key: path, 'proc_uid': 0, 'proc_cmd': cmd}
+	event.update(kwargs)
+	return event
+
+
+def _naive(path, path_list, prefix_list):
+
+	return (
+		any(path == rule.rstrip('/') or path.startswith(rule.rstrip('/') + '/') for rule in path_list)
+		or any(path.startswith(prefix) for prefix in prefix_list)
+		)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.mark.parametrize('path, expected', [
+	('/data/a', True),
+	('/data/a/', True),
+	('/data/a/b/c', True),
+	('/data/ab', False), # sibling sharing a prefix
+	('/data', False),
+	('/data/b', True), # rule with trailing slash
+	('/data/b/x', True),
+	('/tmp/lo', True),
+	('/tmp/log', True), # partial last segment
+	('/tmp/l', False),
+	('/tmp/lo/x', True),
+	('/usr/a', False),
+	])
+def test_trie_paths_and_prefixes(path, expected):
+
+	trie = filter_path_trie_class(path_list = ['/data/a', '/data/b/'], prefix_list = ['/tmp/lo'])
+
+	assert trie(path) is expected
+	assert len(trie) == 3
+
+
+def test_trie_matches_naive():
+
+	rng = random.Random(0)
+	segments = ('a', 'ab', 'b', 'ba', '.c')
+	def random_path():
+		return '/' + '/'.join(rng.choice(segments) for _ in range(rng.randint(1, 4)))
+
+	path_list = [random_path() for _ in range(20)]
+	prefix_list = [random_path()[:-1] for _ in range(20)]
+	trie = filter_path_trie_class(path_list = path_list, prefix_list = prefix_list)
+
+	for _ in range(2000):
+		path = random_path()
+		assert trie(path) == _naive(path, path_list, prefix_list), path
+
+
+def test_trie_update():
+
+	trie = filter_path_trie_class(path_list = ['/data/a'])
+	trie.update(filter_path_trie_class(prefix_list = ['/tmp/lo']))
+
+	assert trie.path_list == ['/data/a']
+	assert trie.prefix_list == ['/tmp/lo']
+	assert trie('/tmp/log') and trie('/data/a/b')
+	with pytest.raises(TypeError):
+		trie.update(['/data/b'])
+
+
+def test_pipeline_merges_path_items():
+
+	pipeline = _pipeline()
+
+	includes, excludes = pipeline._include_compiled, pipeline._exclude_compiled
+	assert len(includes) == 2 # one merged trie, one extension & action item
+	assert includes[0].path_trie.path_list == ['/data/a', '/data/b/']
+	assert includes[0].path_trie.prefix_list == ['/tmp/lo']
+	assert len(excludes) == 2 # one merged trie, one command item
+	assert excludes[0].path_trie.path_list == ['/data/a/private']
+	assert excludes[0].path_trie.prefix_list == ['/data/b/.']
+
+
+@pytest.mark.parametrize('event, expected', [
+	(_event('/data/a/file'), True),
+	(_event('/data/ab'), False),
+	(_event('/data/a/private/file'), False), # excluded path
+	(_event('/data/b/.hidden'), False), # excluded prefix
+	(_event('/data/b/visible'), True),
+	(_event('/tmp/loggedfs'), True),
+	(_event('/tmp/loggedfs', cmd = 'gvfsd'), False), # excluded command
+	(_event('/usr/notes.txt', action = 'write'), True), # non-path item
+	(_event('/usr/notes.txt'), False),
+	(_event('/data/a', key = 'param_old_path'), True), # any path key
+	(_event('/usr/a', key = 'param_target_path_'), False), # not a path key
+	])
+def test_pipeline_includes_excludes(event, expected):
+
+	assert _pipeline().match(event) is expected
+
+
+def test_pipeline_portable():
+
+	pipeline = _pipeline()
+	data = portable_dumps(pipeline)
+
+	assert data is not None
+	restored = pickle.loads(data)
+	assert repr(restored) == repr(pipeline)
+	for path in PATHS:
+		for action in ('read', 'write'):
+			event = _event(path + '/x.txt', action = action)
+			assert restored.match(event) == pipeline.match(event)
+
+
+def test_cache_hits_ignore_irrelevant_fields():
+
+	pipeline = _pipeline(cache_size = 16)
+
+	for pid in range(10):
+		assert pipeline.match(_event('/data/a/file', proc_pid = pid, time = pid))
+	info = pipeline.cache_info()
+	assert (info.hits, info.misses, info.currsize) == (9, 1, 1)
+
+	assert not pipeline.match(_event('/data/a/file', cmd = 'gvfsd')) # relevant field
+	assert pipeline.cache_info().misses == 2
+
+
+def test_cache_agrees_with_uncached():
+
+	rng = random.Random(0)
+	cached, uncached = _pipeline(cache_size = 8), _pipeline() # small, evicting
+	for _ in range(2000):
+		event = _event(
+			rng.choice(PATHS) + rng.choice(('', '/x.txt', '/.y')),
+			action = rng.choice(('read', 'write')),
+			cmd = rng.choice(('cat', 'gvfsd')),
+			proc_pid = rng.randint(1, 1000)
+			)
+		assert cached.match(event) == uncached.match(event), event
+	assert cached.cache_info().hits > 0
+	assert cached.cache_info().currsize <= 8
+
+
+def test_cache_key_order():
+
+	pipeline = _pipeline(cache_size = 16)
+	old_first = {'action': 'rename', 'param_old_path': '/usr/a', 'param_new_path': '/data/a'}
+	new_first = {'action': 'rename', 'param_new_path': '/data/a', 'param_old_path': '/usr/a'}
+
+	for _ in range(2): # uncached, cached
+		assert not pipeline.match(old_first) # first path key decides, as without cache
+		assert pipeline.match(new_first)
+
+
+def test_cache_reset_by_pickling():
+
+	pipeline = _pipeline(cache_size = 16)
+	pipeline.match(_event('/data/a'))
+	assert pipeline.cache_info().currsize == 1
+
+	restored = pickle.loads(portable_dumps(pipeline))
+	assert restored.cache_info().currsize == 0
+	assert restored.cache_info().maxsize == 16
+	assert restored.match(_event('/data/a'))
+
+
+def test_cache_deactivated():
+
+	pipeline = _pipeline(cache_size = 0)
+
+	assert pipeline.cache_info() is None
+	assert pipeline.match(_event('/data/a'))
+	with pytest.raises(ValueError):
+		_pipeline(cache_size = -1)
+	with pytest.raises(TypeError):
+		_pipeline(cache_size = True)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_importtime.py: Import time and deferred heavy dependencies
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import subprocess
+import sys
+
+import pytest
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONST
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+HEAVY_MODULES = ('refuse', 'click', 'xmltodict', 'asyncio', 'multiprocessing', 'numpy') # timing: tests/scripts/bench_import.py
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _importtime(statement):
+	"""Runs statement in a fresh interpreter with -X importtime.
+	Returns {module: cumulative microseconds} of all modules imported.
+	"""
+
+	proc = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', statement],
+		stdout = subprocess.PIPE, stderr = subprocess.PIPE, check = True
+		)
+	modules = {}
+	for line in proc.stderr.decode('utf-8').splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line: # header
+			continue
+		_, cumulative, name = line[len('import time:'):].split('|')
+		modules[name.strip()] = int(cumulative)
+	return modules
+
+
+def _heavy(modules):
+
+	return sorted(name for name in modules if name.split('.')[0] in HEAVY_MODULES)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_import_package():
+
+	modules = _importtime('import loggedfs')
+
+	assert _heavy(modules) == []
+
+
+@pytest.mark.parametrize('names', [
+	'decode_buffer',
+	'filter_pipeline_class, filter_item_class, filter_field_class',
+	'read_events, read_json_log, read_lib_frames',
+	'export_columnar, read_columnar',
+	])
+def test_import_light_attributes(names):
+
+	modules = _importtime('from loggedfs import %s' % names)
+
+	assert _heavy(modules) == []
+
+
+def test_import_cli():
+
+	modules = _importtime('from loggedfs import cli_entry')
+
+	assert 'click' in modules
+	assert 'refuse' not in modules # only mounting needs it
+	assert 'xmltodict' not in modules # only XML configurations need it
+
+
+def test_lazy_attributes():
+
+	import loggedfs
+
+	for name in loggedfs.__all__:
+		assert name in dir(loggedfs)
+	assert loggedfs.decode_buffer(
+		'eAELycgsVgCi4sTcgpxUhZLUihIARSIHHA=='
+		) == b'This is sample text'
+	with pytest.raises(AttributeError):
+		loggedfs.no_such_attribute
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_index.py: Sidecar index and queries
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import logging
+
+from loggedfs._core.index import _indexed_file_handler_class, load_index, query_log
+from loggedfs._core.writer import _event_writer_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+PATHS = ('/demo/a', '/demo/ä', '/demo/b c', '/demo/a', '/demo/ö/x')
+
+
+def _pid(line):
+
+	return int(line.split(' pid = ')[1].split()[0])
+
+
+def _write_log(path):
+
+	handler = _indexed_file_handler_class(path, block_events = 2)
+	handler.setFormatter(logging.Formatter('%(asctime)s (%(name)s) %(message)s'))
+	logger = logging.Logger('test_index')
+	logger.addHandler(handler)
+	writer = _event_writer_class(logger, False)
+
+	logger.info('starting at /demo ä') # through logging
+	for index, event_path in enumerate(PATHS):
+		writer.write(
+			'chmod %s to 420 {SUCCESS} [ pid = %d chmod uid = 0 ] ( r = None )' % (event_path, index),
+			(event_path,)
+			)
+	writer.close()
+	handler.close()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_index_offsets(tmp_path):
+
+	path = str(tmp_path / 'loggedfs.log')
+	with open(path, 'wb') as f:
+		f.write('earlier run ü\n'.encode('utf-8')) # appended to
+	_write_log(path)
+
+	with open(path, 'rb') as f:
+		data = f.read()
+	blocks = load_index(path)
+	assert blocks[0]['offset'] == len('earlier run ü\n'.encode('utf-8'))
+	assert blocks[-1]['end'] == len(data)
+	assert sum(block['events'] for block in blocks) == 1 + len(PATHS)
+	for block in blocks:
+		lines = data[block['offset']:block['end']].decode('utf-8').splitlines()
+		assert len(lines) == block['events']
+		assert all(' (test_index) ' in line for line in lines)
+
+
+def test_query_round_trip(tmp_path):
+
+	path = str(tmp_path / 'loggedfs.log')
+	_write_log(path)
+
+	lines = list(query_log(path, paths = ('/demo/a',)))
+	assert [_pid(line) for line in lines] == [0, 3]
+	lines = list(query_log(path, paths = ('/demo/b c', '/demo/ä')))
+	assert [_pid(line) for line in lines] == [1, 2]
+	lines = list(query_log(path, prefixes = ('/demo/ö/',)))
+	assert [_pid(line) for line in lines] == [4]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_multi.py: Signals while several directories are mounted by one process
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import io
+import os
+import signal
+import threading
+
+import pytest
+
+from loggedfs._core import fs
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _fake_fuse_class:
+	"""Stands in for FUSE and fusermount: a mount blocks until its directory is unmounted.
+	"""
+
+
+	def __init__(self, directories):
+
+		self.mounted = {os.path.abspath(directory): threading.Event() for directory in directories}
+		self.unmounted = {directory: threading.Event() for directory in self.mounted}
+
+
+	def mount(self, operations, directory, **kwargs):
+
+		directory = os.path.abspath(directory)
+		self.mounted[directory].set()
+		assert self.unmounted[directory].wait(10.0)
+
+
+	def run(self, command, **kwargs):
+
+		assert command[:2] == ['fusermount', '-u']
+		self.unmounted[command[-1]].set()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.mark.parametrize('signum', fs.MULTI_SIGNALS)
+def test_signal_unmounts_all(signum, tmp_path, monkeypatch):
+
+	directories = [str(tmp_path / name) for name in ('a', 'b', 'c')]
+	for directory in directories:
+		os.mkdir(directory)
+	fake = _fake_fuse_class(directories)
+	monkeypatch.setattr(fs, 'FUSE', fake.mount)
+	monkeypatch.setattr(fs.subprocess, 'run', fake.run)
+	old_handler = signal.getsignal(signum)
+
+	def _kill():
+		for mounted in fake.mounted.values():
+			assert mounted.wait(10.0)
+		os.kill(os.getpid(), signum)
+
+	killer = threading.Thread(target = _kill, daemon = True)
+	killer.start()
+	fs.loggedfs_multi_factory(directories, fuse_foreground = True, log_syslog = False, _log_stream = io.StringIO())
+	killer.join()
+
+	assert all(unmounted.is_set() for unmounted in fake.unmounted.values())
+	assert signal.getsignal(signum) is old_handler
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_pool.py: Hosting mounts in a pool process
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import io
+
+from loggedfs._core import fs, pool
+from loggedfs._core.ipc import end_of_transmission
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_host_forgets_ended_mounts(monkeypatch):
+
+	mounted = []
+	monkeypatch.setattr(fs, 'loggedfs_factory', lambda directory, **kwargs: mounted.append(kwargs['mount_id']))
+	out_stream = io.BytesIO()
+	host = pool._pool_host_class(out_stream, 'pickle')
+
+	for mount_id in range(10):
+		host.put((pool.POOL_MOUNT, mount_id, '/demo/%d' % mount_id, {}))
+	host.join()
+
+	assert sorted(mounted) == list(range(10))
+	assert host._mounts == {}
+	host.put((pool.POOL_UNMOUNT, 3, None, None)) # ended already
+	host.put(end_of_transmission(None)) # shutting down
+	assert host._mounts == {}
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_reader.py: Reading recorded library mode streams
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import io
+
+import pytest
+
+from loggedfs._core.columnar import export_columnar, read_columnar
+from loggedfs._core.defaults import IPC_CODECS
+from loggedfs._core.ipc import _sender_class, mount_ready
+from loggedfs._core.reader import read_events, read_lib_frames
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+EVENT = {
+	'action': 'read',
+	'status': True,
+	'param_path': '/demo/file',
+	'proc_pid': 1,
+	'proc_uid': 0,
+	'proc_gid': 0,
+	'proc_cmd': 'cat',
+	'time': 1594467901123456789,
+	}
+
+
+def _recording(codec):
+
+	stream = io.BytesIO()
+	send = _sender_class(stream, codec).send
+	send(mount_ready('/demo', 1594467901000000000, True))
+	send(dict(EVENT))
+	return io.BufferedReader(io.BytesIO(stream.getvalue()))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.mark.parametrize('codec', IPC_CODECS)
+def test_lib_frames_skip_signals(codec):
+
+	events = list(read_lib_frames(_recording(codec), codec))
+	assert len(events) == 1
+	assert events[0]['param_path'] == EVENT['param_path']
+
+	events = list(read_events(_recording(codec), codec))
+	assert [event['action'] for event in events] == ['read']
+
+
+def test_export_columnar_skips_signals(tmp_path):
+
+	assert export_columnar(_recording('pickle'), str(tmp_path)) == 1
+	chunks = list(read_columnar(str(tmp_path)))
+	assert sum(len(chunk) for chunk in chunks) == 1
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_replay.py: Replaying recorded events
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import pytest
+
+from loggedfs._core.buffers import _encode_buffer_
+from loggedfs._core.ipc import _sender_class, mount_ready
+from loggedfs._core.replay import replay_log
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+ROOT = '/demo'
+
+
+def _event(action, pid, name, **kwargs):
+
+	event = {
+		'action': action,
+		'status': True,
+		'param_path': ROOT + '/' + name,
+		'proc_pid': pid,
+		'proc_uid': 0,
+		'proc_gid': 0,
+		'proc_cmd': 'cat',
+		}
+	event.update({'param_' + key: value for key, value in kwargs.items()})
+	return event
+
+
+def _record(path, events):
+
+	with open(path, 'wb') as f:
+		send = _sender_class(f, 'pickle').send
+		send(mount_ready(ROOT, 1594467901000000000))
+		for event in events:
+			send(event)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.mark.parametrize('parallel', (True, False))
+def test_replay_file_handles_per_process(tmp_path, parallel):
+
+	target = tmp_path / 'target'
+	target.mkdir()
+	(target / 'a').write_bytes(b'')
+	(target / 'b').write_bytes(b'')
+
+	events = [ # both processes got file handle 3
+		_event('open', 1, 'a', fip = 3),
+		_event('open', 2, 'b', fip = 3),
+		_event('write', 1, 'a', fip = 3, offset = 0, buf = _encode_buffer_(b'first')),
+		_event('write', 2, 'b', fip = 3, offset = 0, buf = _encode_buffer_(b'second')),
+		_event('release', 2, 'b', fip = 3),
+		_event('write', 1, 'a', fip = 3, offset = 5, buf_len = 3),
+		_event('release', 1, 'a', fip = 3),
+		]
+	_record(str(tmp_path / 'recording'), events)
+
+	stats = replay_log(
+		str(tmp_path / 'recording'), str(target), root = ROOT, codec = 'pickle', parallel = parallel
+		)
+
+	assert stats['replayed'] == len(events)
+	assert stats['failed'] == 0
+	assert stats['processes'] == 2
+	assert (target / 'a').read_bytes() == b'first\0\0\0'
+	assert (target / 'b').read_bytes() == b'second'
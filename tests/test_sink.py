@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_sink.py: Rotating log file sink
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import glob
+import threading
+
+from loggedfs._core.sink import rotating_file_sink_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def _lines(path):
+
+	lines = []
+	for segment_path in glob.glob(path + '*'):
+		with open(segment_path, 'r', encoding = 'utf-8') as f:
+			lines.extend(f.read().splitlines())
+	return sorted(lines)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_rotation_keeps_lines(tmp_path):
+
+	path = str(tmp_path / 'loggedfs.log')
+	sink = rotating_file_sink_class(path, rotate_bytes = 100)
+	expected = ['line %04d' % index for index in range(500)]
+	for line in expected:
+		sink.write(line + '\n')
+		sink.flush()
+	sink.close()
+
+	assert len(glob.glob(path + '.*')) > 0 # segments
+	assert _lines(path) == expected
+
+
+def test_rotation_does_not_wait_for_worker(tmp_path):
+
+	path = str(tmp_path / 'loggedfs.log')
+	sink = rotating_file_sink_class(path, rotate_bytes = 100)
+	busy = threading.Event()
+	sink._jobs.put((lambda arg: busy.wait(), None)) # e.g. compressing a large segment
+
+	expected = ['line %04d' % index for index in range(100)] # due for several rotations
+	writer = threading.Thread(target = lambda: [sink.write(line + '\n') for line in expected])
+	writer.start()
+	writer.join(5.0)
+	stalled = writer.is_alive()
+	busy.set()
+	writer.join()
+	sink.close()
+
+	assert not stalled
+	assert _lines(path) == expected
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_sketch.py: Error bounds of top-K tracking against exact counts
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import math
+import random
+
+import pytest
+
+from loggedfs._core.sketch import count_min_class, hot_tracker_class, space_saving_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.fixture
+def stream():
+
+	rng = random.Random(0)
+	return ['/data/%d' % int(rng.paretovariate(1.1)) for _ in range(100000)] # heavy tail
+
+
+def _exact(keys):
+
+	counts = {}
+	for key in keys:
+		counts[key] = counts.get(key, 0) + 1
+	return counts
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_space_saving(stream):
+
+	exact = _exact(stream)
+	counter = space_saving_class(capacity = 50)
+	for key in stream:
+		counter.add(key)
+
+	assert len(counter) == 50 < len(exact)
+	for key, count, error in counter.top(50):
+		assert count - error <= exact[key] <= count
+	for key, count in exact.items():
+		if count > len(stream) / 50:
+			assert key in {item[0] for item in counter.top(50)}
+	assert [item[0] for item in counter.top(5)] == sorted(exact, key = exact.get, reverse = True)[:5]
+
+
+def test_count_min(stream):
+
+	exact = _exact(stream)
+	sketch = count_min_class(width = 256, depth = 4)
+	for key in stream:
+		sketch.add(key, 3)
+
+	bound = math.e / 256 * sketch.total # per key, with probability 1 - exp(-depth)
+	above = 0
+	for key, count in exact.items():
+		assert 3 * count <= sketch.estimate(key)
+		above += sketch.estimate(key) > 3 * count + bound
+	assert above <= 0.05 * len(exact)
+
+
+def test_hot_tracker():
+
+	tracker = hot_tracker_class(capacity = 4, width = 64, depth = 2)
+	for index in range(1000):
+		tracker.add({
+			'action': 'read' if index % 2 else 'getattr',
+			'status': True,
+			'param_path': '/hot' if index % 2 else '/cold/%d' % index,
+			'return_len': 4096,
+			'proc_pid': 100 + index % 3,
+			'proc_cmd': 'cat',
+			'proc_uid': 1000,
+			})
+
+	stats = tracker.stats(top = 2)
+	assert stats['paths']['events'] == 1000
+	assert stats['paths']['top'][0]['path'] == '/hot'
+	assert stats['paths']['top'][0]['events'] - stats['paths']['top'][0]['error'] <= 500
+	assert stats['paths']['top'][0]['bytes'] >= 500 * 4096
+	assert stats['uids']['top'] == [{'uid': 1000, 'events': 1000, 'error': 0, 'bytes': 500 * 4096}]
+	assert {row['pid'] for row in stats['processes']['top']} <= {100, 101, 102}
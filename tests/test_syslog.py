@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_syslog.py: Syslog sink against fake syslog sockets
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from loggedfs._core.syslog import BOM, syslog_sink_class, _syslog_handler_class
+from loggedfs._core.writer import _event_writer_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class _fake_syslog_class:
+	"""Unix socket collecting syslog messages, stream (octet counting) or datagram.
+	If stalled, the stream server accepts connections but never reads.
+	"""
+
+
+	def __init__(self, path, stream = True, stalled = False):
+
+		self.messages = []
+		self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM if stream else socket.SOCK_DGRAM)
+		self._sock.bind(path)
+		if stream:
+			self._sock.listen(1)
+		self._stalled = stalled
+		self._conns = []
+		self._t = threading.Thread(target = self._serve_stream if stream else self._serve_dgram, daemon = True)
+		self._t.start()
+
+
+	def _serve_stream(self):
+
+		conn, _ = self._sock.accept()
+		self._conns.append(conn)
+		if self._stalled:
+			return
+		buffer = b''
+		while True:
+			try:
+				data = conn.recv(2**16)
+			except OSError: # closed by test
+				break
+			if len(data) == 0:
+				break
+			buffer += data
+			while b' ' in buffer:
+				length, rest = buffer.split(b' ', 1)
+				length = int(length)
+				if len(rest) < length:
+					break
+				self.messages.append(rest[:length])
+				buffer = rest[length:]
+
+
+	def _serve_dgram(self):
+
+		while True:
+			try:
+				data = self._sock.recv(2**16)
+			except OSError: # closed by test
+				break
+			self.messages.append(data)
+
+
+	def wait(self, count, timeout = 10.0):
+
+		deadline = time.monotonic() + timeout
+		while len(self.messages) < count and time.monotonic() < deadline:
+			time.sleep(0.01)
+		return len(self.messages)
+
+
+	def close(self):
+
+		for conn in self._conns:
+			conn.close()
+		self._sock.close()
+
+
+def _message(frame):
+
+	header, message = frame.split(BOM, 1)
+	return header.decode('ascii'), message.decode('utf-8')
+
+
+@pytest.fixture
+def socket_path():
+
+	with tempfile.TemporaryDirectory() as tmp: # short, unix socket paths are limited
+		yield os.path.join(tmp, 'log')
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_stream_octet_counting(socket_path):
+
+	server = _fake_syslog_class(socket_path)
+	sink = syslog_sink_class(socket_path)
+	count = 20000
+
+	for number in range(count):
+		assert sink.put('event %d\nsecond line ä' % number)
+	assert server.wait(count) == count
+	sink.close()
+	server.close()
+
+	header, message = _message(server.messages[-1])
+	assert header.startswith('<14>1 ')
+	assert message == 'event %d\nsecond line ä' % (count - 1)
+	assert sink.stats['sent'] == count
+	assert sink.stats['dropped'] == 0
+	assert sink.stats['stream'] is True
+
+
+def test_datagram_fallback(socket_path):
+
+	server = _fake_syslog_class(socket_path, stream = False)
+	sink = syslog_sink_class(socket_path)
+
+	for number in range(100):
+		sink.put('event %d' % number)
+	assert server.wait(100) == 100
+	sink.close()
+	server.close()
+
+	prefix = '<14>loggedfs[%d]: ' % os.getpid() # RFC3164, local datagram socket
+	assert [frame.decode('utf-8') for frame in server.messages] == [prefix + 'event %d' % number for number in range(100)]
+	assert sink.stats['stream'] is False
+
+
+def test_stalled_server_never_blocks(socket_path):
+
+	server = _fake_syslog_class(socket_path, stalled = True)
+	sink = syslog_sink_class(socket_path, max_items = 1000, send_timeout = 0.2)
+	count = 200000
+
+	start = time.monotonic()
+	accepted = sum(sink.put('x' * 200) for _ in range(count))
+	assert time.monotonic() - start < 5.0
+	sink.close(timeout = 5.0)
+	server.close()
+
+	stats = sink.stats
+	assert accepted < count
+	assert stats['dropped'] >= count - accepted
+	assert stats['errors'] > 0
+
+
+def test_missing_server_never_blocks(socket_path):
+
+	sink = syslog_sink_class(socket_path)
+
+	for _ in range(10000):
+		sink.put('event')
+	sink.close(timeout = 5.0)
+
+	stats = sink.stats
+	assert stats['sent'] == 0
+	assert stats['dropped'] == 10000
+	assert stats['errors'] > 0
+
+
+def test_event_writer(socket_path):
+
+	server = _fake_syslog_class(socket_path)
+	logger = logging.Logger('LoggedFS-python')
+	logger.setLevel(logging.DEBUG)
+	handler = _syslog_handler_class(syslog_sink_class(socket_path))
+	handler.setFormatter(logging.Formatter('{%(message)s}'))
+	logger.addHandler(handler)
+
+	logger.warning('"msg": "startup"')
+	_event_writer_class(logger, True).write('"action": "read"')
+	assert server.wait(2) == 2
+	handler.close()
+	server.close()
+
+	assert _message(server.messages[0])[0].startswith('<12>1 ') # warning
+	assert [_message(frame)[1] for frame in server.messages] == ['{"msg": "startup"}', '{"action": "read"}']
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+LoggedFS-python
+Filesystem monitoring with Fuse and Python
+https://github.com/pleiszenburg/loggedfs-python
+
+	tests/test_writer.py: Writing operation events
+
+	Copyright (C) 2017-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the Apache License
+Version 2 ("License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.apache.org/licenses/LICENSE-2.0
+https://github.com/pleiszenburg/loggedfs-python/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import logging
+import time
+
+from loggedfs._core.writer import _event_writer_class
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# HELPER
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+FLUSH_INTERVAL = 0.05
+
+
+def _logger(name, handler):
+
+	logger = logging.getLogger(name)
+	logger.setLevel(logging.DEBUG)
+	logger.propagate = False
+	logger.handlers.clear()
+	logger.addHandler(handler)
+	return logger
+
+
+class _broken_stream_class:
+
+	def write(self, data):
+		raise OSError('disk full')
+
+	def flush(self):
+		raise OSError('disk full')
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# TESTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_trailing_events_flushed(tmp_path):
+
+	path = str(tmp_path / 'loggedfs.log')
+	handler = logging.FileHandler(path)
+	writer = _event_writer_class(_logger('test_writer_flush', handler), False, flush_interval = FLUSH_INTERVAL)
+
+	for index in range(3):
+		writer.write('event %d' % index)
+	deadline = time.monotonic() + 5.0
+	while time.monotonic() < deadline:
+		with open(path) as f:
+			if len(f.read().splitlines()) == 3: # no further event arrived
+				break
+		time.sleep(FLUSH_INTERVAL)
+	with open(path) as f:
+		assert f.read().splitlines()[-1].endswith(' event 2')
+
+	writer.close()
+	handler.close()
+
+
+def test_handler_errors_handled(monkeypatch):
+
+	errors = []
+	handler = logging.StreamHandler(_broken_stream_class())
+	monkeypatch.setattr(handler, 'handleError', errors.append)
+	writer = _event_writer_class(_logger('test_writer_errors', handler), False, flush_interval = FLUSH_INTERVAL)
+
+	writer.write('event') # must not raise
+	writer.close()
+
+	assert len(errors) >= 2 # write, flushes
+	assert errors[0].getMessage() == 'event'